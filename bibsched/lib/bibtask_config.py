@@ -30,7 +30,8 @@ CFG_BIBTASK_VALID_TASKS = ("bibindex", "bibupload", "bibreformat",
                            "oaiharvest", "oairepositoryupdater", "inveniogc",
                            "webstatadmin", "bibclassify", "bibexport",
                            "dbdump", "batchuploader", "bibauthorid", 'bibencode',
-                           "bibtasklet", "refextract", "bibsort", "bloguploader")
+                           "bibtasklet", "refextract", "bibsort", "bloguploader",
+                           "blogindexer")
 
 # Tasks that should be run as standalone task
 CFG_BIBTASK_MONOTASKS = ("bibupload", "dbdump", "inveniogc")
@@ -118,6 +119,10 @@ CFG_BIBTASK_DEFAULT_TASK_SETTINGS = {
     },
     'bloguploader' : {
     },
+    'blogindexer' : {
+        'cmd': 'add',
+        'id': [],
+    },
 }
 
 CFG_BIBTASK_TASKLETS_PATH = os.path.join(CFG_PYLIBDIR, 'invenio', 'bibsched_tasklets')
@@ -38,6 +38,7 @@ INSERT INTO sbmALLFUNCDESCR VALUES ('APP_Print_Success','');
 INSERT INTO sbmALLFUNCDESCR VALUES ('APS_Mail_Final_Decision_to_User','');
 INSERT INTO sbmALLFUNCDESCR VALUES ('APS_Print_Success','');
 INSERT INTO sbmALLFUNCDESCR VALUES ('Check_URL',NULL);
+INSERT INTO sbmALLFUNCDESCR VALUES ('Check_Duplicate_URL',NULL);
 INSERT INTO sbmALLFUNCDESCR VALUES ('Get_Recid_Number','');
 INSERT INTO sbmALLFUNCDESCR VALUES ('DBI_Mail_Approval_Request_to_Referee','');
 INSERT INTO sbmALLFUNCDESCR VALUES ('DBI_Mail_Notification_to_User',NULL);
@@ -151,6 +152,7 @@ INSERT INTO sbmFUNCTIONS VALUES ('MBI','BSI','MBI_Print_Success',60,2);
 INSERT INTO sbmFUNCTIONS VALUES ('MBI','BSI','Make_Modify_Record',30,2);
 INSERT INTO sbmFUNCTIONS VALUES ('MBI','BSI','Move_to_Done',70,2);
 INSERT INTO sbmFUNCTIONS VALUES ('SBI','BSI','Check_URL',10,1);
+INSERT INTO sbmFUNCTIONS VALUES ('SBI','BSI','Check_Duplicate_URL',15,1);
 INSERT INTO sbmFUNCTIONS VALUES ('SBI','BSI','Create_Recid',20,1);
 INSERT INTO sbmFUNCTIONS VALUES ('SBI','BSI','Insert_Record',50,1);
 INSERT INTO sbmFUNCTIONS VALUES ('SBI','BSI','Make_Record',40,1);
@@ -250,6 +252,7 @@ INSERT INTO sbmFUNCTIONS VALUES ('MBI','BSIREF','Make_Modify_Record',20,2);
 INSERT INTO sbmFUNCTIONS VALUES ('MBI','BSIREF','Move_to_Pending',70,2);
 INSERT INTO sbmFUNCTIONS VALUES ('MBI','BSIREF','Update_Approval_DB',30,2);
 INSERT INTO sbmFUNCTIONS VALUES ('SBI','BSIREF','Check_URL',10,1);
+INSERT INTO sbmFUNCTIONS VALUES ('SBI','BSIREF','Check_Duplicate_URL',15,1);
 INSERT INTO sbmFUNCTIONS VALUES ('SBI','BSIREF','Create_Recid',20,1);
 INSERT INTO sbmFUNCTIONS VALUES ('SBI','BSIREF','Insert_Record',50,1);
 INSERT INTO sbmFUNCTIONS VALUES ('SBI','BSIREF','Make_Record',40,1);
@@ -281,6 +284,7 @@ INSERT INTO sbmFUNDESC VALUES ('CaseEDS','casesteps');
 INSERT INTO sbmFUNDESC VALUES ('CaseEDS','casevalues');
 INSERT INTO sbmFUNDESC VALUES ('CaseEDS','casevariable');
 INSERT INTO sbmFUNDESC VALUES ('Check_URL','url');
+INSERT INTO sbmFUNDESC VALUES ('Check_Duplicate_URL','url');
 INSERT INTO sbmFUNDESC VALUES ('Create_Modify_Interface','fieldnameMBI');
 INSERT INTO sbmFUNDESC VALUES ('DBI_Mail_Approval_Request_to_Referee','addressesDAM');
 INSERT INTO sbmFUNDESC VALUES ('DBI_Mail_Approval_Request_to_Referee','categformatDAM');
@@ -0,0 +1,78 @@
+-- This file is part of Invenio.
+-- Copyright (C) 2012 CERN.
+--
+-- Invenio is free software; you can redistribute it and/or
+-- modify it under the terms of the GNU General Public License as
+-- published by the Free Software Foundation; either version 2 of the
+-- License, or (at your option) any later version.
+--
+-- Invenio is distributed in the hope that it will be useful, but
+-- WITHOUT ANY WARRANTY; without even the implied warranty of
+-- MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+-- General Public License for more details.
+--
+-- You should have received a copy of the GNU General Public License
+-- along with Invenio; if not, write to the Free Software Foundation, Inc.,
+-- 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+-- Create BlogForever (WebBlog) specific tables.
+
+-- blog/post/comment hierarchy, one row per record, kept up to date
+-- by the bp_post_webblog bibupload plugin and by blogindexer
+CREATE TABLE IF NOT EXISTS blgHIERARCHY (
+  id_bibrec mediumint(8) unsigned NOT NULL,
+  kind varchar(20) NOT NULL default '',
+  id_blog mediumint(8) unsigned NOT NULL default '0',
+  id_post mediumint(8) unsigned NOT NULL default '0',
+  pubdate datetime NOT NULL default '0000-00-00 00:00:00',
+  filesize bigint(20) unsigned NOT NULL default '0',
+  last_updated datetime NOT NULL default '0000-00-00 00:00:00',
+  PRIMARY KEY (id_bibrec),
+  KEY blog_kind_pubdate (id_blog, kind, pubdate, id_bibrec),
+  KEY blog_recid (id_blog, id_bibrec),
+  KEY post_kind_pubdate (id_post, kind, pubdate, id_bibrec),
+  KEY last_updated (last_updated)
+) ENGINE=MyISAM;
+
+-- per-blog statistics, updated together with blgHIERARCHY and
+-- rebuilt by blogindexer --statistics
+CREATE TABLE IF NOT EXISTS blgSTATISTICS (
+  id_blog mediumint(8) unsigned NOT NULL,
+  nb_posts int(11) NOT NULL default '0',
+  nb_comments int(11) NOT NULL default '0',
+  first_post_date datetime NOT NULL default '0000-00-00 00:00:00',
+  last_post_date datetime NOT NULL default '0000-00-00 00:00:00',
+  total_filesize bigint(20) NOT NULL default '0',
+  last_updated datetime NOT NULL default '0000-00-00 00:00:00',
+  PRIMARY KEY (id_blog)
+) ENGINE=MyISAM;
+
+-- author and one-line snippet of every comment, shown by the comment
+-- navigation menu, computed by blogindexer and the bp_post_webblog
+-- bibupload plugin
+CREATE TABLE IF NOT EXISTS blgSNIPPET (
+  id_bibrec mediumint(8) unsigned NOT NULL,
+  id_post mediumint(8) unsigned NOT NULL default '0',
+  author varchar(255) NOT NULL default '',
+  snippet varchar(255) NOT NULL default '',
+  PRIMARY KEY (id_bibrec),
+  KEY id_post (id_post)
+) ENGINE=MyISAM;
+
+-- archived urls: md5 of the canonical form of the 520__u values of
+-- every record, to find the records of many urls at once
+CREATE TABLE IF NOT EXISTS blgURL (
+  url_hash binary(16) NOT NULL,
+  id_bibrec mediumint(8) unsigned NOT NULL,
+  PRIMARY KEY (url_hash, id_bibrec),
+  KEY id_bibrec (id_bibrec)
+) ENGINE=MyISAM;
+
+-- last run of the different blogindexer methods
+CREATE TABLE IF NOT EXISTS blgINDEX (
+  name varchar(50) NOT NULL,
+  last_updated datetime NOT NULL default '0000-00-00 00:00:00',
+  PRIMARY KEY (name)
+) ENGINE=MyISAM;
+
+-- end of file
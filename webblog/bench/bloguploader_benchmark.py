@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+##
+## This file is part of Invenio.
+## Copyright (C) 2012 CERN.
+##
+## Invenio is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 2 of the
+## License, or (at your option) any later version.
+##
+## Invenio is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Invenio; if not, write to the Free Software Foundation, Inc.,
+## 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+Blog Uploader benchmark:
+
+Measures the throughput of the bloguploader ingestion path from the
+source tree, without an Invenio installation. The Invenio modules it
+needs (config, bibtask, dbquery...) are replaced by stubs; the WebBlog
+modules of webblog/lib are the real ones, except for:
+
+    - the blog url checks (check_url), which always succeed,
+    - the recid resolution query (get_recids_by_fieldvalues) and the
+      record kinds, which come from the synthetic data,
+    - the bibupload task submission (task_low_level_submission).
+
+Synthetic csv files of blogs are generated, and every phase is run for
+every file in its own forked process, reporting its wall time and the
+growth of the peak resident memory:
+
+    parse      reading the csv rows
+    validate   _check_input_blogs()
+    resolve    _get_blog_recids()
+    marcxml    _transform_bloglist_to_marcxml()
+    write      _submit_xml_files(), removing the MARCXML files
+
+Usage: python webblog/bench/bloguploader_benchmark.py [options]
+
+Options:
+    -s, --sizes=N,N...     Numbers of blogs of the synthetic files
+                           (default: 1000,10000,100000,1000000)
+    -p, --phases=P,P...    Phases to run (default: all of them)
+    -c, --chunk-size=N     Number of records per MARCXML file
+                           (default: CFG_WEBBLOG_UPLOADER_CHUNK_SIZE)
+    -k, --keep             Do not remove the working directory
+    -h, --help             Print this help
+"""
+
+__revision__ = "$Id$"
+
+import csv
+import getopt
+import gc
+import imp
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+_LIB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'lib')
+
+# WebBlog modules loaded from the source tree, in dependency order
+_WEBBLOG_MODULES = ('webblog_config', 'webblog_dblayer', 'webblog_cache',
+                    'webblog_timeline', 'webblog_recordkind',
+                    'webblog_snapshot', 'webblog_utils', 'webblog_urlchecker',
+                    'bloguploader')
+
+_PHASES = ('parse', 'validate', 'resolve', 'marcxml', 'write')
+
+_DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+
+def _blog_url(number):
+    """ @return: the url of the synthetic blog of the given number """
+
+    return "http://blog%07d.example.org/" % number
+
+
+def _blog_recid(url):
+    """ @return: the recid of the synthetic blog of the given url """
+
+    return int(url[11:18]) + 1
+
+
+class _BenchIntbitset(set):
+    """
+    Stand-in for intbitset when it is not installed
+    """
+
+    def fastdump(self):
+        return ",".join([str(value) for value in sorted(self)])
+
+
+def _make_module(name, **attributes):
+    """ Registers an empty module with the given attributes """
+
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def _install_stubs(workdir):
+    """
+    Registers the stubs of the Invenio modules needed by bloguploader,
+    then loads the WebBlog modules from the source tree
+    @param workdir: directory used as CFG_TMPDIR and CFG_CACHEDIR
+    @return: the bloguploader module
+    """
+
+    package = _make_module('invenio')
+    package.__path__ = []
+
+    try:
+        from intbitset import intbitset
+    except ImportError:
+        intbitset = _BenchIntbitset
+
+    options = {}
+    submissions = []
+
+    def task_low_level_submission(name, user, *argv):
+        submissions.append((name, user, argv))
+        return len(submissions)
+
+    def encode_for_xml(text):
+        return text.replace('&', '&amp;').replace('<', '&lt;')
+
+    def do_nothing(*args, **kwargs):
+        pass
+
+    _make_module('invenio.config', CFG_TMPDIR=workdir, CFG_CACHEDIR=workdir)
+    _make_module('invenio.textutils', encode_for_xml=encode_for_xml)
+    _make_module('invenio.intbitset', intbitset=intbitset)
+    _make_module('invenio.dbquery', run_sql=lambda *args, **kwargs: ())
+    _make_module('invenio.errorlib', register_exception=do_nothing)
+    _make_module('invenio.search_engine_utils',
+                 get_fieldvalues=lambda *args, **kwargs: [])
+    _make_module('invenio.bibdocfile', BibRecDocs=None)
+    _make_module('invenio.bibtask',
+                 task_init=do_nothing, task_update_progress=do_nothing,
+                 write_message=do_nothing, fix_argv_paths=do_nothing,
+                 task_low_level_submission=task_low_level_submission,
+                 task_get_option=options.get,
+                 task_set_option=options.__setitem__,
+                 task_sleep_now_if_required=do_nothing,
+                 bibtask_allocate_sequenceid=lambda *args: 1,
+                 split_cli_ids_arg=do_nothing)
+
+    for name in _WEBBLOG_MODULES:
+        module = imp.load_source('invenio.' + name,
+                                 os.path.join(_LIB_DIR, name + '.py'))
+        setattr(package, name, module)
+
+    def get_recids_by_fieldvalues(tag, values):
+        return dict([(value, intbitset([_blog_recid(value)]))
+                     for value in values])
+
+    def get_record_kinds(recids):
+        return dict([(recid, 'BLOG') for recid in recids])
+
+    bloguploader = sys.modules['invenio.bloguploader']
+    bloguploader.get_recids_by_fieldvalues = get_recids_by_fieldvalues
+    bloguploader.get_record_kinds = get_record_kinds
+    sys.modules['invenio.webblog_urlchecker'].check_url = \
+        lambda url, *args: (True, 200, 'OK')
+    return bloguploader
+
+
+def _write_blog_file(path, size):
+    """ Writes a csv file of SIZE synthetic blogs to insert """
+
+    blog_file = open(path, 'w')
+    try:
+        writer = csv.writer(blog_file, delimiter=',')
+        for number in xrange(size):
+            writer.writerow([_blog_url(number), "Blog %s" % number,
+                             "topic%s" % (number % 3 + 1),
+                             "license%s" % (number % 3 + 1)])
+    finally:
+        blog_file.close()
+
+
+def _run_phase(bloguploader, phase, file_path, workdir):
+    """ Runs the given phase of bloguploader on the given file """
+
+    mode = "insert"
+    if phase == 'parse':
+        for dummy in bloguploader._get_blog_list(file_path):
+            pass
+    elif phase == 'validate':
+        res = bloguploader._check_input_blogs(
+            bloguploader._get_blog_list(file_path), mode)
+        if not res[0]:
+            raise Exception(res[1])
+    elif phase == 'resolve':
+        bloguploader._get_blog_recids(
+            [blog[0] for blog in bloguploader._get_blog_list(file_path)])
+    elif phase == 'marcxml':
+        for dummy in bloguploader._transform_bloglist_to_marcxml(
+                bloguploader._get_blog_list(file_path), mode):
+            pass
+    elif phase == 'write':
+        bloguploader._submit_xml_files(bloguploader._transform_bloglist_to_marcxml(
+            bloguploader._get_blog_list(file_path), mode), mode)
+        for name in os.listdir(workdir):
+            if name.endswith('.xml'):
+                os.remove(os.path.join(workdir, name))
+
+
+def _measure_phase(bloguploader, phase, file_path, workdir):
+    """
+    Runs the given phase in a child process
+    @return: the wall time in seconds and the growth of the peak
+    resident memory in kilobytes, or None if the phase failed
+    @rtype: tuple (float, int)
+    """
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        result = None
+        try:
+            gc.collect()
+            start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            start = time.time()
+            _run_phase(bloguploader, phase, file_path, workdir)
+            result = (time.time() - start,
+                      resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_rss)
+        except Exception, e:
+            sys.stderr.write("Phase %s failed: %s\n" % (phase, e))
+        os.write(write_fd, repr(result))
+        os._exit(0)
+
+    os.close(write_fd)
+    output = ""
+    data = os.read(read_fd, 4096)
+    while data:
+        output += data
+        data = os.read(read_fd, 4096)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    return eval(output or "None")
+
+
+def run_benchmark(sizes=_DEFAULT_SIZES, phases=_PHASES, chunk_size=None,
+                  keep=False):
+    """
+    Runs the phases for synthetic files of the given sizes, printing
+    one line per file and phase
+    @param sizes: numbers of blogs of the synthetic files
+    @type sizes: list of int
+    @param phases: phases to run, among _PHASES
+    @type phases: list of strings
+    @param chunk_size: number of records per MARCXML file
+    @type chunk_size: int
+    @param keep: whether to keep the working directory
+    @type keep: boolean
+    """
+
+    workdir = tempfile.mkdtemp(prefix='bloguploader_benchmark_')
+    try:
+        bloguploader = _install_stubs(workdir)
+        if chunk_size is not None:
+            bloguploader.task_set_option('chunk_size', chunk_size)
+
+        print "%10s  %-10s %10s %12s %12s" % ("blogs", "phase", "seconds",
+                                             "blogs/s", "peak MB")
+        for size in sizes:
+            file_path = os.path.join(workdir, "blogs_%s.csv" % size)
+            _write_blog_file(file_path, size)
+            for phase in phases:
+                # every phase starts with an empty url check cache
+                for name in os.listdir(workdir):
+                    if name.endswith('.cache'):
+                        os.remove(os.path.join(workdir, name))
+                result = _measure_phase(bloguploader, phase, file_path, workdir)
+                if result is None:
+                    print "%10s  %-10s %10s" % (size, phase, "failed")
+                    continue
+                seconds, peak_kb = result
+                print "%10s  %-10s %10.2f %12.0f %12.1f" % \
+                      (size, phase, seconds, size / max(seconds, 0.000001),
+                       peak_kb / 1024.0)
+                sys.stdout.flush()
+            os.remove(file_path)
+    finally:
+        if keep:
+            print "Working directory: %s" % workdir
+        else:
+            shutil.rmtree(workdir)
+
+
+def main():
+    """
+    Main
+    """
+
+    try:
+        opts, dummy = getopt.getopt(sys.argv[1:], "s:p:c:kh",
+                                    ["sizes=", "phases=", "chunk-size=",
+                                     "keep", "help"])
+    except getopt.GetoptError, e:
+        sys.stderr.write("%s\n%s" % (e, __doc__))
+        sys.exit(1)
+
+    sizes = _DEFAULT_SIZES
+    phases = _PHASES
+    chunk_size = None
+    keep = False
+    for key, value in opts:
+        if key in ("-s", "--sizes"):
+            sizes = [int(size) for size in value.split(',')]
+        elif key in ("-p", "--phases"):
+            phases = value.split(',')
+            for phase in phases:
+                if phase not in _PHASES:
+                    sys.stderr.write("Unknown phase: %s\n" % phase)
+                    sys.exit(1)
+        elif key in ("-c", "--chunk-size"):
+            chunk_size = int(value)
+        elif key in ("-k", "--keep"):
+            keep = True
+        elif key in ("-h", "--help"):
+            print __doc__
+            sys.exit(0)
+
+    run_benchmark(sizes, phases, chunk_size, keep)
+
+if __name__ == '__main__':
+    main()
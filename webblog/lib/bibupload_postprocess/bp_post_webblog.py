@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+##
+## This file is part of Invenio.
+## Copyright (C) 2012 CERN.
+##
+## Invenio is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 2 of the
+## License, or (at your option) any later version.
+##
+## Invenio is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Invenio; if not, write to the Free Software Foundation, Inc.,
+## 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+BibUpload post-processing plugin - keeps the WebBlog tables up to
+date with the records that have just been uploaded, and renders the
+uploaded posts and comments in the WebBlog fragment cache
+"""
+
+__revision__ = "$Id$"
+
+from invenio.bibrecord import record_get_field_value
+from invenio.errorlib import register_exception
+from invenio.blogindexer import update_hierarchy
+from invenio.webblog_config import CFG_WEBBLOG_BLOGPOST, CFG_WEBBLOG_COMMENT
+from invenio.webblog_fragments import warm_fragments
+
+
+def bp_post_webblog(record, mode):
+    """
+    Updates the blog hierarchy of the uploaded record, and its
+    snippet if it is a comment
+    @param record: the uploaded record
+    @type record: bibrecord structure
+    @param mode: bibupload mode (insert, replace, correct, ...)
+    @type mode: string
+    """
+
+    recid = record_get_field_value(record, '001')
+    if recid:
+        update_hierarchy([int(recid)])
+        if record_get_field_value(record, '980', code='a') in \
+               (CFG_WEBBLOG_BLOGPOST, CFG_WEBBLOG_COMMENT):
+            try:
+                warm_fragments([int(recid)])
+            except Exception:
+                # the fragment is rendered by the first page view instead
+                register_exception()
@@ -0,0 +1,441 @@
+# -*- coding: utf-8 -*-
+##
+## This file is part of Invenio.
+## Copyright (C) 2012 CERN.
+##
+## Invenio is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 2 of the
+## License, or (at your option) any later version.
+##
+## Invenio is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Invenio; if not, write to the Free Software Foundation, Inc.,
+## 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+Blog Indexer:
+
+Usage: /opt/invenio/bin/blogindexer [options]
+
+Blog indexer options:
+    -a, --add              Index the records modified since the last run
+                           (default)
+    -i, --id=RECIDS        Index the given records, e.g. -i 1,3-5
+    -R, --rebuild          Rebuild the blog hierarchy, the blog
+                           statistics, the comment snippets and the
+                           url index from scratch
+    -S, --statistics       Rebuild the blog statistics from the blog
+                           hierarchy
+    -M, --snapshot         Write the snapshot of the blog hierarchy shared
+                           by the web server processes
+
+Examples:
+    $ blogindexer -s 5m
+    Keep the blog hierarchy up to date every five minutes. Needed
+    for the records uploaded without the bp_post_webblog bibupload
+    plugin, such as the ones of the crawler.
+
+    $ blogindexer -R
+    Rebuild the blog hierarchy of the whole archive.
+
+    $ blogindexer -M -s 10m
+    Write a new snapshot of the blog hierarchy every ten minutes.
+
+    $ blogindexer -S
+    Recompute the post and comment counts, dates and file sizes
+    of all the blogs.
+
+"""
+
+__revision__ = "$Id$"
+
+import re
+from invenio.bibdocfile import BibRecDocs
+from invenio.bibformat_utils import get_contextual_content
+from invenio.errorlib import register_exception
+from invenio.bibtask import task_init, task_update_progress, write_message, \
+    task_get_option, task_set_option, task_sleep_now_if_required, \
+    split_cli_ids_arg
+from invenio.webblog_config import CFG_WEBBLOG_BLOG, \
+    CFG_WEBBLOG_BLOGPOST, CFG_WEBBLOG_COMMENT, CFG_WEBBLOG_DELETED, \
+    CFG_WEBBLOG_INDEXER_CHUNK_SIZE, CFG_WEBBLOG_SNIPPET_LENGTH
+from invenio.webblog_cache import webblog_cache_invalidate
+from invenio.webblog_snapshot import write_snapshot
+from invenio.webblog_dblayer import get_fieldvalues_for_records, \
+    get_existing_recids, get_recids_modified_since, get_all_recids, \
+    update_hierarchy_entries, delete_hierarchy_entries, truncate_hierarchy, \
+    get_index_last_updated, set_index_last_updated, get_db_datetime, \
+    get_recids_with_files, get_hierarchy_entries_for_records, \
+    add_to_statistics, rebuild_statistics, truncate_statistics, \
+    update_snippet_entries, delete_snippet_entries, truncate_snippets, \
+    add_url_entries, delete_url_entries, truncate_urls
+from invenio.webblog_utils import get_url_hash
+
+_RE_PUBDATE = re.compile(r'^(\d{4}-\d{2}-\d{2})([ T](\d{2}:\d{2})(:\d{2})?)?')
+
+
+def _wash_pubdate(value):
+    """
+    @param value: publication date as stored in 269__c
+    @type value: string
+    @return: the date as a MySQL datetime string, or the zero
+    date if it cannot be understood
+    @rtype: string
+    """
+
+    match = _RE_PUBDATE.match(value or '')
+    if not match:
+        return '0000-00-00 00:00:00'
+    return "%s %s%s" % (match.group(1),
+                        match.group(3) or '00:00',
+                        match.group(4) or ':00')
+
+
+def _first_int(values):
+    """
+    @param values: list of field values
+    @type values: list
+    @return: the first value as an integer, or 0
+    @rtype: int
+    """
+
+    if values:
+        try:
+            return int(values[0])
+        except ValueError:
+            pass
+    return 0
+
+
+def get_filesizes(recids):
+    """
+    @param recids: records recids
+    @type recids: list or intbitset
+    @return: total size in bytes of the files attached to each
+    record having some
+    @rtype: dict {recid: size}
+    """
+
+    out = {}
+    for recid in get_recids_with_files(recids):
+        try:
+            out[recid] = BibRecDocs(recid).get_total_size()
+        except Exception:
+            register_exception()
+    return out
+
+
+def get_hierarchy_entries(recids):
+    """
+    Computes the hierarchy entries of the given records from their
+    metadata with a fixed number of queries
+    @param recids: records recids
+    @type recids: list or intbitset
+    @return: one entry per existing record
+    @rtype: list of tuples (recid, kind, id_blog, id_post, pubdate,
+    filesize)
+    """
+
+    colls = get_fieldvalues_for_records(recids, '980__a')
+    deleted = get_fieldvalues_for_records(recids, '980__c')
+    blogs = get_fieldvalues_for_records(recids, '760__w')
+    posts = get_fieldvalues_for_records(recids, '773__w')
+    pubdates = get_fieldvalues_for_records(recids, '269__c')
+    filesizes = get_filesizes(recids)
+
+    entries = []
+    for recid in recids:
+        if CFG_WEBBLOG_DELETED in deleted.get(recid, []):
+            kind = CFG_WEBBLOG_DELETED
+        else:
+            kind = colls.get(recid, [''])[0]
+        id_post = _first_int(posts.get(recid))
+        id_blog = _first_int(blogs.get(recid))
+        entries.append([recid, kind, id_blog, id_post,
+                        _wash_pubdate(pubdates.get(recid, [''])[0]),
+                        filesizes.get(recid, 0)])
+
+    # comments belong to the blog of their parent post
+    orphan_comments = [entry for entry in entries
+                       if entry[3] and not entry[2]]
+    if orphan_comments:
+        post_blogs = get_fieldvalues_for_records(
+            [entry[3] for entry in orphan_comments], '760__w')
+        for entry in orphan_comments:
+            entry[2] = _first_int(post_blogs.get(entry[3]))
+
+    return [tuple(entry) for entry in entries]
+
+
+def _truncate(value, length):
+    """
+    @param value: UTF-8 string
+    @type value: string
+    @param length: maximum number of characters
+    @type length: int
+    @return: the first characters of value, without any marker:
+    bfe_comment_navigation follows the snippets with ' [...]'
+    @rtype: string
+    """
+
+    value = value.decode('utf-8', 'ignore')
+    if len(value) > length:
+        value = value[:length].rstrip()
+    return value.encode('utf-8')
+
+
+def get_snippet_entries(recids):
+    """
+    Computes the author and the one-line snippet of the given comments
+    @param recids: comments recids
+    @type recids: list
+    @return: one entry per comment
+    @rtype: list of tuples (recid, id_post, author, snippet)
+    """
+
+    contents = get_fieldvalues_for_records(recids, '520__a')
+    authors = get_fieldvalues_for_records(recids, '100__a')
+    posts = get_fieldvalues_for_records(recids, '773__w')
+
+    entries = []
+    for recid in recids:
+        content = contents.get(recid, [''])[0]
+        snippet = ''
+        if content:
+            lines = get_contextual_content(content, [], max_lines=1)
+            if lines:
+                snippet = lines[0]
+        entries.append((recid, _first_int(posts.get(recid)),
+                        _truncate(authors.get(recid, [''])[0], 255),
+                        _truncate(snippet, CFG_WEBBLOG_SNIPPET_LENGTH)))
+    return entries
+
+
+def get_url_entries(recids):
+    """
+    Computes the url index entries of the given records
+    @param recids: records recids
+    @type recids: list
+    @return: one entry per record and distinct url
+    @rtype: list of tuples (recid, url hash)
+    """
+
+    entries = set()
+    for recid, urls in get_fieldvalues_for_records(recids, '520__u').iteritems():
+        for url in urls:
+            if url.strip():
+                entries.add((recid, get_url_hash(url)))
+    return list(entries)
+
+
+def _get_statistics_contribution(recid, kind, id_blog, filesize):
+    """
+    @return: the blog whose statistics count the given record and
+    what the record adds to them, or None if it counts nowhere
+    @rtype: tuple (blog recid, (posts, comments, filesize))
+    """
+
+    if kind == CFG_WEBBLOG_DELETED:
+        return None
+    if kind == CFG_WEBBLOG_BLOG:
+        blog_recid = recid
+    elif id_blog:
+        blog_recid = id_blog
+    else:
+        return None
+    return (blog_recid, (int(kind == CFG_WEBBLOG_BLOGPOST),
+                         int(kind == CFG_WEBBLOG_COMMENT),
+                         filesize))
+
+
+def _get_statistics_deltas(old_entries, new_entries):
+    """
+    @param old_entries: indexed entries of some records, as returned
+    by get_hierarchy_entries_for_records()
+    @type old_entries: dict
+    @param new_entries: new entries of the same records, as returned
+    by get_hierarchy_entries()
+    @type new_entries: list
+    @return: what has to be added to the statistics of each blog
+    @rtype: dict {blog recid: (posts, comments, filesize)}
+    """
+
+    deltas = {}
+
+    def add(contribution, sign):
+        if contribution is None:
+            return
+        blog_recid, values = contribution
+        delta = deltas.setdefault(blog_recid, [0, 0, 0])
+        for i in range(3):
+            delta[i] += sign * values[i]
+
+    for recid, (kind, id_blog, dummy, filesize) in old_entries.items():
+        add(_get_statistics_contribution(recid, kind, id_blog, filesize), -1)
+    for recid, kind, id_blog, dummy, dummy, filesize in new_entries:
+        add(_get_statistics_contribution(recid, kind, id_blog, filesize), 1)
+
+    return dict([(blog_recid, tuple(delta))
+                 for blog_recid, delta in deltas.items()])
+
+
+def update_hierarchy(recids):
+    """
+    Updates the blog hierarchy, the blog statistics, the comment
+    snippets and the url index of the given records. Records that
+    do not exist any longer are removed from the hierarchy.
+    @param recids: records recids
+    @type recids: list or intbitset
+    """
+
+    recids = list(recids)
+    old_entries = get_hierarchy_entries_for_records(recids)
+    existing_recids = get_existing_recids(recids)
+    missing_recids = set(recids) - set(existing_recids)
+    if missing_recids:
+        delete_hierarchy_entries(missing_recids)
+    entries = get_hierarchy_entries(existing_recids)
+
+    # only the comments have a snippet
+    comment_recids = [entry[0] for entry in entries
+                      if entry[1] == CFG_WEBBLOG_COMMENT]
+    other_recids = set(recids) - set(comment_recids)
+    if other_recids:
+        delete_snippet_entries(other_recids)
+    if comment_recids:
+        update_snippet_entries(get_snippet_entries(comment_recids))
+
+    # deleted records do not archive their urls any longer
+    live_recids = [entry[0] for entry in entries
+                   if entry[1] != CFG_WEBBLOG_DELETED]
+    delete_url_entries(recids)
+    if live_recids:
+        add_url_entries(get_url_entries(live_recids))
+
+    # written last: the web processes invalidate their cache when the
+    # hierarchy entries and the statistics are updated
+    update_hierarchy_entries(entries)
+    add_to_statistics(_get_statistics_deltas(old_entries, entries))
+
+    # the cached data of the records and of their old and new parents
+    # is outdated
+    touched_recids = set(recids)
+    for entry in old_entries.values():
+        touched_recids.update(entry[1:3])
+    for entry in entries:
+        touched_recids.update(entry[2:4])
+    touched_recids.discard(0)
+    webblog_cache_invalidate(touched_recids)
+
+
+def _index_records(recids):
+    """
+    Indexes the given records chunk by chunk, reporting progress
+    @param recids: records recids
+    @type recids: list
+    """
+
+    total = len(recids)
+    for i in range(0, total, CFG_WEBBLOG_INDEXER_CHUNK_SIZE):
+        chunk = recids[i:i + CFG_WEBBLOG_INDEXER_CHUNK_SIZE]
+        update_hierarchy(chunk)
+        done = i + len(chunk)
+        task_update_progress("Indexed %s of %s records" % (done, total))
+        write_message("Indexed %s of %s records" % (done, total), verbose=2)
+        task_sleep_now_if_required(can_stop_too=True)
+
+
+def _blogindexer_task_run_core():
+    """
+     Run Blog Indexer Task
+    """
+
+    starting_time = get_db_datetime()
+    if task_get_option('cmd') == 'rebuild':
+        write_message("Rebuilding the blog hierarchy started")
+        truncate_hierarchy()
+        truncate_statistics()
+        truncate_snippets()
+        truncate_urls()
+        _index_records(get_all_recids())
+        set_index_last_updated('hierarchy', starting_time)
+        write_message("Rebuilding the blog hierarchy finished")
+    elif task_get_option('cmd') == 'statistics':
+        write_message("Rebuilding the blog statistics started")
+        task_update_progress("Rebuilding the blog statistics")
+        rebuild_statistics()
+        write_message("Rebuilding the blog statistics finished")
+    elif task_get_option('cmd') == 'snapshot':
+        write_message("Writing the blog hierarchy snapshot started")
+        task_update_progress("Writing the blog hierarchy snapshot")
+        max_recid = write_snapshot()
+        write_message("Writing the blog hierarchy snapshot finished, "
+                      "highest recid: %s" % max_recid)
+    elif task_get_option('id'):
+        write_message("Indexing the given records started")
+        _index_records(sorted(task_get_option('id')))
+        write_message("Indexing the given records finished")
+    else:
+        last_updated = get_index_last_updated('hierarchy')
+        if last_updated is None:
+            write_message("The blog hierarchy was never built, "
+                          "indexing all the records")
+            recids = get_all_recids()
+        else:
+            recids = get_recids_modified_since(last_updated)
+        write_message("Indexing %s modified records started" % len(recids))
+        _index_records(recids)
+        set_index_last_updated('hierarchy', starting_time)
+        write_message("Indexing modified records finished")
+
+    task_update_progress("Done.")
+    return True
+
+
+def _blogindexer_elaborate_submit_parameter(key, value, opts, args):
+    """
+    Elaborate task submission parameter. See bibtask's
+    task_submit_elaborate_specific_parameter_fnc for help.
+    """
+
+    if key in ("-a", "--add"):
+        task_set_option('cmd', 'add')
+    elif key in ("-R", "--rebuild"):
+        task_set_option('cmd', 'rebuild')
+    elif key in ("-S", "--statistics"):
+        task_set_option('cmd', 'statistics')
+    elif key in ("-M", "--snapshot"):
+        task_set_option('cmd', 'snapshot')
+    elif key in ("-i", "--id"):
+        task_set_option('id', split_cli_ids_arg(value))
+    else:
+        return False
+
+    return True
+
+
+def main():
+    """
+    Main
+    """
+
+    task_init(authorization_action='runblogindexer',
+              authorization_msg="Blog Indexer Task Submission",
+              help_specific_usage=__doc__,
+              version=__revision__,
+              specific_params=("aRSMi:",
+                               ["add",
+                                "rebuild",
+                                "statistics",
+                                "snapshot",
+                                "id="]),
+              task_submit_elaborate_specific_parameter_fnc=_blogindexer_elaborate_submit_parameter,
+              task_run_fnc=_blogindexer_task_run_core)
+
+if __name__ == '__main__':
+    main()
@@ -24,10 +24,32 @@ Usage: /opt/invenio/bin/bloguploader [mode option]
 
 Blog uploader mode options:
     Commands:
-        NOTE: Options -i, -d and -U are mutually exclusive (XOR)!
+        NOTE: Options -i, -d, -U, -m and --sync are mutually exclusive (XOR)!
         -i, --blog_insert      Insert a list of blogs
         -d, --blog_delete      Delete a list of blogs
         -U, --blog_update      Update a list of blogs
+        -m, --manifest         Insert, update and delete the blogs of a
+                               list where each row starts with its
+                               operation
+        --sync                 Insert, update and delete blogs so that
+                               the blogs of the archive are the ones
+                               of the given list
+    Options:
+        --chunk_size=N         Number of records per bibupload task
+                               (default: 5000)
+        --pretend              With -U or --sync, only show the changes
+                               that would be uploaded
+        --force                With --sync, delete the blogs missing
+                               from the list even if there are more
+                               than CFG_WEBBLOG_SYNC_MAX_DELETIONS
+
+    -i skips the blogs whose url is already archived, or repeated in the
+    file, comparing canonical urls (no scheme, 'www.', trailing slash or
+    '/wp' suffix).
+    The list of blogs can be compressed (.gz or .bz2), or read from the
+    standard input if it is '-'.
+    An interrupted -i, -d or -m run on the same file with the same chunk
+    size resumes after the last bibupload task it submitted.
 
 Examples:
     $ bloguploader -i list_new_blogs.csv
@@ -46,37 +68,283 @@ Examples:
     http://aida.jiscinvolve.org/,Aida_update,topic3,license3
     http://astrodabis.jiscinvolve.org/wp/,Astrodabis,trinity,topic3,license3
 
+    $ bloguploader -m nightly_manifest.csv
+    An example of 'nightly_manifest.csv' is:
+    insert,http://aida.jiscinvolve.org/,aida,topic1,license1
+    update,http://vibel.jiscinvolve.org/,Vibel,topic2,license1
+    delete,http://astrodabis.jiscinvolve.org/wp/
+    Deletions are submitted first, then updates, then insertions.
+
+    $ bloguploader --sync all_blogs.csv
+    where 'all_blogs.csv' has the format of 'list_new_blogs.csv'.
+
+    $ crawler_export | bloguploader -i -
+    $ bloguploader -d list_blogs_to_delete.csv.bz2
+
 """
 
 __revision__ = "$Id$"
 
+import bz2
 import csv
+import gzip
+import hashlib
 import os
+import shutil
+import sys
+import tempfile
 import time
+from itertools import islice
+from invenio.config import CFG_TMPDIR
+from invenio.textutils import encode_for_xml
 from invenio.bibtask import task_init, task_update_progress, write_message, \
-    fix_argv_paths, task_low_level_submission, task_get_option, task_set_option
-from invenio.webblog_utils import get_blog_descendants
-from invenio.webbasket import url_is_valid
+    fix_argv_paths, task_low_level_submission, task_get_option, \
+    task_set_option, task_sleep_now_if_required, bibtask_allocate_sequenceid
+from invenio.webblog_config import CFG_WEBBLOG_UPLOADER_CHUNK_SIZE, \
+    CFG_WEBBLOG_UPLOADER_JOURNAL_DIR, CFG_WEBBLOG_DELETED, \
+    CFG_WEBBLOG_URLCHECK_BATCH_SIZE, CFG_WEBBLOG_SYNC_MAX_DELETIONS
+from invenio.webblog_utils import get_blog_descendants, \
+    get_bibupload_plugin_options, get_record_kinds, \
+    get_canonical_blog_url, get_blog_url_index
+from invenio.webblog_dblayer import get_recids_by_fieldvalues, \
+    get_fieldvalues_for_records, get_task_with_argument
+from invenio.webblog_urlchecker import WebBlogURLChecker, \
+    WebBlogURLCheckReport
 from invenio.search_engine_utils import get_fieldvalues
-from invenio.search_engine import perform_request_search
+from invenio.intbitset import intbitset
+
+# fields of the blog records updated by -U, with their MARC tags
+_UPDATED_FIELDS = (('title', '245__a'),
+                   ('license', '542__a'),
+                   ('topic', '654__a'))
 
+# prefix of the files where the standard input is copied
+_STDIN_PREFIX = 'bloguploader_stdin_'
 
-def _write_xml_file(blogs_xml, mode):
+# operations of a manifest, in the order they are submitted: blogs
+# deleted first can be inserted again
+_MANIFEST_OPERATIONS = ('delete', 'update', 'insert')
+
+
+def _write_xml_files(records, mode, chunk_size, nb_files=0):
     """
-    @param blogs_xml: the final marcxml output containing all
-    the records to be inserted, deleted or updated by bibupload
-    @type blogs_xml: string
+    @param records: the marcxml records to be inserted, deleted
+    or updated by bibupload
+    @type records: iterable of strings
     @param mode: insert, delete or update
     @type mode: string
-    @return: final xml file which will be the input to bibupload
-    @rtype: xml file
+    @param chunk_size: maximum number of records per file
+    @type chunk_size: int
+    @param nb_files: number of files already written for these
+    records by an interrupted run
+    @type nb_files: int
+    @return: generator of the paths of the xml files, which will be
+    the input to bibupload, with their number of records. Every file
+    is yielded as soon as it is complete, so that it can be uploaded
+    while the next ones are written.
+    @rtype: generator of tuples (path, nb_records)
     """
 
-    file_path = '/tmp/blogs_to_%s_%s.xml' % (mode, time.strftime("%Y%m%d_%H%M%S"))
-    xml_file = open(file_path, 'w')
-    xml_file.write(blogs_xml.encode('utf-8'))
-    xml_file.close()
-    return file_path
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    xml_file = None
+    nb_records = 0
+    for record in records:
+        if xml_file is None:
+            nb_files += 1
+            fd, file_path = tempfile.mkstemp(prefix='blogs_to_%s_%s_%s_' % \
+                                             (mode, timestamp, nb_files),
+                                             suffix='.xml', dir=CFG_TMPDIR)
+            xml_file = os.fdopen(fd, 'w')
+            xml_file.write(_create_marcxml_header())
+        xml_file.write(record)
+        nb_records += 1
+        if nb_records >= chunk_size:
+            xml_file.write(_create_marcxml_footer())
+            xml_file.close()
+            yield (file_path, nb_records)
+            xml_file = None
+            nb_records = 0
+
+    if xml_file is not None:
+        xml_file.write(_create_marcxml_footer())
+        xml_file.close()
+        yield (file_path, nb_records)
+
+
+def _get_journal_path(file_path, mode):
+    """
+    @param file_path: the input file of bloguploader
+    @type file_path: string
+    @param mode: insert or delete
+    @type mode: string
+    @return: the path of the journal of the runs uploading the given
+    file in the given mode. It depends on the checksum of the file and
+    on the chunk size, so that a modified file is uploaded again from
+    its beginning.
+    @rtype: string
+    """
+
+    checksum = hashlib.md5()
+    input_file = open(file_path, 'rb')
+    try:
+        data = input_file.read(1024 * 1024)
+        while data:
+            checksum.update(data)
+            data = input_file.read(1024 * 1024)
+    finally:
+        input_file.close()
+    chunk_size = task_get_option('chunk_size', CFG_WEBBLOG_UPLOADER_CHUNK_SIZE)
+    return os.path.join(CFG_WEBBLOG_UPLOADER_JOURNAL_DIR, "%s_%s_%s.journal" % \
+                        (mode, checksum.hexdigest(), chunk_size))
+
+
+def _make_journal_dir(path):
+    """ Creates the directory of the given journal file if needed """
+
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+
+def _read_journal(journal_path):
+    """
+    @param journal_path: path of a journal
+    @type journal_path: string
+    @return: the number of chunks of records already submitted, and
+    the file and number of records of the next chunk if the run was
+    interrupted while it was being submitted, otherwise None
+    @rtype: tuple (int, tuple (string, int))
+    """
+
+    if not os.path.exists(journal_path):
+        return (0, None)
+    submitted = set()
+    pending = {}
+    journal = open(journal_path)
+    try:
+        for line in journal:
+            # a line is only complete once it was synced
+            if not line.endswith('\n'):
+                break
+            values = line[:-1].split(' ', 3)
+            if values[1] == '-':
+                pending[int(values[0])] = (values[3], int(values[2]))
+            else:
+                submitted.add(int(values[0]))
+    finally:
+        journal.close()
+
+    nb_chunks = 0
+    while nb_chunks + 1 in submitted:
+        nb_chunks += 1
+    return (nb_chunks, pending.get(nb_chunks + 1))
+
+
+def _journal_started(journal_path):
+    """ @return: True if a run started submitting chunks with the
+    given journal """
+
+    nb_chunks, pending = _read_journal(journal_path)
+    return bool(nb_chunks or pending)
+
+
+def _write_to_journal(journal_path, chunk, task_id, nb_records, xml_file=None):
+    """
+    Records in the journal that a chunk of records is about to be
+    submitted (task_id being None), or was submitted
+    @param chunk: number of the chunk, starting at 1
+    @param task_id: id of the bibupload task uploading the chunk
+    @param nb_records: number of records of the chunk
+    @param xml_file: file of the chunk, for the chunks about to be
+    submitted
+    """
+
+    _make_journal_dir(journal_path)
+    journal = open(journal_path, 'a')
+    try:
+        if task_id is None:
+            journal.write("%s - %s %s\n" % (chunk, nb_records, xml_file))
+        else:
+            journal.write("%s %s %s\n" % (chunk, task_id, nb_records))
+        journal.flush()
+        os.fsync(journal.fileno())
+    finally:
+        journal.close()
+
+
+def _submit_xml_files(records, mode, journal_path=None):
+    """
+    @param records: the marcxml records to be inserted, deleted
+    or updated by bibupload
+    @type records: iterable of strings
+    @param mode: insert, delete or update
+    @type mode: string
+    @param journal_path: journal where every submitted chunk of records
+    is recorded. The chunks it already records are not submitted
+    again, and it is removed once all the records are submitted.
+    @type journal_path: string
+    @return: ids of the submitted bibupload tasks, one per chunk
+    of records
+    @rtype: list
+    """
+
+    if mode == "insert":
+        bibupload_mode = ['-i']
+    else:
+        bibupload_mode = ['-c']
+    if task_get_option('sequence_id') is not None:
+        # run after the tasks submitted before for the same manifest
+        bibupload_mode += ['-I', str(task_get_option('sequence_id'))]
+
+    chunk_size = task_get_option('chunk_size', CFG_WEBBLOG_UPLOADER_CHUNK_SIZE)
+    nb_chunks_done = 0
+    if journal_path is not None:
+        nb_chunks_done, pending = _read_journal(journal_path)
+        if pending is not None:
+            # the run was interrupted around the submission of the
+            # next chunk, which is only submitted again if bibsched
+            # does not know its task
+            task_id = get_task_with_argument('bibupload', pending[0])
+            if task_id is not None:
+                nb_chunks_done += 1
+                _write_to_journal(journal_path, nb_chunks_done, task_id,
+                                  pending[1])
+                write_message("Chunk %s was submitted as bibupload task #%s" % \
+                              (nb_chunks_done, task_id))
+            elif os.path.exists(pending[0]):
+                # the chunk is written again below
+                os.remove(pending[0])
+        if nb_chunks_done:
+            write_message("Resuming after chunk %s recorded in %s" % \
+                          (nb_chunks_done, journal_path))
+            records = islice(records, nb_chunks_done * chunk_size, None)
+
+    task_ids = []
+    nb_records_done = 0
+    start = time.time()
+    for xml_file, nb_records in _write_xml_files(records, mode, chunk_size,
+                                                 nb_chunks_done):
+        chunk = nb_chunks_done + len(task_ids) + 1
+        if journal_path is not None:
+            _write_to_journal(journal_path, chunk, None, nb_records, xml_file)
+        task_id = task_low_level_submission('bibupload', 'webblog',
+                                            *(bibupload_mode + [xml_file] +
+                                              get_bibupload_plugin_options()))
+        task_ids.append(task_id)
+        if journal_path is not None:
+            _write_to_journal(journal_path, chunk, task_id, nb_records)
+        nb_records_done += nb_records
+        write_message("Submitted bibupload task #%s for %s (%s records)" % \
+                      (task_id, xml_file, nb_records))
+        task_update_progress("Submitted chunk %s: %s records, %.1f records/s" % \
+                             (nb_chunks_done + len(task_ids), nb_records_done,
+                              nb_records_done / max(time.time() - start, 0.001)))
+        # the journal lets a stopped task resume after this chunk
+        task_sleep_now_if_required(can_stop_too=True)
+
+    if journal_path is not None and os.path.exists(journal_path):
+        os.remove(journal_path)
+    return task_ids
 
 
 def _topic_is_valid(topic):
@@ -105,31 +373,180 @@ def _license_is_valid(license):
     return license in valid_licenses
 
 
+def _get_blog_recids(blog_urls):
+    """
+    Finds the records of many blogs at once, with a few queries on the
+    520__u values instead of one search per blog
+    @param blog_urls: urls of the blogs
+    @type blog_urls: iterable of strings
+    @return: the recid of every blog found in the archive, and the urls
+    that were not found. If several existing records have the same
+    url, the oldest one is taken.
+    @rtype: tuple ({blog_url: recid}, [blog_url1, blog_url2, ...])
+    """
+
+    blog_urls = list(blog_urls)
+    recids_by_url = get_recids_by_fieldvalues('520__u', blog_urls)
+    candidates = intbitset()
+    for recids in recids_by_url.values():
+        candidates |= recids
+    kinds = get_record_kinds(candidates)
+
+    blog_recids = {}
+    unknown_urls = []
+    unknown_url_set = set()
+    for blog_url in blog_urls:
+        if blog_url in blog_recids or blog_url in unknown_url_set:
+            continue
+        for recid in recids_by_url.get(blog_url, []):
+            if kinds.get(recid) not in ('', CFG_WEBBLOG_DELETED):
+                blog_recids[blog_url] = recid
+                break
+        else:
+            unknown_urls.append(blog_url)
+            unknown_url_set.add(blog_url)
+
+    return (blog_recids, unknown_urls)
+
+
+def _raise_unknown_blogs(unknown_urls):
+    """
+    @param unknown_urls: urls of the blogs that were not found
+    @type unknown_urls: list
+    @raise Exception: listing all the given urls
+    """
+
+    message = "The following %s blogs do not seem to exist in the " \
+              "archive:\n%s" % (len(unknown_urls), "\n".join(unknown_urls))
+    write_message(message)
+    raise Exception(message)
+
+
+def _get_blog_changes(blog_list, blog_recids):
+    """
+    Compares the title, license and topic requested for every blog
+    to the ones stored in its record
+    @param blog_list: lists where each individual list is
+    representing the blog the user wants to update
+    @type blog_list: iterable of lists
+    @param blog_recids: the recid of every blog found in the archive
+    @type blog_recids: dict {blog_url: recid}
+    @return: the blogs whose record differs, with their new values and
+    the changes as (field, stored values, requested value), and the
+    number of blogs whose record does not change
+    @rtype: tuple ([(blog_url, recid, values, changes), ...], int)
+    """
+
+    blog_list = [blog for blog in blog_list if blog[0] in blog_recids]
+    recids = [blog_recids[blog[0]] for blog in blog_list]
+    stored = {}
+    for field, tag in _UPDATED_FIELDS:
+        stored[field] = get_fieldvalues_for_records(recids, tag)
+
+    blogs_to_update = []
+    nb_unchanged = 0
+    for blog in blog_list:
+        recid = blog_recids[blog[0]]
+        values = {'title': blog[1], 'topic': blog[2], 'license': blog[3]}
+        if not values['title'] and stored['title'].get(recid):
+            # the title is not mandatory: keep the stored one
+            values['title'] = stored['title'][recid][0]
+        changes = []
+        for field, dummy in _UPDATED_FIELDS:
+            stored_values = stored[field].get(recid, [])
+            if stored_values != [values[field]]:
+                changes.append((field, stored_values, values[field]))
+        if changes:
+            blogs_to_update.append((blog[0], recid, values, changes))
+        else:
+            nb_unchanged += 1
+
+    return (blogs_to_update, nb_unchanged)
+
+
+def _write_new_blogs(blog_list, output_path):
+    """
+    Writes to a new csv file the blogs that are not archived yet,
+    each of them once, looking up their canonical url in the index
+    of the urls of the archive. Malformed rows are written as they
+    are, to be reported by the validation of the new file.
+    @param blog_list: lists where each individual list is
+    representing the blog the user wants to insert
+    @type blog_list: iterable of lists
+    @param output_path: csv file to write
+    @type output_path: string
+    @return: the number of blogs written
+    @rtype: int
+    """
+
+    url_index = get_blog_url_index()
+    seen_urls = {}
+    nb_blogs = nb_archived = nb_repeated = 0
+    _make_journal_dir(output_path)
+    output_file = open(output_path, 'w')
+    try:
+        writer = csv.writer(output_file, delimiter=',')
+        for blog in blog_list:
+            if not blog:
+                writer.writerow(blog)
+                continue
+            canonical_url = get_canonical_blog_url(blog[0])
+            if canonical_url in url_index:
+                write_message("Blog '%s' is already archived as record #%s" % \
+                              (blog[0], url_index[canonical_url]))
+                nb_archived += 1
+            elif canonical_url in seen_urls:
+                write_message("Blog '%s' is the same as '%s'" % \
+                              (blog[0], seen_urls[canonical_url]))
+                nb_repeated += 1
+            else:
+                seen_urls[canonical_url] = blog[0]
+                writer.writerow(blog)
+                nb_blogs += 1
+    finally:
+        output_file.close()
+
+    write_message("%s new blogs, %s already archived, %s repeated in the file." % \
+                  (nb_blogs, nb_archived, nb_repeated))
+    return nb_blogs
+
+
 def _get_records_to_delete(blog_list):
     """
     @param blog_list: list of blogs to delete from the archive
     @type blog_list: list of lists where each individual list is
     a blog url
-    @return: list of all the descendants of all the blogs the
+    @return: all the descendants of all the blogs the
     user wants to delete included the blogs themselfs
-    @rtype: list of recids
+    @rtype: intbitset
     """
 
-    records_to_delete = []
-    for blog in blog_list:
-        blog_url = blog[0]
-        # search for the recid of the blog we want to delete
-        list_recid = perform_request_search(p='520__u:"%s"' % blog_url)
-        if list_recid:
-            blog_recid = list_recid[0]
-            # search for all the children recid's
-            records_to_delete += get_blog_descendants(blog_recid)
-            records_to_delete.append(blog_recid)
-        else:
-            raise Exception("Blog with the url '" + str(blog_url) +\
-                            "' does not seem to exist in the archive")
+    blog_recids, unknown_urls = _get_blog_recids([blog[0] for blog in blog_list])
+    if unknown_urls:
+        _raise_unknown_blogs(unknown_urls)
+    blog_recids = intbitset(blog_recids.values())
 
-    return records_to_delete
+    # search for all the children recid's at once
+    return get_blog_descendants(blog_recids) | blog_recids
+
+
+def _print_blog_changes(blogs_to_update, unknown_urls):
+    """
+    Writes the changes of every blog to update, and the missing blogs
+    @param blogs_to_update: as returned by _get_blog_changes()
+    @type blogs_to_update: list
+    @param unknown_urls: urls of the blogs that were not found
+    @type unknown_urls: list
+    """
+
+    for blog_url, recid, dummy, changes in blogs_to_update:
+        write_message("Blog '%s' (record #%s):" % (blog_url, recid))
+        for field, stored_values, value in changes:
+            stored_values = ", ".join([repr(stored_value) for stored_value
+                                       in stored_values]) or "nothing"
+            write_message("    %s: %s -> %r" % (field, stored_values, value))
+    for blog_url in unknown_urls:
+        write_message("Blog '%s': missing" % blog_url)
 
 
 def _create_marcxml_header():
@@ -143,16 +560,13 @@ def _create_marcxml_header():
     return marcxml_output
 
 
-def _create_marcxml_footer(marcxml_output):
+def _create_marcxml_footer():
     """
-    @param marcxml_output: the final marcxml output
-    @type param: string
-    @return: the final marcxml output plus marcxml footer
+    @return: the marcxml footer
     @rtype: string
     """
 
-    marcxml_output += '\n</collection>\n'
-    return marcxml_output
+    return '\n</collection>\n'
 
 
 def _create_marcxml_record_template(mode):
@@ -207,60 +621,44 @@ def _create_marcxml_record_template(mode):
 
 def _transform_bloglist_to_marcxml(blog_list, mode):
     """
-    @param blog_list: list of lists where each individual
-    list is representing the blog the user wants to insert,
-    delete or update
-    @type blog_list: list of lists
+    @param blog_list: lists where each individual list is
+    representing the blog the user wants to insert, the blogs to
+    update as returned by _get_blog_changes(), or recids of the
+    records to delete
+    @type blog_list: iterable of lists, of tuples, or of recids
     @param mode: insert, delete or update
     @type mode: string
-    @return: the final marcxml output containing all
-    the records to be inserted, deleted or updated by bibupload
-    @rtype: string
+    @return: generator of the marcxml records to be inserted,
+    deleted or updated by bibupload
     """
 
-    marcxml_output = _create_marcxml_header()
     record_template = _create_marcxml_record_template(mode)
 
     if mode == "insert":
         for blog in blog_list:
-            blog_url = blog[0]
-            blog_title = blog[1]
-            blog_topic = blog[2]
-            blog_license = blog[3]
-            record = record_template % {'coll': 'INITIALBLOG',
-                                        'title': blog_title,
-                                        'url': blog_url,
-                                        'topic': blog_topic,
-                                        'license': blog_license}
-            marcxml_output += record
+            blog_url = encode_for_xml(blog[0])
+            blog_title = encode_for_xml(blog[1])
+            blog_topic = encode_for_xml(blog[2])
+            blog_license = encode_for_xml(blog[3])
+            yield record_template % {'coll': 'INITIALBLOG',
+                                     'title': blog_title,
+                                     'url': blog_url,
+                                     'topic': blog_topic,
+                                     'license': blog_license}
 
     elif mode == "update":
-        for blog in blog_list:
-            blog_url = blog[0]
-            blog_title = blog[1]
-            blog_topic = blog[2]
-            blog_license = blog[3]
-            list_recid = perform_request_search(p='520__u:"%s"' % blog_url)
-            if list_recid:
-                blog_recid = list_recid[0]
-                record = record_template % {'recid': blog_recid,
-                                            'title': blog_title,
-                                            'topic': blog_topic,
-                                            'license': blog_license}
-                marcxml_output += record
-            else:
-                raise Exception("Blog with the url '" + str(blog_url) + "' does not seem to exist in the archive")
+        for dummy, recid, values, dummy in blog_list:
+            yield record_template % {'recid': recid,
+                                     'title': encode_for_xml(values['title']),
+                                     'topic': encode_for_xml(values['topic']),
+                                     'license': encode_for_xml(values['license'])}
 
     elif mode == "delete":
         for recid in blog_list:
-            record = record_template % {'recid': recid}
-            marcxml_output += record
-
-    marcxml_output = _create_marcxml_footer(marcxml_output)
-    return marcxml_output
+            yield record_template % {'recid': recid}
 
 
-def _check_input_blogs(blog_list, mode):
+def _check_input_blogs(blog_list, mode, check_urls=True):
     """
     @param blog_list: list of lists where each individual
     list is representing the blog the user wants to insert,
@@ -268,52 +666,107 @@ def _check_input_blogs(blog_list, mode):
     @type blog_list: list of lists
     @param mode: insert, delete or update
     @type mode: string
+    @param check_urls: if False the urls are not checked, e.g. for
+    blogs that are deleted because they are dead. The urls of the
+    blogs to update that are archived are never checked.
+    @type check_urls: boolean
     @return: False if any or some of the given
     blogs is/are not valid,
     or True if all of them are valid
     @rtype: tuple (False/True, error_message/ok_message)
     """
 
-    result = ""
-    if mode in ["insert", "update"]:
-        for blog in blog_list:
-            if len(blog) == 4:
-                if not url_is_valid(blog[0])[0]:
-                    result += "The given url '%s' is not valid. \n" % blog[0]
+    checker = WebBlogURLChecker()
+    report = WebBlogURLCheckReport()
+    result = []
+    batch = []
+
+    def check_batch():
+        """ Checks the URLs of the blogs of the batch all at once """
+
+        urls = [blog[0] for blog in batch]
+        if mode == "update":
+            # archived blogs are updated whether they are alive or not
+            urls = _get_blog_recids(urls)[1]
+        if check_urls:
+            checker.check_urls(urls, report)
+        for blog in batch:
+            if blog[0] in report.invalid:
+                result.append("The given url '%s' is not valid. \n" % blog[0])
+            if mode in ["insert", "update"]:
                 # blog[1] is not mandatory
                 if not _topic_is_valid(blog[2]):
-                    result += "The given topic '%s' is not valid. \n" % blog[2]
+                    result.append("The given topic '%s' is not valid. \n" % blog[2])
 
                 if not _license_is_valid(blog[3]):
-                    result += "The given license '%s' is not valid. \n" % blog[3]
-            else:
-                write_message("Please check that the given file follows the established format: 'blog_url,[blog_name],blog_topic,blog_license'.")
-                raise Exception("Please check that the given file follows the established format: 'blog_url,[blog_name],blog_topic,blog_license'.")
-
-    elif mode == "delete":
-        for blog in blog_list:
-            if len(blog) == 1:
-                if not url_is_valid(blog[0])[0]:
-                    result += "The given url '%s' is not valid. \n" % blog[0]
-            else:
-                write_message("Please check that the given file follows the established format: 'blog_url'.")
-                raise Exception("Please check that the given file follows the established format: 'blog_url'.")
+                    result.append("The given license '%s' is not valid. \n" % blog[3])
+        del batch[:]
 
+    for blog in blog_list:
+        if mode in ["insert", "update"] and len(blog) != 4:
+            write_message("Please check that the given file follows the established format: 'blog_url,[blog_name],blog_topic,blog_license'.")
+            raise Exception("Please check that the given file follows the established format: 'blog_url,[blog_name],blog_topic,blog_license'.")
+        elif mode == "delete" and len(blog) != 1:
+            write_message("Please check that the given file follows the established format: 'blog_url'.")
+            raise Exception("Please check that the given file follows the established format: 'blog_url'.")
+        batch.append(blog)
+        if len(batch) >= CFG_WEBBLOG_URLCHECK_BATCH_SIZE:
+            check_batch()
+    if batch:
+        check_batch()
+
+    write_message(str(report))
     if result:
-        return (False, result)
+        return (False, "".join(result))
     else:
         return (True, "All input blogs are valid.")
 
 
+def _open_blog_file(file_path):
+    """
+    @param file_path: csv file, compressed if its name ends with
+    '.gz' or '.bz2'
+    @type file_path: string
+    @return: the file, opened to read its uncompressed lines
+    @rtype: file
+    """
+
+    if file_path.endswith('.gz'):
+        return gzip.open(file_path, 'rb')
+    elif file_path.endswith('.bz2'):
+        return bz2.BZ2File(file_path, 'r')
+    return open(file_path, 'r')
+
+
+def _spool_stdin():
+    """
+    Copies the standard input to a compressed file, since the task
+    reads its input later, from another process
+    @return: the path of the file
+    @rtype: string
+    """
+
+    fd, file_path = tempfile.mkstemp(prefix=_STDIN_PREFIX, suffix='.csv.gz',
+                                     dir=CFG_TMPDIR)
+    os.close(fd)
+    spool = gzip.open(file_path, 'wb')
+    try:
+        shutil.copyfileobj(sys.stdin, spool)
+    finally:
+        spool.close()
+    return file_path
+
+
 def _get_blog_list(file_path):
     """
     @param file_path: file containing the list of blogs to 
     insert/delete/update in the archive.
-    @type file_path: it is a csv file 
-    @return: list of lists where each individual
+    @type file_path: it is a csv file, compressed if its name ends
+    with .gz or .bz2
+    @return: generator of lists where each individual
     list is representing the blog the user wants to insert,
-    delete or update
-    @rtype: list of lists
+    delete or update. The file is read as the rows are consumed,
+    so that huge files are never held in memory.
     E.g:
     if "insert" or "update":
     blog_list = [['http://blogforever.eu', 'BlogForever', 'topic1', 'license1'], 
@@ -322,11 +775,179 @@ def _get_blog_list(file_path):
     blog_list = [['http://blogforever.eu'], [http://phys.org/]]
     """
     
-    fd = open(file_path, 'r')
-    csv_file = csv.reader(fd, delimiter = ',')
-    blog_list = [line for line in csv_file]
-    fd.close()
-    return blog_list
+    fd = _open_blog_file(file_path)
+    try:
+        for line in csv.reader(fd, delimiter = ','):
+            yield line
+    finally:
+        fd.close()
+
+
+def _blog_file_is_empty(file_path):
+    """
+    @param file_path: csv file containing a list of blogs
+    @type file_path: string
+    @return: True if the file contains no blog
+    @rtype: boolean
+    """
+
+    for dummy in _get_blog_list(file_path):
+        return False
+    return True
+
+
+def _check_blog_file(file_path, mode, check_urls=True):
+    """
+    @param file_path: csv file containing a list of blogs
+    @type file_path: string
+    @param mode: insert, delete or update
+    @type mode: string
+    @param check_urls: see _check_input_blogs()
+    @type check_urls: boolean
+    @raise Exception: if the file contains no blog, or invalid blogs
+    """
+
+    if _blog_file_is_empty(file_path):
+        write_message("There are not blogs to "+ str(mode))
+        raise Exception("There are not blogs to "+ str(mode))
+    res = _check_input_blogs(_get_blog_list(file_path), mode, check_urls)
+    if not res[0]:
+        write_message(str(res[1]))
+        raise Exception(res[1])
+
+
+def _submit_updates(file_path):
+    """
+    Submits the bibupload tasks updating the blogs of the given file
+    whose title, license or topic changes
+    @param file_path: csv file of valid blogs to update
+    @type file_path: string
+    """
+
+    mode = "update"
+    blog_recids, unknown_urls = _get_blog_recids(
+        [blog[0] for blog in _get_blog_list(file_path)])
+    blogs_to_update, nb_unchanged = _get_blog_changes(
+        _get_blog_list(file_path), blog_recids)
+    write_message("%s blogs changed, %s unchanged, %s missing." % \
+                  (len(blogs_to_update), nb_unchanged, len(unknown_urls)))
+    if task_get_option('pretend'):
+        _print_blog_changes(blogs_to_update, unknown_urls)
+        write_message("Pretend mode: nothing was submitted.")
+        return
+    if unknown_urls:
+        _raise_unknown_blogs(unknown_urls)
+    if blogs_to_update:
+        _submit_xml_files(_transform_bloglist_to_marcxml(
+            blogs_to_update, mode), mode)
+
+
+def _check_blogs_archived(file_path):
+    """
+    @param file_path: csv file of blogs
+    @type file_path: string
+    @raise Exception: listing the blogs of the file that are not in
+    the archive
+    """
+
+    dummy, unknown_urls = _get_blog_recids(
+        [blog[0] for blog in _get_blog_list(file_path)])
+    if unknown_urls:
+        _raise_unknown_blogs(unknown_urls)
+
+
+def _prepare_deletions(file_path):
+    """
+    Finds the records deleted with the blogs of the given file and
+    writes them next to the journal of their deletion. The blogs
+    deleted by an interrupted run can not be found anymore: the file
+    written by that run is kept and used again.
+    @param file_path: csv file of valid blogs to delete
+    @type file_path: string
+    @raise Exception: if some of the blogs are not in the archive
+    """
+
+    journal_path = _get_journal_path(file_path, "delete")
+    recids_path = journal_path + '.recids'
+    if _journal_started(journal_path) and os.path.exists(recids_path):
+        return
+    records_to_delete = _get_records_to_delete(_get_blog_list(file_path))
+    _make_journal_dir(recids_path)
+    recids_file = open(recids_path, 'wb')
+    try:
+        recids_file.write(records_to_delete.fastdump())
+    finally:
+        recids_file.close()
+
+
+def _submit_deletions(file_path):
+    """
+    Submits the bibupload tasks deleting the blogs of the given file
+    and all their descendants
+    @param file_path: csv file of blogs to delete, prepared by
+    _prepare_deletions()
+    @type file_path: string
+    """
+
+    mode = "delete"
+    journal_path = _get_journal_path(file_path, mode)
+    recids_path = journal_path + '.recids'
+    recids_file = open(recids_path, 'rb')
+    try:
+        records_to_delete = intbitset(recids_file.read())
+    finally:
+        recids_file.close()
+    _submit_xml_files(_transform_bloglist_to_marcxml(
+        records_to_delete, mode), mode, journal_path)
+    os.remove(recids_path)
+
+
+def _prepare_insertions(file_path):
+    """
+    Writes the blogs of the given file that are not archived yet next
+    to the journal of their insertion, and validates them, so that
+    the blogs already archived cost no URL check. Once uploaded, the
+    first blogs would be found archived by a resumed run: the file
+    written by the interrupted run is kept and used again.
+    @param file_path: csv file of blogs to insert
+    @type file_path: string
+    @return: True if there are blogs to insert
+    @rtype: boolean
+    @raise Exception: if some of the new blogs are not valid
+    """
+
+    journal_path = _get_journal_path(file_path, "insert")
+    blogs_path = journal_path + '.blogs'
+    if _journal_started(journal_path) and os.path.exists(blogs_path):
+        # validated by the interrupted run
+        return True
+    if not _write_new_blogs(_get_blog_list(file_path), blogs_path):
+        os.remove(blogs_path)
+        write_message("There are not new blogs to insert")
+        return False
+    try:
+        _check_blog_file(blogs_path, "insert")
+    except Exception:
+        os.remove(blogs_path)
+        raise
+    return True
+
+
+def _submit_insertions(file_path):
+    """
+    Submits the bibupload tasks inserting the blogs of the given file
+    that are not archived yet
+    @param file_path: csv file of blogs to insert, prepared by
+    _prepare_insertions()
+    @type file_path: string
+    """
+
+    mode = "insert"
+    journal_path = _get_journal_path(file_path, mode)
+    blogs_path = journal_path + '.blogs'
+    _submit_xml_files(_transform_bloglist_to_marcxml(
+        _get_blog_list(blogs_path), mode), mode, journal_path)
+    os.remove(blogs_path)
 
 
 def _update_blogs(file_path):
@@ -341,20 +962,8 @@ def _update_blogs(file_path):
     each row (blog elements) are separated by commas.
     """
 
-    blog_list = _get_blog_list(file_path)
-    mode = "update"
-    if blog_list:
-        res = _check_input_blogs(blog_list, mode)
-        if res[0]:
-            updated_blogs_xml = _transform_bloglist_to_marcxml(blog_list, mode)
-            xml_file = _write_xml_file(updated_blogs_xml, mode)
-            task_low_level_submission('bibupload', 'webblog', '-c', xml_file)
-        else:
-            write_message(str(res[1]))
-            raise Exception(res[1])
-    else:
-        write_message("There are not blogs to "+ str(mode))
-        raise Exception("There are not blogs to "+ str(mode))
+    _check_blog_file(file_path, "update")
+    _submit_updates(file_path)
 
 
 def _delete_blogs(file_path):
@@ -368,21 +977,9 @@ def _delete_blogs(file_path):
     a blog to delete.
     """
 
-    blog_list = _get_blog_list(file_path)
-    mode = "delete"
-    if blog_list:
-        res = _check_input_blogs(blog_list, mode)
-        if res[0]:
-            records_to_delete = _get_records_to_delete(blog_list)
-            deleted_blogs_xml = _transform_bloglist_to_marcxml(records_to_delete, mode)
-            xml_file = _write_xml_file(deleted_blogs_xml, mode)
-            task_low_level_submission('bibupload', 'webblog', '-c', xml_file)
-        else:
-            write_message(str(res[1]))
-            raise Exception(res[1])
-    else:
-        write_message("There are not blogs to "+ str(mode))
-        raise Exception("There are not blogs to " + str(mode))
+    _check_blog_file(file_path, "delete")
+    _prepare_deletions(file_path)
+    _submit_deletions(file_path)
 
 
 def _insert_blogs(file_path):
@@ -397,20 +994,250 @@ def _insert_blogs(file_path):
     each row (blog elements) are separated by commas.
     """
 
-    blog_list = _get_blog_list(file_path)
-    mode = "insert"
-    if blog_list:
-        res = _check_input_blogs(blog_list, mode)
-        if res[0]:
-            new_blogs_xml = _transform_bloglist_to_marcxml(blog_list, mode)
-            xml_file = _write_xml_file(new_blogs_xml, mode)
-            task_low_level_submission('bibupload', 'webblog', '-i', xml_file)
-        else:
-            write_message(str(res[1]))
-            raise Exception(res[1])
-    else:
-        write_message("There are not blogs to "+ str(mode))
-        raise Exception("There are not blogs to "+ str(mode))
+    if _blog_file_is_empty(file_path):
+        write_message("There are not blogs to insert")
+        raise Exception("There are not blogs to insert")
+    if _prepare_insertions(file_path):
+        _submit_insertions(file_path)
+
+
+def _split_manifest(file_path):
+    """
+    Reads the manifest once, writing the blogs of every operation to
+    their own csv file
+    @param file_path: manifest, see _process_manifest()
+    @type file_path: string
+    @return: the path of the csv file of every operation having blogs
+    @rtype: dict {operation: path}
+    @raise Exception: if a row has an unknown operation, or if the
+    same blog appears under several operations
+    """
+
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    paths = {}
+    files = {}
+    writers = {}
+    operations = {}   # canonical url -> operation
+    errors = []
+    try:
+        for line_number, row in enumerate(_get_blog_list(file_path)):
+            if not row:
+                continue
+            operation = row[0].strip().lower()
+            if operation not in _MANIFEST_OPERATIONS:
+                errors.append("Line %s: unknown operation '%s'." % \
+                              (line_number + 1, row[0]))
+                continue
+            if len(row) > 1:
+                canonical_url = get_canonical_blog_url(row[1])
+                if operations.setdefault(canonical_url, operation) != operation:
+                    errors.append("Line %s: the blog '%s' is also to %s." % \
+                                  (line_number + 1, row[1],
+                                   operations[canonical_url]))
+                    continue
+            if operation not in writers:
+                fd, paths[operation] = tempfile.mkstemp(
+                    prefix='blogs_to_%s_%s_' % (operation, timestamp),
+                    suffix='.csv', dir=CFG_TMPDIR)
+                files[operation] = os.fdopen(fd, 'w')
+                writers[operation] = csv.writer(files[operation], delimiter=',')
+            writers[operation].writerow(row[1:])
+    finally:
+        for operation_file in files.values():
+            operation_file.close()
+
+    if errors:
+        for path in paths.values():
+            os.remove(path)
+        write_message("\n".join(errors))
+        raise Exception("\n".join(errors))
+    return paths
+
+
+def _process_manifest(file_path, check_deleted_urls=True):
+    """
+    Inserts, updates and deletes the blogs of a manifest in one task.
+    Every blog is validated first, and the blogs to update or delete
+    are looked up in the archive. Only then are the deletions, updates
+    and insertions submitted in this order as bibupload tasks sharing
+    a sequence id, so that bibsched runs them one after the other. The
+    sequence id is kept in the journal of the manifest, so that a
+    resumed run submits its tasks after those of the interrupted one.
+    @param file_path: file where each row is an operation followed by
+    the blog fields that operation needs, e.g:
+    insert,http://blogforever.eu,BlogForever,topic1,license1
+    update,http://blogs.physicstoday.org/,Physicstoday,topic1,license2
+    delete,http://phys.org/
+    @type file_path: it is a csv file
+    @param check_deleted_urls: if False the urls of the blogs to
+    delete are not checked, since dead blogs are deleted too
+    @type check_deleted_urls: boolean
+    """
+
+    if _blog_file_is_empty(file_path):
+        write_message("There are not blogs in the manifest")
+        raise Exception("There are not blogs in the manifest")
+
+    # the sequence id and the operations already submitted by an
+    # interrupted run
+    journal_path = _get_journal_path(file_path, "manifest")
+    sequence_id = None
+    done = []
+    if os.path.exists(journal_path):
+        journal = open(journal_path)
+        try:
+            for line in journal:
+                if not line.endswith('\n'):
+                    break
+                if line.startswith('sequence_id '):
+                    sequence_id = int(line.split()[1])
+                else:
+                    done.append(line.strip())
+        finally:
+            journal.close()
+
+    def write_to_journal(line):
+        """ Records the line in the journal of the manifest """
+
+        _make_journal_dir(journal_path)
+        journal = open(journal_path, 'a')
+        try:
+            journal.write(line + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        finally:
+            journal.close()
+
+    paths = _split_manifest(file_path)
+    try:
+        operations = [operation for operation in _MANIFEST_OPERATIONS
+                      if operation in paths and operation not in done]
+        # nothing is submitted unless every operation can be
+        for operation in operations[:]:
+            if operation == 'insert':
+                if not _prepare_insertions(paths[operation]):
+                    operations.remove(operation)
+            elif operation == 'update':
+                _check_blog_file(paths[operation], operation)
+                _check_blogs_archived(paths[operation])
+            else:
+                _check_blog_file(paths[operation], operation,
+                                 check_deleted_urls)
+                _prepare_deletions(paths[operation])
+
+        submit_functions = {'delete': _submit_deletions,
+                            'update': _submit_updates,
+                            'insert': _submit_insertions}
+        if operations and sequence_id is None:
+            sequence_id = bibtask_allocate_sequenceid()
+            write_to_journal('sequence_id %s' % sequence_id)
+        task_set_option('sequence_id', sequence_id)
+        for operation in operations:
+            task_update_progress("Submitting the blogs to %s" % operation)
+            submit_functions[operation](paths[operation])
+            write_to_journal(operation)
+    finally:
+        for path in paths.values():
+            os.remove(path)
+
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+
+
+def _sync_blogs(file_path):
+    """
+    Makes the blogs of the archive (BLOG and INITIALBLOG records) the
+    ones of the given list: the blogs missing from the archive are
+    inserted, the blogs missing from the list are deleted, and the
+    other ones are updated if their title, license or topic changes.
+    Blogs are matched by canonical url. Only the oldest of the blogs
+    of the archive sharing a canonical url is synchronized: the other
+    ones are listed, to be deleted by hand.
+    More than CFG_WEBBLOG_SYNC_MAX_DELETIONS blogs are only deleted
+    with --force, so that a truncated list does not empty the archive.
+    @param file_path: file containing the desired list of blogs, in
+    the format of the list of blogs to insert
+    @type file_path: it is a csv file
+    @raise Exception: if the list is empty, or if too many blogs are
+    to be deleted
+    """
+
+    if _blog_file_is_empty(file_path):
+        write_message("There are not blogs to synchronize")
+        raise Exception("There are not blogs to synchronize")
+
+    duplicates = []
+    url_index = get_blog_url_index(duplicates)
+    if duplicates:
+        write_message("Warning: %s blogs have the url of an older blog and "
+                      "are not synchronized: %s" % \
+                      (len(duplicates), ", ".join([str(recid) for recid
+                                                   in sorted(duplicates)])))
+    stored_urls = get_fieldvalues_for_records(url_index.values(), '520__u')
+    desired_urls = set()
+    nb_inserts = nb_updates = 0
+    fd, manifest_path = tempfile.mkstemp(prefix='blogs_to_sync_%s_' % \
+                                         time.strftime("%Y%m%d_%H%M%S"),
+                                         suffix='.csv', dir=CFG_TMPDIR)
+    manifest = os.fdopen(fd, 'w')
+    try:
+        writer = csv.writer(manifest, delimiter=',')
+        for blog in _get_blog_list(file_path):
+            if not blog:
+                continue
+            canonical_url = get_canonical_blog_url(blog[0])
+            if canonical_url in desired_urls:
+                continue
+            desired_urls.add(canonical_url)
+            if canonical_url in url_index:
+                # the stored url, by which the blog is found
+                stored_url = stored_urls[url_index[canonical_url]][0]
+                writer.writerow(['update', stored_url] + blog[1:])
+                nb_updates += 1
+            else:
+                writer.writerow(['insert'] + blog)
+                nb_inserts += 1
+        urls_to_delete = set(url_index) - desired_urls
+        for canonical_url in urls_to_delete:
+            writer.writerow(['delete', stored_urls[url_index[canonical_url]][0]])
+    finally:
+        manifest.close()
+
+    write_message("%s blogs to insert, %s to check for updates, %s to delete." % \
+                  (nb_inserts, nb_updates, len(urls_to_delete)))
+    try:
+        if len(urls_to_delete) > CFG_WEBBLOG_SYNC_MAX_DELETIONS and \
+               not task_get_option('force') and not task_get_option('pretend'):
+            message = "%s blogs of the archive are missing from the list, " \
+                      "more than %s: use --force to delete them." % \
+                      (len(urls_to_delete), CFG_WEBBLOG_SYNC_MAX_DELETIONS)
+            write_message(message)
+            raise Exception(message)
+        if task_get_option('pretend'):
+            # the manifest is not processed, which validates the blogs
+            for mode in ("insert", "update"):
+                res = _check_input_blogs(
+                    (operation[1:] for operation in _get_blog_list(manifest_path)
+                     if operation[0] == mode), mode)
+                if not res[0]:
+                    write_message(str(res[1]))
+                    raise Exception(res[1])
+            blogs_to_check = []
+            for operation in _get_blog_list(manifest_path):
+                if operation[0] == 'update':
+                    blogs_to_check.append(operation[1:])
+                else:
+                    write_message("Blog '%s': %s" % (operation[1], operation[0]))
+            blogs_to_update = _get_blog_changes(blogs_to_check, _get_blog_recids(
+                [blog[0] for blog in blogs_to_check])[0])[0]
+            _print_blog_changes(blogs_to_update, [])
+            write_message("Pretend mode: nothing was submitted.")
+        elif nb_inserts or nb_updates or urls_to_delete:
+            # validates every blog once, before submitting anything; the
+            # blogs missing from the list are deleted even if they are dead
+            _process_manifest(manifest_path, check_deleted_urls=False)
+    finally:
+        os.remove(manifest_path)
 
 
 def _bloguploader_task_run_core():
@@ -418,7 +1245,9 @@ def _bloguploader_task_run_core():
      Run Blog Uploader Task
     """
 
-    if task_get_option('file_path') is not None:
+    if task_get_option('file_path') is None:
+        return False
+    try:
         if task_get_option("mode") == "blog_insert":
             task_update_progress("Uploading new blogs")
             write_message("Uploading new blogs started")
@@ -434,17 +1263,52 @@ def _bloguploader_task_run_core():
             write_message("Updating blogs started")
             _update_blogs(task_get_option('file_path'))
             write_message("Updating blogs finished")
+        elif task_get_option("mode") == "manifest":
+            task_update_progress("Processing the manifest")
+            write_message("Processing the manifest started")
+            _process_manifest(task_get_option('file_path'))
+            write_message("Processing the manifest finished")
+        elif task_get_option("mode") == "sync":
+            task_update_progress("Synchronizing blogs")
+            write_message("Synchronizing blogs started")
+            _sync_blogs(task_get_option('file_path'))
+            write_message("Synchronizing blogs finished")
+    finally:
+        _remove_stdin_spool()
+    task_update_progress("Done.")
+    return True
 
-        task_update_progress("Done.")
-        return True
-    else:
-        return False
+
+def _remove_stdin_spool():
+    """
+    Removes the copy of the standard input made by _spool_stdin(), if
+    the blogs were read from it
+    """
+
+    file_path = task_get_option('file_path')
+    if file_path is not None and \
+           os.path.basename(file_path).startswith(_STDIN_PREFIX) and \
+           os.path.exists(file_path):
+        os.remove(file_path)
 
 
 def _bloguploader_task_submit_check_options():
     """
     Checking options before submitting the task.
-    It returns False if there are errors in the options.
+    It returns False if there are errors in the options, and then
+    removes the copy of the standard input, since no task will read it.
+    """
+
+    if _check_submit_options():
+        return True
+    _remove_stdin_spool()
+    return False
+
+
+def _check_submit_options():
+    """
+    @return: False if there are errors in the options
+    @rtype: boolean
     """
 
     if task_get_option('mode') is None:
@@ -458,6 +1322,19 @@ def _bloguploader_task_submit_check_options():
         write_message("No such file: '" + str(task_get_option('file_path'))+"'")
         return False
 
+    if task_get_option('pretend') and \
+           task_get_option('mode') not in ('blog_update', 'sync'):
+        write_message("--pretend can only be used with -U or --sync!")
+        return False
+
+    if task_get_option('force') and task_get_option('mode') != 'sync':
+        write_message("--force can only be used with --sync!")
+        return False
+
+    if task_get_option('chunk_size', CFG_WEBBLOG_UPLOADER_CHUNK_SIZE) < 1:
+        write_message("The chunk size must be a positive number!")
+        return False
+
     return True
 
 
@@ -473,9 +1350,30 @@ def _bloguploader_elaborate_submit_parameter(key, value, opts, args):
         task_set_option('mode', 'blog_delete')
     elif key in ("-U", "--blog_update"):
         task_set_option('mode', 'blog_update')
-
-    fix_argv_paths([args[0]])
-    task_set_option('file_path', os.path.abspath(args[0]))
+    elif key in ("-m", "--manifest"):
+        task_set_option('mode', 'manifest')
+    elif key in ("--sync",):
+        task_set_option('mode', 'sync')
+    elif key in ("--chunk_size",):
+        try:
+            task_set_option('chunk_size', int(value))
+        except ValueError:
+            _remove_stdin_spool()
+            raise StandardError("The chunk size must be a number: '%s'" % value)
+    elif key in ("--pretend",):
+        task_set_option('pretend', True)
+    elif key in ("--force",):
+        task_set_option('force', True)
+
+    if args[0] == '-':
+        if task_get_option('file_path') is None:
+            task_set_option('file_path', _spool_stdin())
+            # the task reads the copy instead of the standard input
+            sys.argv[len(sys.argv) - 1 - sys.argv[::-1].index('-')] = \
+                task_get_option('file_path')
+    else:
+        fix_argv_paths([args[0]])
+        task_set_option('file_path', os.path.abspath(args[0]))
 
     return True
 
@@ -489,10 +1387,15 @@ def main():
               authorization_msg="Blog Uploader Task Submission",
               help_specific_usage=__doc__,
               version=__revision__,
-              specific_params=("idU",
+              specific_params=("idUm",
                                ["blog_insert",
                                 "blog_delete",
-                                "blog_update"]),
+                                "blog_update",
+                                "manifest",
+                                "sync",
+                                "chunk_size=",
+                                "pretend",
+                                "force"]),
               task_submit_elaborate_specific_parameter_fnc=_bloguploader_elaborate_submit_parameter,
               task_submit_check_options_fnc=_bloguploader_task_submit_check_options,
               task_run_fnc=_bloguploader_task_run_core)
@@ -28,6 +28,7 @@ from invenio.messages import gettext_set_language
 from invenio.config import CFG_SITE_URL
 from invenio.access_control_config import SUPERADMINROLE
 from invenio.access_control_admin import acc_is_user_in_role, acc_get_role_id
+from invenio.webblog_utils import get_record_collection
 
 def format_element(bfo, style):
     """
@@ -39,7 +40,7 @@ def format_element(bfo, style):
 
     out = ""
     if bfo.user_info['email'] not in ["guest"]:
-        coll = bfo.fields("980__a")[0]
+        coll = get_record_collection(bfo.recID)
         if coll in ['BLOG', 'BLOGPOST']:
             linkattrd = {}
             if style != '':
@@ -19,20 +19,28 @@
 """
 BibFormat Element - creates the blog navigation menu
 """
-from invenio.search_engine import search_pattern, record_exists
 from invenio.bibformat_engine import BibFormatObject
 from invenio.config import CFG_SITE_URL
-from invenio.webblog_utils import get_parent_blog, get_posts
+from invenio.webblog_utils import get_parent_blog, \
+     get_sibling_posts_window, get_post_rank, get_post_titles
 
 
 cfg_messages = {}
 cfg_messages["in_issue"] = {"en": "Also in this blog: ",
                             "fr": "Aussi dans ce blog: "}
+cfg_messages["position"] = {"en": "Post %(k)s of %(n)s",
+                            "fr": "Billet %(k)s sur %(n)s"}
+cfg_messages["newer"] = {"en": "more newer posts&hellip;",
+                         "fr": "billets plus r\xc3\xa9cents&hellip;"}
+cfg_messages["older"] = {"en": "more older posts&hellip;",
+                         "fr": "billets plus anciens&hellip;"}
 
 
-def format_element(bfo):
+def format_element(bfo, before="5", after="5"):
     """
     Creates a navigation for articles in the same issue and category.
+    @param before: number of newer posts to show
+    @param after: number of older posts to show
     """
     # get variables
     this_recid = bfo.control_field('001')
@@ -45,35 +53,72 @@ def format_element(bfo):
         return ""
 
     blog_recid = get_parent_blog(this_recid)
-    blog_rec = BibFormatObject(blog_recid)
-    try:
-        blog_title = blog_rec.fields('245__a')[0]
-    except:
-        blog_title = 'Untitled'
 
-    menu_recids = get_posts(blog_recid, newest_first=True)
+    try:
+        before = int(before)
+        after = int(after)
+    except ValueError:
+        before = after = 5
+    # one more post on each side tells whether there are more posts,
+    # and is the post whose menu shows them
+    newer_recids, older_recids = get_sibling_posts_window(this_recid, before + 1,
+                                                          after + 1, newest_first=True)
+    more_newer_recid = more_older_recid = None
+    if len(newer_recids) > before:
+        more_newer_recid = newer_recids[0]
+        newer_recids = newer_recids[1:]
+    if len(older_recids) > after:
+        more_older_recid = older_recids[-1]
+        older_recids = older_recids[:-1]
+    menu_recids = newer_recids + [this_recid] + older_recids
+    titles = get_post_titles(blog_recid, tuple([int(recid) for recid in menu_recids]))
+    ln_argument = (bfo.lang=="fr") and "?ln=fr" or ""
 
     try:
         menu_out = '<h4>%s</h4>' % cfg_messages["in_issue"][current_language]
     except: # in english by default
         menu_out = '<h4>%s</h4>' % cfg_messages["in_issue"]['en']
 
+    rank = get_post_rank(this_recid, newest_first=True)
+    if rank:
+        try:
+            position = cfg_messages["position"][current_language]
+        except KeyError:
+            position = cfg_messages["position"]['en']
+        menu_out += '<div class="position">%s</div>' % \
+                    (position % {'k': rank[0], 'n': rank[1]})
+
+    if more_newer_recid is not None:
+        menu_out += '<div class="litem"><a href="%s/record/%s%s">%s</a></div>' % \
+                    (CFG_SITE_URL, more_newer_recid, ln_argument,
+                     _get_message("newer", current_language))
+
     for recid in menu_recids:
         if str(this_recid) == str(recid):
             menu_out += '<div class="active"><div class="litem">%s</div></div>' % this_title
         else:
-            temp_rec = BibFormatObject(recid)
-            try:
-                title = temp_rec.fields('245__a')[0]
-            except:
-                title = 'Untitled'
+            title = titles.get(int(recid), 'Untitled')
             menu_out += '<div class="litem"><a href="%s/record/%s%s">%s</a></div>' % (CFG_SITE_URL,
                                                                                       recid,
-                                                                                      (bfo.lang=="fr") and "?ln=fr" or "",
+                                                                                      ln_argument,
                                                                                       title)
 
+    if more_older_recid is not None:
+        menu_out += '<div class="litem"><a href="%s/record/%s%s">%s</a></div>' % \
+                    (CFG_SITE_URL, more_older_recid, ln_argument,
+                     _get_message("older", current_language))
+
     return menu_out
 
+def _get_message(name, language):
+    """ Returns the given message in the given language, in english
+    by default """
+
+    try:
+        return cfg_messages[name][language]
+    except KeyError:
+        return cfg_messages[name]['en']
+
 def escape_values(bfo):
     """
     Called by BibFormat in order to check if output of this element
@@ -19,67 +19,83 @@
 
 """
 BibFormat Element - displays the latest posts on a blog
-and it also offers a link to see all the posts of the
-corresponding blog
+and it also offers a link to load the older posts of the
+corresponding blog, page by page
 """
 
-from invenio.webblog_utils import get_posts
-from invenio.search_engine import print_record
+from invenio.config import CFG_SITE_URL
+from invenio.webblog_config import CFG_WEBBLOG_PAGE_SIZE, \
+    CFG_WEBBLOG_PAGES_PATH
+from invenio.webblog_utils import get_posts, count_posts, \
+    get_load_more_script
+from invenio.webblog_fragments import print_records
 
 
 cfg_messages = {}
 cfg_messages["in_issue"] = {"en": "Posts on this blog: ",
                             "fr": "Posts sur ce blog:"}
+cfg_messages["more"] = {"en": "Show more posts",
+                        "fr": "Afficher plus de posts"}
 
-
-def format_element(bfo):
+def format_element(bfo, nb_shown="3"):
     """
     Displays the latest posts on a blog and it also offers
-    a link to see all the posts of the corresponding blog
+    a link to load the older posts of the corresponding blog
+    @param nb_shown: number of posts shown with the page
     """
 
     this_recid = bfo.control_field('001')
     current_language = bfo.lang
-    blog_posts_recids = get_posts(this_recid, newest_first=True)
+    try:
+        nb_shown = int(nb_shown)
+    except ValueError:
+        nb_shown = 3
+    latest_blog_posts_recids = get_posts(this_recid, newest_first=True,
+                                         limit=nb_shown)
     out = ""
-    if blog_posts_recids:
-        # let's print just the 3 latest posts
-        latest_blog_posts_recids = blog_posts_recids[:3]
+    if latest_blog_posts_recids:
         try:
             out += "<h4>%s</h4>" % cfg_messages["in_issue"][current_language]
         except: # in english by default
             out += "<h4>%s</h4>" % cfg_messages["in_issue"]['en']
 
-        for post_recid in latest_blog_posts_recids:
-            out += print_record(post_recid, format='hb')
+        for post in print_records(latest_blog_posts_recids, format='hb',
+                                  ln=current_language):
+            out += post
             out += "<br />"
 
-        all_posts = ""
-        all_blog_posts_recids = blog_posts_recids[3:]
-        for post_recid in all_blog_posts_recids:
-            all_posts += print_record(post_recid, format='hb')
-            all_posts += "<br />"
-
-        out += """
-            <script type="text/javascript">
-            function displayAllPosts(){
-                var all_posts = document.getElementById('all_posts');
-                var see_all_link = document.getElementById('see_all_link');
-                if (all_posts.style.display == 'none'){
-                    all_posts.style.display = '';
-                    see_all_link.innerHTML = "Show less posts"
-                } else {
-                    all_posts.style.display = 'none';
-                    see_all_link.innerHTML = "Show all posts"
-                }
-            }
-            </script>
-            """
+        if count_posts(this_recid) > len(latest_blog_posts_recids):
+            try:
+                more = cfg_messages["more"][current_language]
+            except KeyError:
+                more = cfg_messages["more"]['en']
+            if not CFG_WEBBLOG_PAGES_PATH:
+                # the older posts can not be loaded on demand: they are
+                # hidden in the page
+                out += '<span id="all_posts" style="display:none">'
+                older_recids = get_posts(this_recid, newest_first=True,
+                                         offset=len(latest_blog_posts_recids))
+                for post in print_records(older_recids, format='hb',
+                                          ln=current_language):
+                    out += post
+                    out += "<br />"
+                out += '</span>'
+                out += '<a class="moreinfo" id="see_all_link" \
+                        href="javascript:void(0)" \
+                        onclick="document.getElementById(\'all_posts\').style.display = \'\'; \
+                                 this.style.display = \'none\'">%s</a>' % more
+                return out
 
-        out += '<span id="all_posts" style="">' + all_posts + '</span>'
-        out += '<a class="moreinfo" id="see_all_link" \
-                href="javascript:void(0)" onclick="displayAllPosts()""></a>'
-        out += '<script type="text/javascript">displayAllPosts()</script>'
+            # the older posts are loaded on demand from /blog/posts
+            url = "%s%s/posts?recid=%s&amp;rg=%s&amp;ln=%s" % \
+                  (CFG_SITE_URL, CFG_WEBBLOG_PAGES_PATH, this_recid,
+                   CFG_WEBBLOG_PAGE_SIZE, current_language)
+            out += get_load_more_script()
+            out += '<span id="all_posts"></span>'
+            out += '<a class="moreinfo" id="see_all_link" data-offset="%s" \
+                    href="javascript:void(0)" \
+                    onclick="webblogLoadMore(this, \'%s\', \'all_posts\')">%s</a>' % \
+                    (len(latest_blog_posts_recids), url, more)
 
     return out
 
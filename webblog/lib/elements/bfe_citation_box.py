@@ -23,7 +23,8 @@ BibFormat Element - displays the description of how to cite a record
 """
 
 from invenio.config import CFG_SITE_URL
-from invenio.webblog_utils import get_parent_blog, get_parent_post
+from invenio.webblog_utils import get_parent_blog, get_parent_post, \
+    get_record_collection
 from invenio.search_engine import get_creation_date
 from invenio.bibformat_engine import BibFormatObject
 
@@ -42,7 +43,7 @@ def format_element(bfo):
     Retrieved from the original "original_url"
     """
 
-    coll = bfo.fields('980__a')[0]
+    coll = get_record_collection(bfo.recID)
     recid = bfo.control_field('001')
 
     # let's get the fields we want to show
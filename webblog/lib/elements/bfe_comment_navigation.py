@@ -23,18 +23,23 @@ BibFormat Element - creates the comment navigation menu
 
 from invenio.bibformat_engine import BibFormatObject
 from invenio.config import CFG_SITE_URL
-from invenio.webblog_utils import get_parent_post, get_comments
+from invenio.webblog_utils import get_sibling_comments_window, \
+     get_comment_rank, get_parent_post, get_comment_snippets
 from invenio.bibformat_utils import get_contextual_content
 
 
 cfg_messages = {}
 cfg_messages["in_issue"] = {"en": "Other comments on this post: ",
                             "es": "Otros comentarios sobre la misma entrada: "}
+cfg_messages["position"] = {"en": "Comment %(k)s of %(n)s",
+                            "es": "Comentario %(k)s de %(n)s"}
 
 
-def format_element(bfo):
+def format_element(bfo, before="5", after="5"):
     """
     Creates a navigation for comments.
+    @param before: number of newer comments to show
+    @param after: number of older comments to show
     """
 
     # get variables
@@ -54,28 +59,40 @@ def format_element(bfo):
     menu_recids = []
     current_language = bfo.lang
 
-    post_recid = get_parent_post(this_recid)
-
-    menu_recids = get_comments(post_recid, newest_first=True)
+    try:
+        before = int(before)
+        after = int(after)
+    except ValueError:
+        before = after = 5
+    newer_recids, older_recids = get_sibling_comments_window(this_recid, before,
+                                                             after, newest_first=True)
+    menu_recids = newer_recids + [this_recid] + older_recids
+    snippets = get_comment_snippets(get_parent_post(this_recid),
+                                    tuple([int(recid) for recid in menu_recids]))
 
     try:
         menu_out = '<h4>%s</h4>' % cfg_messages["in_issue"][current_language]
     except:
         menu_out = '<h4>%s</h4>' % cfg_messages["in_issue"]['en']
 
+    rank = get_comment_rank(this_recid, newest_first=True)
+    if rank:
+        try:
+            position = cfg_messages["position"][current_language]
+        except KeyError:
+            position = cfg_messages["position"]['en']
+        menu_out += '<div class="position">%s</div>' % \
+                    (position % {'k': rank[0], 'n': rank[1]})
+
     for recid in menu_recids:
         if str(this_recid) == str(recid):
             menu_out += '<div class="active"><div class="litem"><b>%s</b>: %s [...]</div></div>' % (this_author, this_limit_content)
         else:
-            temp_rec = BibFormatObject(recid)
-            content = temp_rec.fields('520__a')[0]
-            limit_content = get_contextual_content(content,
-                                                   [],
-                                                   max_lines=1)[0]
-
-            try:
-                author = temp_rec.fields('100__a')[0]
-            except:
+            if int(recid) in snippets:
+                author, limit_content = snippets[int(recid)]
+            else: # not indexed yet
+                author, limit_content = _get_snippet(recid)
+            if not author:
                 author = 'Anonymous'
             menu_out += '<div class="litem"><a href="%s/record/%s%s"><b>%s</b>: %s [...]</a></div>' % (CFG_SITE_URL,
                                                                                                 recid,
@@ -86,6 +103,25 @@ def format_element(bfo):
         
     return menu_out
 
+def _get_snippet(recid):
+    """
+    Computes the author and the snippet of a comment from its record
+    """
+
+    temp_rec = BibFormatObject(recid)
+    try:
+        content = temp_rec.fields('520__a')[0]
+        limit_content = get_contextual_content(content,
+                                               [],
+                                               max_lines=1)[0]
+    except IndexError:
+        limit_content = ''
+    try:
+        author = temp_rec.fields('100__a')[0]
+    except IndexError:
+        author = ''
+    return (author, limit_content)
+
 def escape_values(bfo):
     """
     Called by BibFormat in order to check if output of this element
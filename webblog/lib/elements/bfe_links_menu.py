@@ -21,8 +21,7 @@ BibFormat Element - creates a menu containing all the links in a post
 """
 
 from invenio.config import CFG_SITE_URL
-from invenio.search_engine_utils import get_fieldvalues
-from invenio.search_engine import perform_request_search
+from invenio.webblog_utils import get_archived_urls
 
 cfg_messages = {}
 cfg_messages["in_issue"] = {"en": "Reference links on this post",
@@ -40,6 +39,9 @@ def format_element(bfo):
 
     if links:
         menu_out = '<h4>%s:</h4>' % cfg_messages["in_issue"][current_language]
+        # all the links are looked up in the archive at once
+        archived_urls = get_archived_urls([link.get('u') for link in links],
+                                          exclude_recid=bfo.recID)
         for link in links:
             link_url   = link.get('u')
             link_data  = link.get('y', link_url)
@@ -47,16 +49,12 @@ def format_element(bfo):
 
             menu_out += """<div class="litem"><a href="%s"%s>%s</a></div>""" % (link_url, link_title and ' title="%s"' % link_title or '' , link_data)
 
-            recid_in_archive = perform_request_search(p = link_url, f = '520__u')
             # differentiate between links to sources inside
             # the archive and sources outside
-            if recid_in_archive:
+            if link_url in archived_urls:
+                recid_in_archive, title = archived_urls[link_url]
                 menu_out += """<div style="padding-left:20px;"><h4>This content is also available in the archive: </h4>"""
-                try:
-                    title = get_fieldvalues(recid_in_archive[0], "245__a")[0]
-                except:
-                    title = "Untitled"
-                menu_out += """<span class="moreinfo"><a href="%s/record/%s">%s</a></span></div></br>""" % (CFG_SITE_URL, recid_in_archive[0], title)
+                menu_out += """<span class="moreinfo"><a href="%s/record/%s">%s</a></span></div></br>""" % (CFG_SITE_URL, recid_in_archive, title)
 
     return menu_out
 
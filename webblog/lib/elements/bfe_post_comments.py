@@ -19,62 +19,79 @@
 
 """
 BibFormat Element - displays the latest comments on a post
-and it also offers a link to see all the comments written on
-the corresponding post
+and it also offers a link to load the older comments written
+on the corresponding post, page by page
 """
 
-from invenio.webblog_utils import get_comments
-from invenio.search_engine import print_record
+from invenio.config import CFG_SITE_URL
+from invenio.webblog_config import CFG_WEBBLOG_PAGE_SIZE, \
+    CFG_WEBBLOG_PAGES_PATH
+from invenio.webblog_utils import get_comments, count_comments, \
+    get_load_more_script
+from invenio.webblog_fragments import print_records
 
 
 cfg_messages = {}
 cfg_messages["in_issue"] = {"en": "Comments on this post: ",
                             "fr": "Commentaires sur ce post:"}
+cfg_messages["more"] = {"en": "Show more comments",
+                        "fr": "Afficher plus de commentaires"}
 
-def format_element(bfo):
+def format_element(bfo, nb_shown="2"):
     """
     Displays comments on a post
+    @param nb_shown: number of comments shown with the page
     """
 
     this_recid = bfo.control_field('001')
     current_language = bfo.lang
-    post_comments_recids = get_comments(this_recid, newest_first=True)
+    try:
+        nb_shown = int(nb_shown)
+    except ValueError:
+        nb_shown = 2
+    latest_post_comments_recids = get_comments(this_recid, newest_first=True,
+                                               limit=nb_shown)
     out = ""
-    if post_comments_recids:
-        # let's print just the 3 latest posts
-        latest_post_comments_recids = post_comments_recids[:2]
+    if latest_post_comments_recids:
         out += "<h4>%s</h4>" % cfg_messages["in_issue"][current_language]
 
-        for comment_recid in latest_post_comments_recids:
-            out += print_record(comment_recid, format='hb')
+        for comment in print_records(latest_post_comments_recids, format='hb',
+                                     ln=current_language):
+            out += comment
             out += "<br />"
 
-        all_comments = ""
-        all_post_comments_recids = post_comments_recids[2:]
-        for comment_recid in all_post_comments_recids:
-            all_comments += print_record(comment_recid, format='hb')
-            all_comments += "<br />"
+        if count_comments(this_recid) > len(latest_post_comments_recids):
+            try:
+                more = cfg_messages["more"][current_language]
+            except KeyError:
+                more = cfg_messages["more"]['en']
+            if not CFG_WEBBLOG_PAGES_PATH:
+                # the older comments can not be loaded on demand: they are
+                # hidden in the page
+                out += '<span id="all_comments" style="display:none">'
+                older_recids = get_comments(this_recid, newest_first=True,
+                                            offset=len(latest_post_comments_recids))
+                for comment in print_records(older_recids, format='hb',
+                                             ln=current_language):
+                    out += comment
+                    out += "<br />"
+                out += '</span>'
+                out += '<a class="moreinfo" id="see_all_comments_link" \
+                        href="javascript:void(0)" \
+                        onclick="document.getElementById(\'all_comments\').style.display = \'\'; \
+                                 this.style.display = \'none\'">%s</a>' % more
+                return out
 
-        out += """
-            <script type="text/javascript">
-            function displayAllComments(){
-                var all_comments = document.getElementById('all_comments');
-                var see_all_link = document.getElementById('see_all_link');
-                if (all_comments.style.display == 'none'){
-                    all_comments.style.display = '';
-                    see_all_link.innerHTML = "Show less comments"
-                } else {
-                    all_comments.style.display = 'none';
-                    see_all_link.innerHTML = "Show all comments"
-                }
-            }
-            </script>
-            """
-
-        out += '<span id="all_comments" style="">' + all_comments + '</span>'
-        out += '<a class="moreinfo" id="see_all_link" \
-                href="javascript:void(0)" onclick="displayAllComments()""></a>'
-        out += '<script type="text/javascript">displayAllComments()</script>'
+            # the older comments are loaded on demand from /blog/comments
+            url = "%s%s/comments?recid=%s&amp;rg=%s&amp;ln=%s" % \
+                  (CFG_SITE_URL, CFG_WEBBLOG_PAGES_PATH, this_recid,
+                   CFG_WEBBLOG_PAGE_SIZE, current_language)
+            out += get_load_more_script()
+            out += '<span id="all_comments"></span>'
+            out += '<a class="moreinfo" id="see_all_comments_link" data-offset="%s" \
+                    href="javascript:void(0)" \
+                    onclick="webblogLoadMore(this, \'%s\', \'all_comments\')">%s</a>' % \
+                    (len(latest_post_comments_recids), url, more)
 
     return out
 
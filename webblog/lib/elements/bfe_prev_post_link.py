@@ -23,6 +23,7 @@ from invenio.bibformat_engine import BibFormatObject
 from invenio.config import CFG_SITE_URL
 from invenio.webjournal_utils import get_release_datetime, issue_to_datetime, get_journal_preferred_language
 from invenio.dateutils import get_i18n_day_name, get_i18n_month_name
+from invenio.webblog_utils import get_previous_post
 
 
 def format_element(bfo):
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+##
+## This file is part of Invenio.
+## Copyright (C) 2012 CERN.
+##
+## Invenio is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 2 of the
+## License, or (at your option) any later version.
+##
+## Invenio is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Invenio; if not, write to the Free Software Foundation, Inc.,
+## 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+WebBlog cache, shared by the webblog_utils helpers.
+
+It has two tiers:
+  - a request tier, living between webblog_cache_start_request() and
+    webblog_cache_end_request() in the current thread, and at most
+    CFG_WEBBLOG_CACHE_REQUEST_TIMEOUT seconds if the page failed before
+    calling webblog_cache_end_request();
+  - a process tier, a bounded LRU cache whose entries expire after
+    CFG_WEBBLOG_CACHE_TTL seconds.
+
+Every entry depends on one record. Entries are invalidated when
+bibupload modifies that record or one of its children, which is
+detected by looking at the bibrec modification dates and at the
+update dates of the WebBlog tables (which the bibupload plugin
+updates after the record) at most every CFG_WEBBLOG_CACHE_CHECK_INTERVAL
+seconds.
+"""
+
+__revision__ = "$Id$"
+
+import threading
+import time
+from invenio.webblog_config import CFG_WEBBLOG_CACHE_SIZE, \
+    CFG_WEBBLOG_CACHE_TTL, CFG_WEBBLOG_CACHE_CHECK_INTERVAL, \
+    CFG_WEBBLOG_CACHE_REQUEST_TIMEOUT
+from invenio.webblog_dblayer import get_db_datetime, \
+    get_recids_modified_since, get_hierarchy_parents, \
+    get_fieldvalues_for_records, get_hierarchy_updated_since
+
+
+class WebBlogLRUCache:
+    """
+    Bounded cache with time to live. When it is full, the least
+    recently used tenth of the entries is evicted at once.
+    Every entry is tagged with the recid it depends on, so that
+    all the entries of a record can be invalidated.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = {}  # key -> [expiration time, last access, value, tag]
+        self._tags = {}     # tag -> set of keys
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        @return: (True, value) if the key is cached and did not
+        expire, (False, None) otherwise
+        @rtype: tuple
+        """
+
+        self._lock.acquire()
+        try:
+            entry = self._entries.get(key)
+            if entry is None:
+                return (False, None)
+            if entry[0] < time.time():
+                self._remove(key)
+                return (False, None)
+            self._clock += 1
+            entry[1] = self._clock
+            return (True, entry[2])
+        finally:
+            self._lock.release()
+
+    def set(self, key, value, tag=None):
+        """ Caches value under key, tagged with the given recid """
+
+        self._lock.acquire()
+        try:
+            if key not in self._entries and len(self._entries) >= self.size:
+                self._evict()
+            self._clock += 1
+            self._entries[key] = [time.time() + self.ttl, self._clock,
+                                  value, tag]
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+        finally:
+            self._lock.release()
+
+    def invalidate(self, tags):
+        """
+        Removes all the entries tagged with any of the given recids
+        @return: number of removed entries
+        @rtype: int
+        """
+
+        removed = 0
+        self._lock.acquire()
+        try:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+        finally:
+            self._lock.release()
+        return removed
+
+    def clear(self):
+        """ Removes all the entries """
+
+        self._lock.acquire()
+        try:
+            self._entries.clear()
+            self._tags.clear()
+        finally:
+            self._lock.release()
+
+    def _remove(self, key):
+        """ Removes one entry. The lock must be held. """
+
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[3] is not None:
+            keys = self._tags.get(entry[3])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[entry[3]]
+
+    def _evict(self):
+        """ Evicts the least recently used entries. The lock must be held. """
+
+        by_access = sorted(self._entries.items(), key=lambda item: item[1][1])
+        for key, dummy in by_access[:max(1, self.size / 10)]:
+            self._remove(key)
+
+
+_process_cache = WebBlogLRUCache(CFG_WEBBLOG_CACHE_SIZE, CFG_WEBBLOG_CACHE_TTL)
+_request_cache = threading.local()
+_statistics = {'request_hits': 0,
+               'request_misses': 0,
+               'process_hits': 0,
+               'process_misses': 0,
+               'invalidations': 0}
+_last_check = {'time': 0, 'db_time': None}
+_check_lock = threading.Lock()
+
+
+def webblog_cache_start_request():
+    """ Starts the request tier of the current thread. To be called
+    at the beginning of every page rendering. """
+
+    _request_cache.entries = {}
+    _request_cache.started = time.time()
+
+
+def webblog_cache_end_request():
+    """ Drops the request tier of the current thread. """
+
+    _request_cache.entries = None
+
+
+def _get_request_entries():
+    """ @return: the request tier of the current thread, or None if
+    there is none or if it outlived its request """
+
+    entries = getattr(_request_cache, 'entries', None)
+    if entries is not None and \
+           time.time() - _request_cache.started > CFG_WEBBLOG_CACHE_REQUEST_TIMEOUT:
+        webblog_cache_end_request()
+        return None
+    return entries
+
+
+def webblog_cache_invalidate(recids):
+    """
+    Invalidates the cached entries of the given records in the
+    request and process tiers of this process
+    @param recids: records recids
+    @type recids: list or intbitset
+    """
+
+    recids = [int(recid) for recid in recids]
+    if getattr(_request_cache, 'entries', None):
+        _request_cache.entries.clear()
+    _statistics['invalidations'] += _process_cache.invalidate(recids)
+
+
+def webblog_cache_clear():
+    """ Empties both tiers """
+
+    webblog_cache_end_request()
+    _process_cache.clear()
+
+
+def get_webblog_cache_statistics():
+    """
+    @return: hit and miss counters of both tiers and the number
+    of entries in the process tier
+    @rtype: dict
+    """
+
+    statistics = dict(_statistics)
+    statistics['process_size'] = len(_process_cache)
+    return statistics
+
+
+def get_records_with_parents(recids):
+    """
+    @param recids: records recids
+    @type recids: list
+    @return: the given records together with their parent blogs and
+    posts, whose cached entries depend on their children too
+    @rtype: set
+    """
+
+    out = set(recids) | get_hierarchy_parents(recids)
+    # records that are not indexed yet
+    for tag in ('760__w', '773__w'):
+        for values in get_fieldvalues_for_records(recids, tag).values():
+            out.update([_wash_recid(value) for value in values])
+    return out
+
+
+def _check_modified_records():
+    """ Invalidates the entries of the records that were modified
+    since the last check, at most every CFG_WEBBLOG_CACHE_CHECK_INTERVAL
+    seconds """
+
+    if time.time() - _last_check['time'] < CFG_WEBBLOG_CACHE_CHECK_INTERVAL:
+        return
+    if not _check_lock.acquire(False):
+        # another thread is already checking
+        return
+    try:
+        _last_check['time'] = time.time()
+        db_time = get_db_datetime()
+        if _last_check['db_time'] is not None:
+            recids = set(get_recids_modified_since(_last_check['db_time']))
+            recids |= get_hierarchy_updated_since(_last_check['db_time'])
+            if len(recids) >= CFG_WEBBLOG_CACHE_SIZE:
+                _process_cache.clear()
+            elif recids:
+                _statistics['invalidations'] += \
+                    _process_cache.invalidate(
+                        get_records_with_parents(list(recids)))
+        _last_check['db_time'] = db_time
+    finally:
+        _check_lock.release()
+
+
+def _wash_recid(recid):
+    """ Returns recid as an integer when possible """
+
+    try:
+        return int(recid)
+    except (TypeError, ValueError):
+        return recid
+
+
+def webblog_memoize(function):
+    """
+    Decorator caching the results of a webblog_utils helper whose
+    first argument is the recid the result depends on. The recid is
+    given to the helper as an integer. Cached lists are copied so
+    that callers can modify them, and so are cached dictionaries.
+    """
+
+    name = function.__name__
+
+    def memoized_function(recid, *args, **kwargs):
+        recid = _wash_recid(recid)
+        key = (name, recid, args, tuple(sorted(kwargs.items())))
+
+        request_entries = _get_request_entries()
+        if request_entries is not None:
+            if key in request_entries:
+                _statistics['request_hits'] += 1
+                return _copy(request_entries[key])
+            _statistics['request_misses'] += 1
+
+        _check_modified_records()
+        found, value = _process_cache.get(key)
+        if found:
+            _statistics['process_hits'] += 1
+        else:
+            _statistics['process_misses'] += 1
+            value = function(recid, *args, **kwargs)
+            _process_cache.set(key, value, tag=recid)
+
+        if request_entries is not None:
+            request_entries[key] = value
+        return _copy(value)
+
+    memoized_function.__name__ = name
+    memoized_function.__doc__ = function.__doc__
+    return memoized_function
+
+
+def _copy(value):
+    """ Returns a copy of value if it is a list or a dictionary """
+
+    if isinstance(value, list):
+        return value[:]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+##
+## This file is part of Invenio.
+## Copyright (C) 2012 CERN.
+##
+## Invenio is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 2 of the
+## License, or (at your option) any later version.
+##
+## Invenio is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Invenio; if not, write to the Free Software Foundation, Inc.,
+## 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+WebBlog configuration parameters.
+"""
+
+__revision__ = "$Id$"
+
+import os
+from invenio.config import CFG_CACHEDIR
+
+# collection values (980__a) of the different kinds of records
+CFG_WEBBLOG_BLOG = 'BLOG'
+CFG_WEBBLOG_BLOGPOST = 'BLOGPOST'
+CFG_WEBBLOG_COMMENT = 'COMMENT'
+CFG_WEBBLOG_INITIALBLOG = 'INITIALBLOG'
+CFG_WEBBLOG_REJBLOG = 'REJBLOG'
+# value of 980__c for deleted records
+CFG_WEBBLOG_DELETED = 'DELETED'
+
+# bibupload post-processing plugins that keep the WebBlog tables
+# up to date. They are passed to every bibupload task submitted by
+# WebBlog (bloguploader, WebSubmit functions).
+CFG_WEBBLOG_BIBUPLOAD_POST_PLUGINS = ['bp_post_webblog']
+
+# number of records that blogindexer processes at once
+CFG_WEBBLOG_INDEXER_CHUNK_SIZE = 1000
+
+# number of recids yielded at once by iter_blog_descendants()
+CFG_WEBBLOG_DESCENDANTS_CHUNK_SIZE = 1000
+
+# maximum number of entries of the per-process WebBlog cache
+CFG_WEBBLOG_CACHE_SIZE = 10000
+
+# number of seconds after which a WebBlog cache entry expires
+CFG_WEBBLOG_CACHE_TTL = 300
+
+# number of seconds between two checks for records modified by
+# bibupload, whose WebBlog cache entries must be invalidated
+CFG_WEBBLOG_CACHE_CHECK_INTERVAL = 10
+
+# number of seconds after which the request tier of a thread is
+# dropped, in case a page failed before the end of the request
+CFG_WEBBLOG_CACHE_REQUEST_TIMEOUT = 60
+
+# whether to print the WebBlog cache hit and miss counters as an
+# HTML comment at the bottom of detailed record pages
+CFG_WEBBLOG_CACHE_SHOW_STATISTICS = False
+
+# maximum number of blog and post timelines kept per process
+CFG_WEBBLOG_TIMELINE_CACHE_SIZE = 1000
+
+# number of recids whose kind is loaded at once when the WebBlog
+# record kinds are loaded for the whole archive
+CFG_WEBBLOG_RECORD_KIND_RANGE_SIZE = 100000
+
+# number of modified records above which the WebBlog record kinds
+# are reloaded for the whole archive instead of record by record
+CFG_WEBBLOG_RECORD_KIND_MAX_UPDATES = 100000
+
+# file where blogindexer --snapshot writes the blog hierarchy, which
+# is memory-mapped by all the processes rendering blog pages
+CFG_WEBBLOG_SNAPSHOT_PATH = os.path.join(CFG_CACHEDIR, 'webblog',
+                                         'hierarchy.snapshot')
+
+# number of records bloguploader writes to every MARCXML file, each
+# file being uploaded by its own bibupload task
+CFG_WEBBLOG_UPLOADER_CHUNK_SIZE = 5000
+
+# maximum number of blogs that bloguploader --sync deletes without
+# --force, in case the given list of blogs is truncated
+CFG_WEBBLOG_SYNC_MAX_DELETIONS = 100
+
+# maximum number of blog URLs bloguploader checks simultaneously, and
+# simultaneously on the same host
+CFG_WEBBLOG_URLCHECK_THREADS = 20
+CFG_WEBBLOG_URLCHECK_THREADS_PER_HOST = 2
+
+# number of seconds to wait for a blog server to accept the connection,
+# and then to answer
+CFG_WEBBLOG_URLCHECK_CONNECT_TIMEOUT = 10
+CFG_WEBBLOG_URLCHECK_READ_TIMEOUT = 30
+
+# HTTP statuses for which a blog URL is not valid (as for url_is_valid()
+# of WebBasket, other errors may be temporary)
+CFG_WEBBLOG_URLCHECK_INVALID_STATUSES = (400, 404, 500)
+
+# number of blog URLs bloguploader reads from its input file before
+# checking them all at once
+CFG_WEBBLOG_URLCHECK_BATCH_SIZE = 1000
+
+# file where the results of the blog URL checks are kept, and number
+# of seconds during which they are reused
+CFG_WEBBLOG_URLCHECK_CACHE_PATH = os.path.join(CFG_CACHEDIR, 'webblog',
+                                               'urlcheck.cache')
+CFG_WEBBLOG_URLCHECK_CACHE_TTL = 24 * 3600
+
+# directory where bloguploader keeps the journal of the bibupload tasks
+# submitted for every input file, to resume an interrupted run
+CFG_WEBBLOG_UPLOADER_JOURNAL_DIR = os.path.join(CFG_CACHEDIR, 'webblog',
+                                                'journals')
+
+# where the HTML brief formats of posts and comments listed on blog
+# and post pages are cached: 'memory' for a per-process LRU cache,
+# 'disk' for files shared by all the processes, None not to cache them
+CFG_WEBBLOG_FRAGMENT_CACHE_BACKEND = 'memory'
+
+# maximum number of cached fragments (per process for 'memory')
+CFG_WEBBLOG_FRAGMENT_CACHE_SIZE = 20000
+
+# directory of the 'disk' fragment cache
+CFG_WEBBLOG_FRAGMENT_CACHE_DIR = os.path.join(CFG_CACHEDIR, 'webblog',
+                                              'fragments')
+
+# languages whose fragments the bibupload post-processing plugin
+# renders for the uploaded posts and comments ('disk' cache only)
+CFG_WEBBLOG_FRAGMENT_CACHE_WARM_LANGUAGES = ['en']
+
+# maximum number of characters of the comment snippets shown by the
+# comment navigation menu (at most 255, the size of their column)
+CFG_WEBBLOG_SNIPPET_LENGTH = 150
+
+# number of posts or comments that the blog and post pages load at once
+# when the user asks for more of them, and the maximum a request can ask
+CFG_WEBBLOG_PAGE_SIZE = 20
+CFG_WEBBLOG_MAX_PAGE_SIZE = 100
+
+# path where WebInterfaceWebBlogPages is mounted in Invenio's
+# webinterface_layout, e.g. '/blog'. While it is None, the blog and
+# post pages include all their posts and comments instead of loading
+# the older ones on demand
+CFG_WEBBLOG_PAGES_PATH = None
@@ -0,0 +1,825 @@
+# -*- coding: utf-8 -*-
+##
+## This file is part of Invenio.
+## Copyright (C) 2012 CERN.
+##
+## Invenio is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 2 of the
+## License, or (at your option) any later version.
+##
+## Invenio is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Invenio; if not, write to the Free Software Foundation, Inc.,
+## 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+WebBlog database layer: every SQL query on the WebBlog tables
+(blgHIERARCHY, blgSTATISTICS, blgSNIPPET, blgURL, blgINDEX)
+and the bulk queries on the bibxxx tables used by WebBlog go here.
+"""
+
+__revision__ = "$Id$"
+
+from invenio.dbquery import run_sql
+from invenio.intbitset import intbitset
+from invenio.webblog_config import CFG_WEBBLOG_BLOG, \
+    CFG_WEBBLOG_BLOGPOST, CFG_WEBBLOG_COMMENT, CFG_WEBBLOG_DELETED
+
+# maximum number of values given to a single "IN (...)" clause
+CFG_WEBBLOG_SQL_IN_CHUNK_SIZE = 1000
+
+
+def _chunks(values, size=CFG_WEBBLOG_SQL_IN_CHUNK_SIZE):
+    """
+    Splits the given values in lists of at most SIZE elements
+    @param values: values to split
+    @type values: list, intbitset or any iterable
+    @return: generator of lists
+    """
+
+    chunk = []
+    for value in values:
+        chunk.append(value)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _bibxxx_tables(tag):
+    """
+    @param tag: MARC tag, e.g. '760__w'
+    @type tag: string
+    @return: the names of the bibxxx and bibrec_bibxxx tables
+    where the values of the given tag are stored
+    @rtype: tuple (bibxxx, bibrec_bibxxx)
+    """
+
+    digits = tag[0:2]
+    return ("bib%sx" % digits, "bibrec_bib%sx" % digits)
+
+
+#####  BIBXXX #####
+
+def get_fieldvalues_for_records(recids, tag):
+    """
+    Bulk version of get_fieldvalues(): returns the values of the
+    given tag for all the given records using one query per chunk
+    of records
+    @param recids: records recids
+    @type recids: list or intbitset
+    @param tag: MARC tag, e.g. '760__w'
+    @type tag: string
+    @return: values of the tag for each record having it
+    @rtype: dict {recid: [value1, value2, ...]}
+    """
+
+    bibxxx, bibrec_bibxxx = _bibxxx_tables(tag)
+    out = {}
+    for chunk in _chunks(recids):
+        query = """SELECT bb.id_bibrec, b.value FROM %s AS b, %s AS bb
+                   WHERE b.tag=%%s AND bb.id_bibxxx=b.id
+                   AND bb.id_bibrec IN (%s)
+                   ORDER BY bb.field_number""" % \
+                   (bibxxx, bibrec_bibxxx, ",".join(["%s"] * len(chunk)))
+        for recid, value in run_sql(query, tuple([tag] + chunk)):
+            out.setdefault(recid, []).append(value)
+    return out
+
+
+def get_fieldvalues_for_range(tag, low, high):
+    """
+    Same as get_fieldvalues_for_records() for all the records whose
+    recid is between LOW and HIGH, both included
+    @param tag: MARC tag, e.g. '980__a'
+    @type tag: string
+    @return: values of the tag for each record having it
+    @rtype: dict {recid: [value1, value2, ...]}
+    """
+
+    bibxxx, bibrec_bibxxx = _bibxxx_tables(tag)
+    out = {}
+    query = """SELECT bb.id_bibrec, b.value FROM %s AS b, %s AS bb
+               WHERE b.tag=%%s AND bb.id_bibxxx=b.id
+               AND bb.id_bibrec BETWEEN %%s AND %%s
+               ORDER BY bb.field_number""" % (bibxxx, bibrec_bibxxx)
+    for recid, value in run_sql(query, (tag, low, high)):
+        out.setdefault(recid, []).append(value)
+    return out
+
+
+def get_recids_with_fieldvalues(tag, values):
+    """
+    Returns all the records having any of the given values in the
+    given tag, e.g. all the posts of some blogs for tag '760__w'
+    @param tag: MARC tag, e.g. '760__w'
+    @type tag: string
+    @param values: values to look for
+    @type values: list
+    @return: records recids
+    @rtype: intbitset
+    """
+
+    bibxxx, bibrec_bibxxx = _bibxxx_tables(tag)
+    out = intbitset()
+    for chunk in _chunks([str(value) for value in values]):
+        query = """SELECT bb.id_bibrec FROM %s AS b, %s AS bb
+                   WHERE b.tag=%%s AND b.value IN (%s)
+                   AND bb.id_bibxxx=b.id""" % \
+                   (bibxxx, bibrec_bibxxx, ",".join(["%s"] * len(chunk)))
+        out |= intbitset(run_sql(query, tuple([tag] + chunk)))
+    return out
+
+
+def get_recids_by_fieldvalues(tag, values):
+    """
+    Returns the records having each of the given values in the
+    given tag, e.g. the records of some blog URLs for tag '520__u'
+    @param tag: MARC tag, e.g. '520__u'
+    @type tag: string
+    @param values: values to look for
+    @type values: list
+    @return: recids of the records having each value found
+    @rtype: dict {value: intbitset}
+    """
+
+    bibxxx, bibrec_bibxxx = _bibxxx_tables(tag)
+    out = {}
+    for chunk in _chunks(set([str(value) for value in values])):
+        query = """SELECT b.value, bb.id_bibrec FROM %s AS b, %s AS bb
+                   WHERE b.tag=%%s AND b.value IN (%s)
+                   AND bb.id_bibxxx=b.id""" % \
+                   (bibxxx, bibrec_bibxxx, ",".join(["%s"] * len(chunk)))
+        for value, recid in run_sql(query, tuple([tag] + chunk)):
+            out.setdefault(value, intbitset()).add(recid)
+    return out
+
+
+def get_existing_recids(recids):
+    """
+    @param recids: records recids
+    @type recids: list or intbitset
+    @return: the subset of the given recids present in bibrec
+    @rtype: list
+    """
+
+    out = []
+    for chunk in _chunks(recids):
+        res = run_sql("SELECT id FROM bibrec WHERE id IN (%s)" % \
+                      ",".join(["%s"] * len(chunk)), tuple(chunk))
+        out += [row[0] for row in res]
+    return out
+
+
+def get_recids_in_range(low, high):
+    """
+    @return: recids of the records of bibrec between LOW and HIGH,
+    both included
+    @rtype: list
+    """
+
+    res = run_sql("SELECT id FROM bibrec WHERE id BETWEEN %s AND %s",
+                  (low, high))
+    return [row[0] for row in res]
+
+
+def get_max_recid():
+    """
+    @return: the highest recid of bibrec, 0 if there is no record
+    @rtype: int
+    """
+
+    return run_sql("SELECT IFNULL(MAX(id), 0) FROM bibrec")[0][0]
+
+
+def get_recids_modified_since(date):
+    """
+    @param date: datetime string, e.g. '2012-10-23 10:00:00'
+    @type date: string
+    @return: recids of all the records modified since the given date
+    @rtype: list
+    """
+
+    res = run_sql("SELECT id FROM bibrec WHERE modification_date>=%s",
+                  (date,))
+    return [row[0] for row in res]
+
+
+def get_hierarchy_updated_since(date):
+    """
+    @param date: datetime string, e.g. '2012-10-23 10:00:00'
+    @type date: string
+    @return: recids of the records whose hierarchy entry, or whose
+    blog statistics, were updated since the given date
+    @rtype: set
+    """
+
+    res = run_sql("SELECT id_bibrec FROM blgHIERARCHY WHERE last_updated>=%s",
+                  (date,))
+    out = set([row[0] for row in res])
+    res = run_sql("SELECT id_blog FROM blgSTATISTICS WHERE last_updated>=%s",
+                  (date,))
+    out.update([row[0] for row in res])
+    return out
+
+
+def get_modification_dates(recids):
+    """
+    @param recids: records recids
+    @type recids: list or intbitset
+    @return: the modification date of each existing record
+    @rtype: dict {recid: datetime}
+    """
+
+    out = {}
+    for chunk in _chunks(recids):
+        res = run_sql("SELECT id, modification_date FROM bibrec WHERE id IN (%s)" % \
+                      ",".join(["%s"] * len(chunk)), tuple(chunk))
+        out.update(dict(res))
+    return out
+
+
+def get_db_datetime():
+    """
+    @return: the current date and time of the database server
+    @rtype: string
+    """
+
+    return run_sql("SELECT DATE_FORMAT(NOW(), '%Y-%m-%d %H:%i:%s')")[0][0]
+
+
+def get_recids_with_files(recids):
+    """
+    @param recids: records recids
+    @type recids: list or intbitset
+    @return: the subset of the given recids having attached files
+    @rtype: intbitset
+    """
+
+    out = intbitset()
+    for chunk in _chunks(recids):
+        out |= intbitset(run_sql("""SELECT DISTINCT id_bibrec FROM bibrec_bibdoc
+                                    WHERE id_bibrec IN (%s)""" % \
+                                 ",".join(["%s"] * len(chunk)), tuple(chunk)))
+    return out
+
+
+def get_all_recids():
+    """
+    @return: recids of all the records in bibrec
+    @rtype: list
+    """
+
+    return [row[0] for row in run_sql("SELECT id FROM bibrec ORDER BY id")]
+
+
+#####  HIERARCHY #####
+
+def get_hierarchy_entry(recid):
+    """
+    @param recid: record recid
+    @type recid: int
+    @return: the hierarchy entry of the given record or None
+    if it is not indexed yet
+    @rtype: tuple (kind, id_blog, id_post, pubdate)
+    """
+
+    res = run_sql("""SELECT kind, id_blog, id_post, pubdate
+                     FROM blgHIERARCHY WHERE id_bibrec=%s""",
+                  (recid,))
+    if res:
+        return res[0]
+    return None
+
+
+def _parent_column(kind):
+    """
+    @param kind: kind of the children, BLOGPOST or COMMENT
+    @type kind: string
+    @return: the blgHIERARCHY column holding the parent of that kind
+    of records
+    @rtype: string
+    """
+
+    if kind == CFG_WEBBLOG_COMMENT:
+        return 'id_post'
+    return 'id_blog'
+
+
+def get_hierarchy_children(parent_recid, kind, newest_first=True,
+                           offset=0, limit=None):
+    """
+    @param parent_recid: blog recid if kind is BLOGPOST, post
+    recid if kind is COMMENT
+    @type parent_recid: int
+    @param kind: kind of the children, BLOGPOST or COMMENT
+    @type kind: string
+    @param newest_first: sort direction of the children
+    @type newest_first: boolean
+    @param offset: number of children to skip
+    @type offset: int
+    @param limit: maximum number of children to return, all if None
+    @type limit: int
+    @return: children recids sorted by publication date
+    @rtype: list
+    """
+
+    if newest_first:
+        direction = 'DESC'
+    else:
+        direction = 'ASC'
+    query = """SELECT id_bibrec FROM blgHIERARCHY
+               WHERE %(parent)s=%%s AND kind=%%s
+               ORDER BY pubdate %(direction)s, id_bibrec %(direction)s""" % \
+               {'parent': _parent_column(kind), 'direction': direction}
+    params = (parent_recid, kind)
+    if limit is not None:
+        query += " LIMIT %s, %s"
+        params += (int(offset), int(limit))
+    elif offset:
+        # MySQL needs a limit to use an offset
+        query += " LIMIT %s, 18446744073709551615"
+        params += (int(offset),)
+    return [row[0] for row in run_sql(query, params)]
+
+
+def count_hierarchy_children(parent_recid, kind):
+    """
+    @param parent_recid: blog recid if kind is BLOGPOST, post
+    recid if kind is COMMENT
+    @type parent_recid: int
+    @param kind: kind of the children, BLOGPOST or COMMENT
+    @type kind: string
+    @return: number of children
+    @rtype: int
+    """
+
+    return run_sql("""SELECT COUNT(*) FROM blgHIERARCHY
+                      WHERE %s=%%s AND kind=%%s""" % _parent_column(kind),
+                   (parent_recid, kind))[0][0]
+
+
+def _parent_tag(kind):
+    """
+    @param kind: kind of the children, BLOGPOST or COMMENT
+    @type kind: string
+    @return: the MARC tag holding the parent of that kind of records
+    @rtype: string
+    """
+
+    if kind == CFG_WEBBLOG_COMMENT:
+        return '773__w'
+    return '760__w'
+
+
+def has_unindexed_children(parent_recid, kind):
+    """
+    Tells whether the hierarchy entries of the children of a record
+    are outdated: some child was uploaded, modified or deleted after
+    its entry was written, e.g. by a bibupload run without the
+    bp_post_webblog plugin
+    @param parent_recid: blog recid if kind is BLOGPOST, post
+    recid if kind is COMMENT
+    @type parent_recid: int
+    @param kind: kind of the children, BLOGPOST or COMMENT
+    @type kind: string
+    @return: True if some child is not indexed or outdated
+    @rtype: boolean
+    """
+
+    tag = _parent_tag(kind)
+    bibxxx, bibrec_bibxxx = _bibxxx_tables(tag)
+    # children that are not indexed, or indexed before their update
+    if run_sql("""SELECT bb.id_bibrec FROM %s AS b, %s AS bb, bibrec AS r
+                  LEFT JOIN blgHIERARCHY AS h ON h.id_bibrec=r.id
+                  WHERE b.tag=%%s AND b.value=%%s AND bb.id_bibxxx=b.id
+                  AND r.id=bb.id_bibrec
+                  AND (h.id_bibrec IS NULL
+                       OR h.last_updated<r.modification_date)
+                  LIMIT 1""" % (bibxxx, bibrec_bibxxx),
+               (tag, str(parent_recid))):
+        return True
+    # indexed children that were deleted or moved since
+    return bool(run_sql("""SELECT h.id_bibrec FROM blgHIERARCHY AS h, bibrec AS r
+                           WHERE h.%s=%%s AND h.kind=%%s AND r.id=h.id_bibrec
+                           AND h.last_updated<r.modification_date
+                           LIMIT 1""" % _parent_column(kind),
+                        (parent_recid, kind)))
+
+
+def get_hierarchy_timeline(parent_recid, kind):
+    """
+    @param parent_recid: blog recid if kind is BLOGPOST, post
+    recid if kind is COMMENT
+    @type parent_recid: int
+    @param kind: kind of the children, BLOGPOST or COMMENT
+    @type kind: string
+    @return: children recids and publication timestamps, oldest first
+    @rtype: tuple of (recid, timestamp)
+    """
+
+    return run_sql("""SELECT id_bibrec, IFNULL(UNIX_TIMESTAMP(pubdate), 0)
+                      FROM blgHIERARCHY WHERE %s=%%s AND kind=%%s
+                      ORDER BY pubdate, id_bibrec""" % _parent_column(kind),
+                   (parent_recid, kind))
+
+
+def get_hierarchy_timeline_changes(parent_recid, kind, since):
+    """
+    @param parent_recid: blog recid if kind is BLOGPOST, post
+    recid if kind is COMMENT
+    @type parent_recid: int
+    @param kind: kind of the children, BLOGPOST or COMMENT
+    @type kind: string
+    @param since: datetime string
+    @type since: string
+    @return: the children of any kind whose entry was updated
+    since the given date
+    @rtype: tuple of (recid, kind, timestamp)
+    """
+
+    return run_sql("""SELECT id_bibrec, kind, IFNULL(UNIX_TIMESTAMP(pubdate), 0)
+                      FROM blgHIERARCHY WHERE %s=%%s AND last_updated>=%%s""" % \
+                   _parent_column(kind), (parent_recid, since))
+
+
+def get_hierarchy_entries_for_records(recids):
+    """
+    @param recids: records recids
+    @type recids: list or intbitset
+    @return: the hierarchy entries of the given records that are
+    indexed
+    @rtype: dict {recid: (kind, id_blog, id_post, filesize)}
+    """
+
+    out = {}
+    for chunk in _chunks(recids):
+        res = run_sql("""SELECT id_bibrec, kind, id_blog, id_post, filesize
+                         FROM blgHIERARCHY WHERE id_bibrec IN (%s)""" % \
+                      ",".join(["%s"] * len(chunk)), tuple(chunk))
+        for row in res:
+            out[row[0]] = row[1:]
+    return out
+
+
+def get_hierarchy_range(low, high):
+    """
+    @return: the hierarchy entries of the records whose recid is
+    between LOW and HIGH, both included
+    @rtype: tuple of (recid, kind, id_blog, id_post, pubdate timestamp)
+    """
+
+    return run_sql("""SELECT id_bibrec, kind, id_blog, id_post,
+                             IFNULL(UNIX_TIMESTAMP(pubdate), 0)
+                      FROM blgHIERARCHY WHERE id_bibrec BETWEEN %s AND %s""",
+                   (low, high))
+
+
+def get_max_hierarchy_recid():
+    """
+    @return: the highest recid of the hierarchy, 0 if it is empty
+    @rtype: int
+    """
+
+    return run_sql("SELECT IFNULL(MAX(id_bibrec), 0) FROM blgHIERARCHY")[0][0]
+
+
+def get_hierarchy_parents(recids):
+    """
+    @param recids: records recids
+    @type recids: list or intbitset
+    @return: the parent blogs and posts of the given records
+    @rtype: set
+    """
+
+    out = set()
+    for chunk in _chunks(recids):
+        res = run_sql("""SELECT id_blog, id_post FROM blgHIERARCHY
+                         WHERE id_bibrec IN (%s)""" % \
+                      ",".join(["%s"] * len(chunk)), tuple(chunk))
+        for id_blog, id_post in res:
+            out.add(id_blog)
+            out.add(id_post)
+    out.discard(0)
+    return out
+
+
+def get_indexed_recids(recids):
+    """
+    @param recids: records recids
+    @type recids: list or intbitset
+    @return: the subset of the given recids present in the hierarchy
+    @rtype: intbitset
+    """
+
+    out = intbitset()
+    for chunk in _chunks(recids):
+        out |= intbitset(run_sql("""SELECT id_bibrec FROM blgHIERARCHY
+                                    WHERE id_bibrec IN (%s)""" % \
+                                 ",".join(["%s"] * len(chunk)), tuple(chunk)))
+    return out
+
+
+def get_hierarchy_descendants(blog_recids):
+    """
+    @param blog_recids: blogs recids
+    @type blog_recids: list or intbitset
+    @return: all the records (posts, comments, ...) that belong to
+    the given blogs and are not deleted
+    @rtype: intbitset
+    """
+
+    out = intbitset()
+    for chunk in _chunks(blog_recids):
+        out |= intbitset(run_sql("""SELECT id_bibrec FROM blgHIERARCHY
+                                    WHERE id_blog IN (%s) AND kind!=%%s""" % \
+                                 ",".join(["%s"] * len(chunk)),
+                                 tuple(chunk + [CFG_WEBBLOG_DELETED])))
+    return out
+
+
+def iter_hierarchy_descendants(blog_recid, chunk_size):
+    """
+    Same as get_hierarchy_descendants() for one blog, but the
+    descendants are read in chunks ordered by recid
+    @param blog_recid: blog recid
+    @type blog_recid: int
+    @param chunk_size: maximum number of recids per chunk
+    @type chunk_size: int
+    @return: generator of lists of recids
+    """
+
+    last_recid = 0
+    while True:
+        res = run_sql("""SELECT id_bibrec FROM blgHIERARCHY
+                         WHERE id_blog=%s AND id_bibrec>%s AND kind!=%s
+                         ORDER BY id_bibrec LIMIT %s""",
+                      (blog_recid, last_recid, CFG_WEBBLOG_DELETED,
+                       chunk_size))
+        if not res:
+            break
+        chunk = [row[0] for row in res]
+        yield chunk
+        last_recid = chunk[-1]
+
+
+def update_hierarchy_entries(entries):
+    """
+    Inserts or replaces the hierarchy entries of some records
+    @param entries: list of (recid, kind, id_blog, id_post, pubdate,
+    filesize)
+    @type entries: list of tuples
+    """
+
+    for entry in entries:
+        run_sql("""REPLACE INTO blgHIERARCHY
+                   (id_bibrec, kind, id_blog, id_post, pubdate, filesize,
+                    last_updated)
+                   VALUES (%s, %s, %s, %s, %s, %s, NOW())""", entry)
+
+
+def delete_hierarchy_entries(recids):
+    """
+    @param recids: recids of the records to remove from the hierarchy
+    @type recids: list or intbitset
+    """
+
+    for chunk in _chunks(recids):
+        run_sql("DELETE FROM blgHIERARCHY WHERE id_bibrec IN (%s)" % \
+                ",".join(["%s"] * len(chunk)), tuple(chunk))
+
+
+def truncate_hierarchy():
+    """ Removes all the hierarchy entries """
+
+    run_sql("TRUNCATE blgHIERARCHY")
+
+
+#####  STATISTICS #####
+
+def get_statistics(blog_recid):
+    """
+    @param blog_recid: blog recid
+    @type blog_recid: int
+    @return: the statistics of the given blog or None if it has
+    no statistics yet
+    @rtype: tuple (nb_posts, nb_comments, first_post_date,
+    last_post_date, total_filesize)
+    """
+
+    res = run_sql("""SELECT nb_posts, nb_comments, first_post_date,
+                            last_post_date, total_filesize
+                     FROM blgSTATISTICS WHERE id_blog=%s""", (blog_recid,))
+    if res:
+        return res[0]
+    return None
+
+
+def add_to_statistics(deltas):
+    """
+    Adds the given numbers to the statistics of some blogs, creating
+    them if needed, and recomputes their first and last post dates
+    @param deltas: {blog recid: (posts, comments, filesize)}
+    @type deltas: dict
+    """
+
+    for blog_recid, (nb_posts, nb_comments, filesize) in deltas.items():
+        run_sql("""INSERT INTO blgSTATISTICS
+                   (id_blog, nb_posts, nb_comments, total_filesize,
+                    last_updated)
+                   VALUES (%s, %s, %s, %s, NOW())
+                   ON DUPLICATE KEY UPDATE
+                   nb_posts=nb_posts+VALUES(nb_posts),
+                   nb_comments=nb_comments+VALUES(nb_comments),
+                   total_filesize=total_filesize+VALUES(total_filesize),
+                   last_updated=NOW()""",
+                (blog_recid, nb_posts, nb_comments, filesize))
+        # both dates are read from the blog_kind_pubdate key
+        run_sql("""UPDATE blgSTATISTICS SET
+                   first_post_date=(SELECT IFNULL(MIN(pubdate), '0000-00-00 00:00:00')
+                       FROM blgHIERARCHY WHERE id_blog=%s AND kind=%s),
+                   last_post_date=(SELECT IFNULL(MAX(pubdate), '0000-00-00 00:00:00')
+                       FROM blgHIERARCHY WHERE id_blog=%s AND kind=%s)
+                   WHERE id_blog=%s""",
+                (blog_recid, CFG_WEBBLOG_BLOGPOST,
+                 blog_recid, CFG_WEBBLOG_BLOGPOST, blog_recid))
+
+
+def rebuild_statistics():
+    """ Recomputes the statistics of all the blogs from the hierarchy """
+
+    run_sql("TRUNCATE blgSTATISTICS")
+    run_sql("""INSERT INTO blgSTATISTICS
+               (id_blog, nb_posts, nb_comments, first_post_date,
+                last_post_date, total_filesize, last_updated)
+               SELECT IF(kind=%s, id_bibrec, id_blog) AS blog,
+                      SUM(kind=%s), SUM(kind=%s),
+                      IFNULL(MIN(IF(kind=%s, pubdate, NULL)), '0000-00-00 00:00:00'),
+                      IFNULL(MAX(IF(kind=%s, pubdate, NULL)), '0000-00-00 00:00:00'),
+                      SUM(filesize), NOW()
+               FROM blgHIERARCHY
+               WHERE kind!=%s AND (kind=%s OR id_blog>0)
+               GROUP BY blog""",
+            (CFG_WEBBLOG_BLOG, CFG_WEBBLOG_BLOGPOST, CFG_WEBBLOG_COMMENT,
+             CFG_WEBBLOG_BLOGPOST, CFG_WEBBLOG_BLOGPOST,
+             CFG_WEBBLOG_DELETED, CFG_WEBBLOG_BLOG))
+
+
+def truncate_statistics():
+    """ Removes all the statistics """
+
+    run_sql("TRUNCATE blgSTATISTICS")
+
+
+#####  SNIPPETS #####
+
+def get_snippets(recids):
+    """
+    @param recids: comments recids
+    @type recids: list or intbitset
+    @return: the author and snippet of each comment having some
+    @rtype: dict {recid: (author, snippet)}
+    """
+
+    out = {}
+    for chunk in _chunks(recids):
+        res = run_sql("""SELECT id_bibrec, author, snippet FROM blgSNIPPET
+                         WHERE id_bibrec IN (%s)""" % \
+                      ",".join(["%s"] * len(chunk)), tuple(chunk))
+        for recid, author, snippet in res:
+            out[recid] = (author, snippet)
+    return out
+
+
+def update_snippet_entries(entries):
+    """
+    Inserts or replaces the snippets of some comments
+    @param entries: list of (recid, id_post, author, snippet)
+    @type entries: list of tuples
+    """
+
+    for entry in entries:
+        run_sql("""REPLACE INTO blgSNIPPET (id_bibrec, id_post, author, snippet)
+                   VALUES (%s, %s, %s, %s)""", entry)
+
+
+def delete_snippet_entries(recids):
+    """
+    @param recids: recids of the records whose snippet is removed
+    @type recids: list or intbitset
+    """
+
+    for chunk in _chunks(recids):
+        run_sql("DELETE FROM blgSNIPPET WHERE id_bibrec IN (%s)" % \
+                ",".join(["%s"] * len(chunk)), tuple(chunk))
+
+
+def truncate_snippets():
+    """ Removes all the snippets """
+
+    run_sql("TRUNCATE blgSNIPPET")
+
+
+#####  URLS #####
+
+def get_recids_by_url_hashes(url_hashes):
+    """
+    @param url_hashes: md5 digests of canonical urls
+    @type url_hashes: list
+    @return: the records archiving each url hash having some
+    @rtype: dict {url hash: intbitset}
+    """
+
+    out = {}
+    for chunk in _chunks(url_hashes):
+        res = run_sql("""SELECT url_hash, id_bibrec FROM blgURL
+                         WHERE url_hash IN (%s)""" % \
+                      ",".join(["%s"] * len(chunk)), tuple(chunk))
+        for url_hash, recid in res:
+            out.setdefault(url_hash, intbitset()).add(recid)
+    return out
+
+
+def add_url_entries(entries):
+    """
+    @param entries: list of (recid, url hash)
+    @type entries: list of tuples
+    """
+
+    for entry in entries:
+        run_sql("INSERT IGNORE INTO blgURL (id_bibrec, url_hash) VALUES (%s, %s)",
+                entry)
+
+
+def delete_url_entries(recids):
+    """
+    @param recids: recids of the records whose urls are removed
+    @type recids: list or intbitset
+    """
+
+    for chunk in _chunks(recids):
+        run_sql("DELETE FROM blgURL WHERE id_bibrec IN (%s)" % \
+                ",".join(["%s"] * len(chunk)), tuple(chunk))
+
+
+def truncate_urls():
+    """ Removes all the archived urls """
+
+    run_sql("TRUNCATE blgURL")
+
+
+#####  INDEXER #####
+
+def get_index_last_updated(name):
+    """
+    @param name: name of the blogindexer method, e.g. 'hierarchy'
+    @type name: string
+    @return: the date of the last run of the method or None
+    @rtype: string
+    """
+
+    res = run_sql("SELECT DATE_FORMAT(last_updated, '%%Y-%%m-%%d %%H:%%i:%%s') \
+                   FROM blgINDEX WHERE name=%s", (name,))
+    if res:
+        return res[0][0]
+    return None
+
+
+def set_index_last_updated(name, date):
+    """
+    @param name: name of the blogindexer method, e.g. 'hierarchy'
+    @type name: string
+    @param date: datetime string
+    @type date: string
+    """
+
+    run_sql("REPLACE INTO blgINDEX (name, last_updated) VALUES (%s, %s)",
+            (name, date))
+
+
+#####  TASKS #####
+
+def get_task_with_argument(proc, argument):
+    """
+    @param proc: name of the task, e.g. 'bibupload'
+    @type proc: string
+    @param argument: one of the command line arguments of the task,
+    e.g. the path of the uploaded file
+    @type argument: string
+    @return: the id of the last task of the given name submitted
+    with the given argument, or None
+    @rtype: int
+    """
+
+    pattern = argument.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    res = run_sql("""SELECT id FROM schTASK WHERE proc=%s AND arguments LIKE %s
+                     ORDER BY id DESC LIMIT 1""", (proc, '%' + pattern + '%'))
+    if res:
+        return res[0][0]
+    return None
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+##
+## This file is part of Invenio.
+## Copyright (C) 2012 CERN.
+##
+## Invenio is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 2 of the
+## License, or (at your option) any later version.
+##
+## Invenio is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Invenio; if not, write to the Free Software Foundation, Inc.,
+## 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+WebBlog fragment cache: the formatted records (e.g. the 'hb' brief
+formats of the posts listed on a blog page) keyed by recid, format,
+language and modification date of the record, so that a fragment is
+never used once its record was modified.
+
+The backend is chosen by CFG_WEBBLOG_FRAGMENT_CACHE_BACKEND: a
+per-process LRU cache ('memory') or files shared by all the processes
+('disk'), which the bibupload post-processing plugin fills with the
+uploaded posts and comments.
+"""
+
+__revision__ = "$Id$"
+
+import os
+import tempfile
+import threading
+from hashlib import md5
+from invenio.config import CFG_SITE_LANG
+from invenio.search_engine import print_record
+from invenio.webblog_config import CFG_WEBBLOG_FRAGMENT_CACHE_BACKEND, \
+    CFG_WEBBLOG_FRAGMENT_CACHE_SIZE, CFG_WEBBLOG_FRAGMENT_CACHE_DIR, \
+    CFG_WEBBLOG_FRAGMENT_CACHE_WARM_LANGUAGES
+from invenio.webblog_cache import WebBlogLRUCache
+from invenio.webblog_dblayer import get_modification_dates
+
+# fragments never expire, their key changes with the record instead
+_MEMORY_TTL = 365 * 24 * 3600
+
+# number of fragments written to the disk cache between two checks
+# of its size
+_DISK_CHECK_INTERVAL = 100
+
+
+class WebBlogFragmentDiskCache:
+    """
+    Fragments stored in files, shared by all the processes. When there
+    are more than SIZE files, the least recently used tenth of them is
+    removed.
+    """
+
+    def __init__(self, directory, size):
+        self.directory = directory
+        self.size = size
+        self._nb_writes = 0
+        self._lock = threading.Lock()
+
+    def _get_path(self, key):
+        """ @return: the file of the given key """
+
+        digest = md5(repr(key)).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key):
+        """
+        @return: (True, fragment) if the key is cached,
+        (False, None) otherwise
+        @rtype: tuple
+        """
+
+        path = self._get_path(key)
+        try:
+            fragment_file = open(path, 'rb')
+            try:
+                fragment = fragment_file.read()
+            finally:
+                fragment_file.close()
+            # the modification time is the last access
+            os.utime(path, None)
+        except (IOError, OSError):
+            return (False, None)
+        return (True, fragment)
+
+    def set(self, key, fragment, tag=None):
+        """ Caches fragment under key """
+
+        path = self._get_path(key)
+        directory = os.path.dirname(path)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            fd, tmp_path = tempfile.mkstemp(dir=directory)
+            fragment_file = os.fdopen(fd, 'wb')
+            try:
+                fragment_file.write(fragment)
+            finally:
+                fragment_file.close()
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            # the fragment is rendered again next time
+            return
+
+        self._lock.acquire()
+        try:
+            self._nb_writes += 1
+            if self._nb_writes % _DISK_CHECK_INTERVAL == 0:
+                self._evict()
+        finally:
+            self._lock.release()
+
+    def _evict(self):
+        """ Removes the least recently used files if there are too many """
+
+        paths = []
+        for dirpath, dummy, filenames in os.walk(self.directory):
+            paths.extend([os.path.join(dirpath, filename)
+                          for filename in filenames])
+        if len(paths) <= self.size:
+            return
+        by_access = []
+        for path in paths:
+            try:
+                by_access.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        by_access.sort()
+        for dummy, path in by_access[:len(by_access) - self.size * 9 / 10]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_backend = {}
+
+
+def get_fragment_cache():
+    """
+    @return: the fragment cache of this process, or None if fragments
+    are not cached
+    @rtype: WebBlogLRUCache or WebBlogFragmentDiskCache
+    """
+
+    if 'cache' not in _backend:
+        if CFG_WEBBLOG_FRAGMENT_CACHE_BACKEND == 'memory':
+            _backend['cache'] = WebBlogLRUCache(CFG_WEBBLOG_FRAGMENT_CACHE_SIZE,
+                                                _MEMORY_TTL)
+        elif CFG_WEBBLOG_FRAGMENT_CACHE_BACKEND == 'disk':
+            _backend['cache'] = WebBlogFragmentDiskCache(
+                CFG_WEBBLOG_FRAGMENT_CACHE_DIR, CFG_WEBBLOG_FRAGMENT_CACHE_SIZE)
+        else:
+            _backend['cache'] = None
+    return _backend['cache']
+
+
+def print_records(recids, format='hb', ln=CFG_SITE_LANG):
+    """
+    Cached version of print_record() for many records
+    @param recids: records recids
+    @type recids: list
+    @param format: output format
+    @type format: string
+    @param ln: language
+    @type ln: string
+    @return: the formatted records, in the order of the given recids
+    @rtype: list of strings
+    """
+
+    cache = get_fragment_cache()
+    if cache is None:
+        return [print_record(recid, format=format, ln=ln) for recid in recids]
+
+    modification_dates = get_modification_dates(recids)
+    out = []
+    for recid in recids:
+        key = (int(recid), format, ln, str(modification_dates.get(int(recid))))
+        found, fragment = cache.get(key)
+        if not found:
+            fragment = print_record(recid, format=format, ln=ln)
+            cache.set(key, fragment, tag=int(recid))
+        out.append(fragment)
+    return out
+
+
+def warm_fragments(recids, format='hb',
+                   languages=CFG_WEBBLOG_FRAGMENT_CACHE_WARM_LANGUAGES):
+    """
+    Renders the given records in the disk cache, so that the pages
+    listing them do not have to. Does nothing with the other backends,
+    which are not shared with the web processes.
+    @param recids: records recids
+    @type recids: list
+    @param format: output format
+    @type format: string
+    @param languages: languages to render the records in
+    @type languages: list
+    """
+
+    if not isinstance(get_fragment_cache(), WebBlogFragmentDiskCache):
+        return
+    for ln in languages:
+        print_records(recids, format, ln)
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+##
+## This file is part of Invenio.
+## Copyright (C) 2012 CERN.
+##
+## Invenio is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 2 of the
+## License, or (at your option) any later version.
+##
+## Invenio is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Invenio; if not, write to the Free Software Foundation, Inc.,
+## 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+WebBlog record kinds: the collection (980__a) of every record of the
+archive and whether it was deleted (980__c), kept per process in an
+array of bytes indexed by recid.
+
+The array is loaded for the whole archive on first use and then
+refreshed with the records modified since, at most every
+CFG_WEBBLOG_CACHE_CHECK_INTERVAL seconds.
+"""
+
+__revision__ = "$Id$"
+
+import threading
+import time
+from array import array
+from invenio.webblog_config import CFG_WEBBLOG_DELETED, \
+    CFG_WEBBLOG_CACHE_CHECK_INTERVAL, CFG_WEBBLOG_RECORD_KIND_RANGE_SIZE, \
+    CFG_WEBBLOG_RECORD_KIND_MAX_UPDATES
+from invenio.webblog_dblayer import get_db_datetime, get_max_recid, \
+    get_recids_in_range, get_fieldvalues_for_range, get_existing_recids, \
+    get_fieldvalues_for_records, get_recids_modified_since, _chunks
+
+# codes stored in the array: 0 for no record, 1 for a record without
+# collection, then one code per collection value met so far. Deleted
+# records have the opposite code of their collection.
+_NO_RECORD = 0
+_NO_COLLECTION = 1
+# collections met after the first 126 ones share this code and are
+# read from the database
+_OTHER_COLLECTION = 127
+
+
+class WebBlogRecordKinds:
+    """
+    Collection and deletion status of all the records, indexed by recid
+    """
+
+    def __init__(self):
+        self.codes = array('b')
+        self.collections = [None, '']    # code -> collection
+        self._collection_codes = {'': _NO_COLLECTION}
+        self.db_time = None
+        self.checked_at = 0
+        self.lock = threading.Lock()
+
+    def _get_code(self, collection):
+        """ @return: the code of the given collection """
+
+        code = self._collection_codes.get(collection)
+        if code is None:
+            if len(self.collections) >= _OTHER_COLLECTION:
+                return _OTHER_COLLECTION
+            code = len(self.collections)
+            self.collections.append(collection)
+            self._collection_codes[collection] = code
+        return code
+
+    def _store(self, codes, recids, existing_recids, colls, deleted):
+        """
+        Stores in CODES the codes of the given records
+        @param existing_recids: the given recids present in bibrec
+        @param colls: 980__a values of the given records
+        @param deleted: 980__c values of the given records
+        """
+
+        existing_recids = set(existing_recids)
+        for recid in recids:
+            if recid >= len(codes):
+                codes.extend(array('b', [_NO_RECORD]) * (recid + 1 - len(codes)))
+            if recid not in existing_recids:
+                codes[recid] = _NO_RECORD
+                continue
+            code = self._get_code(colls.get(recid, [''])[0])
+            if CFG_WEBBLOG_DELETED in deleted.get(recid, []):
+                code = -code
+            codes[recid] = code
+
+    def _load_records(self, recids):
+        """ Reloads the codes of the given records. The lock must be held. """
+
+        for chunk in _chunks(recids):
+            self._store(self.codes, chunk, get_existing_recids(chunk),
+                        get_fieldvalues_for_records(chunk, '980__a'),
+                        get_fieldvalues_for_records(chunk, '980__c'))
+
+    def _load_all(self):
+        """ Reloads the codes of all the records. The lock must be held. """
+
+        max_recid = get_max_recid()
+        codes = array('b', [_NO_RECORD]) * (max_recid + 1)
+        for low in range(1, max_recid + 1, CFG_WEBBLOG_RECORD_KIND_RANGE_SIZE):
+            high = low + CFG_WEBBLOG_RECORD_KIND_RANGE_SIZE - 1
+            recids = get_recids_in_range(low, high)
+            self._store(codes, recids, recids,
+                        get_fieldvalues_for_range('980__a', low, high),
+                        get_fieldvalues_for_range('980__c', low, high))
+        self.codes = codes
+
+    def refresh(self):
+        """
+        Loads the codes of all the records the first time, and then
+        reloads the codes of the records modified since the last refresh
+        """
+
+        if time.time() - self.checked_at < CFG_WEBBLOG_CACHE_CHECK_INTERVAL:
+            return
+        if self.db_time is None:
+            # nothing can be answered before the first load
+            self.lock.acquire()
+        elif not self.lock.acquire(False):
+            # another thread is already refreshing
+            return
+        try:
+            if time.time() - self.checked_at < CFG_WEBBLOG_CACHE_CHECK_INTERVAL:
+                return
+            db_time = get_db_datetime()
+            if self.db_time is None:
+                self._load_all()
+            else:
+                recids = get_recids_modified_since(self.db_time)
+                if len(recids) > CFG_WEBBLOG_RECORD_KIND_MAX_UPDATES:
+                    self._load_all()
+                else:
+                    self._load_records(recids)
+            self.db_time = db_time
+            self.checked_at = time.time()
+        finally:
+            self.lock.release()
+
+    def get_codes(self, recids):
+        """
+        @param recids: records recids
+        @type recids: list
+        @return: the codes of the given records
+        @rtype: list
+        """
+
+        self.refresh()
+        codes = self.codes
+        unknown_recids = [recid for recid in recids if recid >= len(codes)]
+        if unknown_recids:
+            # records created since the last refresh
+            self.lock.acquire()
+            try:
+                self._load_records(unknown_recids)
+                codes = self.codes
+            finally:
+                self.lock.release()
+        return [codes[recid] for recid in recids]
+
+    def get_collection(self, recid, code):
+        """
+        @return: the collection of the record having the given code
+        @rtype: string
+        """
+
+        code = abs(code)
+        if code == _OTHER_COLLECTION:
+            colls = get_fieldvalues_for_records([recid], '980__a').get(recid)
+            if colls:
+                return colls[0]
+            return ''
+        return self.collections[code]
+
+
+_record_kinds = WebBlogRecordKinds()
+
+
+def get_kinds(recids):
+    """
+    @param recids: records recids
+    @type recids: list or intbitset
+    @return: the kind of each record, that is DELETED if it was
+    deleted and its collection (980__a) otherwise, or an empty
+    string if it does not exist or has no collection
+    @rtype: dict {recid: kind}
+    """
+
+    recids = [int(recid) for recid in recids]
+    out = {}
+    for recid, code in zip(recids, _record_kinds.get_codes(recids)):
+        if code < 0:
+            out[recid] = CFG_WEBBLOG_DELETED
+        elif code == _NO_RECORD:
+            out[recid] = ''
+        else:
+            out[recid] = _record_kinds.get_collection(recid, code)
+    return out
+
+
+def get_kind(recid):
+    """
+    @param recid: record recid
+    @type recid: int
+    @return: the kind of the record, see get_kinds()
+    @rtype: string
+    """
+
+    recid = int(recid)
+    return get_kinds([recid])[recid]
+
+
+def get_collection(recid):
+    """
+    @param recid: record recid
+    @type recid: int
+    @return: the collection (980__a) of the record even if it was
+    deleted, an empty string if it does not exist or has no collection
+    @rtype: string
+    """
+
+    recid = int(recid)
+    code = _record_kinds.get_codes([recid])[0]
+    if code == _NO_RECORD:
+        return ''
+    return _record_kinds.get_collection(recid, code)
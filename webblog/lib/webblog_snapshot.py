@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+##
+## This file is part of Invenio.
+## Copyright (C) 2012 CERN.
+##
+## Invenio is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 2 of the
+## License, or (at your option) any later version.
+##
+## Invenio is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Invenio; if not, write to the Free Software Foundation, Inc.,
+## 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+WebBlog hierarchy snapshot: the blog hierarchy written periodically by
+blogindexer --snapshot to a binary file of fixed layout, which every
+process rendering blog pages memory-maps read-only, so that all of
+them share one copy of it.
+
+Layout, little-endian, N being the highest recid of the hierarchy
+plus one:
+  header        magic, version, N - 1, number of posts P, number of
+                comments C, database time at which it was written
+  kinds         N bytes, padded to a multiple of 4
+  parent_blogs  N int32
+  parent_posts  N int32
+  pubdates      N int32, publication dates as unix timestamps
+  positions     N int32, position of a post in posts or of a comment
+                in comments, -1 for the other records
+  starts        N int32, position in posts of the first post of a
+                blog, or in comments of the first comment of a post
+  counts        N int32, number of posts of a blog or of comments of
+                a post
+  posts         P int32, the posts of every blog, oldest first
+  comments      C int32, the comments of every post, oldest first
+
+A new snapshot is written to a temporary file which is then renamed
+over the previous one, so that readers never see a partial file.
+Records modified since the snapshot was written, and their parents,
+are not answered from it.
+"""
+
+__revision__ = "$Id$"
+
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from invenio.errorlib import register_exception
+from invenio.webblog_config import CFG_WEBBLOG_BLOG, \
+    CFG_WEBBLOG_BLOGPOST, CFG_WEBBLOG_COMMENT, CFG_WEBBLOG_INITIALBLOG, \
+    CFG_WEBBLOG_REJBLOG, CFG_WEBBLOG_DELETED, CFG_WEBBLOG_SNAPSHOT_PATH, \
+    CFG_WEBBLOG_CACHE_CHECK_INTERVAL
+from invenio.webblog_cache import get_records_with_parents
+from invenio.webblog_dblayer import get_db_datetime, \
+    get_recids_modified_since, get_hierarchy_range, get_max_hierarchy_recid, \
+    get_hierarchy_updated_since
+
+_MAGIC = 'WBLGSNAP'
+_VERSION = 1
+_HEADER = '<8sIIII20s4x'
+_HEADER_SIZE = struct.calcsize(_HEADER)
+# code -> kind, 0 standing for records that are not in the hierarchy.
+# Other kinds are stored as ''.
+_KINDS = [None, '', CFG_WEBBLOG_BLOG, CFG_WEBBLOG_BLOGPOST,
+          CFG_WEBBLOG_COMMENT, CFG_WEBBLOG_INITIALBLOG, CFG_WEBBLOG_REJBLOG,
+          CFG_WEBBLOG_DELETED]
+_KIND_CODES = dict([(kind, code) for code, kind in enumerate(_KINDS)])
+_RECORD_SECTIONS = ('parent_blogs', 'parent_posts', 'pubdates',
+                    'positions', 'starts', 'counts')
+# number of hierarchy entries read at once when writing a snapshot
+_RANGE_SIZE = 100000
+_MAX_INT32 = 2 ** 31 - 1
+
+
+def _padding(size):
+    """ @return: number of bytes to add to SIZE to align it on 4 bytes """
+
+    return -size % 4
+
+
+def _to_little_endian(values):
+    """ @return: the content of the given array as little-endian bytes """
+
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tostring()
+
+
+def _fill_children(children, size, positions, starts, counts):
+    """
+    Sorts the children of every parent from the oldest to the newest
+    one and records their positions and the range of every parent
+    @param children: list of (parent recid, pubdate, recid)
+    @type children: list
+    @return: the children recids
+    @rtype: array
+    """
+
+    children.sort()
+    out = array('i', [0]) * len(children)
+    for i, (parent, dummy, recid) in enumerate(children):
+        out[i] = recid
+        positions[recid] = i
+        if parent < size:
+            if counts[parent] == 0:
+                starts[parent] = i
+            counts[parent] += 1
+    return out
+
+
+def write_snapshot(path=CFG_WEBBLOG_SNAPSHOT_PATH):
+    """
+    Writes the snapshot of the current blog hierarchy and atomically
+    replaces the previous one with it
+    @param path: file to write
+    @type path: string
+    @return: the highest recid of the snapshot
+    @rtype: int
+    """
+
+    generated = get_db_datetime()
+    size = get_max_hierarchy_recid() + 1
+    kinds = array('b', [0]) * size
+    sections = {}
+    for name in _RECORD_SECTIONS:
+        sections[name] = array('i', [0]) * size
+    sections['positions'] = array('i', [-1]) * size
+    posts = []
+    comments = []
+
+    for low in range(0, size, _RANGE_SIZE):
+        for recid, kind, id_blog, id_post, pubdate in \
+                get_hierarchy_range(low, low + _RANGE_SIZE - 1):
+            if recid >= size:
+                # indexed after the snapshot was started
+                continue
+            pubdate = min(int(pubdate), _MAX_INT32)
+            kinds[recid] = _KIND_CODES.get(kind, 1)
+            sections['parent_blogs'][recid] = id_blog
+            sections['parent_posts'][recid] = id_post
+            sections['pubdates'][recid] = pubdate
+            if kind == CFG_WEBBLOG_BLOGPOST and id_blog:
+                posts.append((id_blog, pubdate, recid))
+            elif kind == CFG_WEBBLOG_COMMENT and id_post:
+                comments.append((id_post, pubdate, recid))
+
+    posts = _fill_children(posts, size, sections['positions'],
+                           sections['starts'], sections['counts'])
+    comments = _fill_children(comments, size, sections['positions'],
+                              sections['starts'], sections['counts'])
+
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    tmp_path = "%s.%s.tmp" % (path, os.getpid())
+    try:
+        snapshot_file = open(tmp_path, 'wb')
+        try:
+            snapshot_file.write(struct.pack(_HEADER, _MAGIC, _VERSION,
+                                            size - 1, len(posts),
+                                            len(comments), generated))
+            snapshot_file.write(kinds.tostring())
+            snapshot_file.write('\0' * _padding(size))
+            for name in _RECORD_SECTIONS:
+                snapshot_file.write(_to_little_endian(sections[name]))
+            snapshot_file.write(_to_little_endian(posts))
+            snapshot_file.write(_to_little_endian(comments))
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        finally:
+            snapshot_file.close()
+        os.rename(tmp_path, path)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return size - 1
+
+
+class WebBlogSnapshot:
+    """
+    Read-only memory-mapped snapshot of the blog hierarchy
+    """
+
+    def __init__(self, path):
+        snapshot_file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(snapshot_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        finally:
+            snapshot_file.close()
+
+        if len(self._map) < _HEADER_SIZE:
+            raise ValueError("%s is not a WebBlog snapshot" % path)
+        magic, version, max_recid, nb_posts, nb_comments, generated = \
+               struct.unpack_from(_HEADER, self._map, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("%s is not a WebBlog snapshot" % path)
+        self.size = max_recid + 1
+        self.generated = generated.rstrip('\0')
+
+        offset = _HEADER_SIZE
+        self._kinds = offset
+        offset += self.size + _padding(self.size)
+        self._sections = {}
+        for name in _RECORD_SECTIONS:
+            self._sections[name] = offset
+            offset += 4 * self.size
+        self._sections['posts'] = offset
+        offset += 4 * nb_posts
+        self._sections['comments'] = offset
+        offset += 4 * nb_comments
+        if offset > len(self._map):
+            raise ValueError("%s is truncated" % path)
+
+    def __contains__(self, recid):
+        return 0 < recid < self.size and \
+               self._map[self._kinds + recid] != '\0'
+
+    def _get(self, section, i):
+        """ @return: the I-th integer of the given section """
+
+        return struct.unpack_from('<i', self._map,
+                                  self._sections[section] + 4 * i)[0]
+
+    def _get_range(self, section, start, end):
+        """ @return: integers START to END (excluded) of the given section """
+
+        offset = self._sections[section]
+        out = array('i')
+        out.fromstring(self._map[offset + 4 * start:offset + 4 * end])
+        if sys.byteorder == 'big':
+            out.byteswap()
+        return out
+
+    def get_kind(self, recid):
+        """ @return: the kind of a record of the snapshot """
+
+        return _KINDS[ord(self._map[self._kinds + recid])]
+
+    def get_parent_blog(self, recid):
+        """ @return: the parent blog of a record of the snapshot, the
+        record itself for blogs, or None """
+
+        if self.get_kind(recid) == CFG_WEBBLOG_BLOG:
+            return recid
+        return self._get('parent_blogs', recid) or None
+
+    def get_parent_post(self, recid):
+        """ @return: the parent post of a record of the snapshot, or None """
+
+        return self._get('parent_posts', recid) or None
+
+    def _get_children_range(self, parent_recid, kind):
+        """
+        @param kind: BLOGPOST or COMMENT
+        @return: (section, start, count) of the children of the given
+        kind of a record of the snapshot
+        @rtype: tuple
+        """
+
+        if self.get_kind(parent_recid) == CFG_WEBBLOG_BLOGPOST:
+            section = 'comments'
+        else:
+            section = 'posts'
+        if (section == 'comments') != (kind == CFG_WEBBLOG_COMMENT):
+            return (section, 0, 0)
+        return (section, self._get('starts', parent_recid),
+                self._get('counts', parent_recid))
+
+    def count_children(self, parent_recid, kind):
+        """ @return: number of children of the given kind of a record
+        of the snapshot """
+
+        return self._get_children_range(parent_recid, kind)[2]
+
+    def get_children(self, parent_recid, kind, newest_first=True,
+                     offset=0, limit=None):
+        """
+        @return: LIMIT children of the given kind of a record of the
+        snapshot, starting at OFFSET in the given order
+        @rtype: list
+        """
+
+        section, start, count = self._get_children_range(parent_recid, kind)
+        if limit is None:
+            limit = count
+        if newest_first:
+            end = max(count - offset, 0)
+            first = max(end - limit, 0)
+            out = self._get_range(section, start + first, start + end).tolist()
+            out.reverse()
+            return out
+        first = min(offset, count)
+        end = min(offset + limit, count)
+        return self._get_range(section, start + first, start + end).tolist()
+
+    def _get_siblings_range(self, recid):
+        """
+        @return: (section, start, count, position) of a post or
+        comment of the snapshot among its siblings, or None
+        @rtype: tuple
+        """
+
+        kind = self.get_kind(recid)
+        if kind == CFG_WEBBLOG_BLOGPOST:
+            parent_recid = self._get('parent_blogs', recid)
+        elif kind == CFG_WEBBLOG_COMMENT:
+            parent_recid = self._get('parent_posts', recid)
+        else:
+            return None
+        if parent_recid not in self:
+            return None
+        section, start, count = self._get_children_range(parent_recid, kind)
+        position = self._get('positions', recid)
+        if not start <= position < start + count:
+            return None
+        return (section, start, count, position)
+
+    def get_neighbour(self, recid, step):
+        """
+        @param step: 1 for the next (newer) sibling, -1 for the
+        previous (older) one
+        @return: the sibling of a post or comment of the snapshot, or None
+        """
+
+        siblings = self._get_siblings_range(recid)
+        if siblings is None:
+            return None
+        section, start, count, position = siblings
+        if start <= position + step < start + count:
+            return self._get(section, position + step)
+        return None
+
+    def get_rank(self, recid, newest_first=True):
+        """
+        @return: (k, n) meaning that a post or comment of the snapshot
+        is the k-th of its n siblings, or None
+        @rtype: tuple
+        """
+
+        siblings = self._get_siblings_range(recid)
+        if siblings is None:
+            return None
+        dummy, start, count, position = siblings
+        if newest_first:
+            return (start + count - position, count)
+        return (position - start + 1, count)
+
+    def get_window(self, recid, before=5, after=5, newest_first=True):
+        """
+        @return: (up to BEFORE siblings shown right before a post or
+        comment of the snapshot, up to AFTER siblings shown right
+        after it), or None
+        @rtype: tuple of lists
+        """
+
+        siblings = self._get_siblings_range(recid)
+        if siblings is None:
+            return None
+        section, start, count, position = siblings
+        end = start + count
+        if newest_first:
+            preceding = self._get_range(section, position + 1,
+                                        min(position + 1 + before, end)).tolist()
+            preceding.reverse()
+            following = self._get_range(section, max(position - after, start),
+                                        position).tolist()
+            following.reverse()
+        else:
+            preceding = self._get_range(section, max(position - before, start),
+                                        position).tolist()
+            following = self._get_range(section, position + 1,
+                                        min(position + 1 + after, end)).tolist()
+        return (preceding, following)
+
+
+# current snapshot and the records modified since it was written
+_state = {'current': (None, frozenset()),
+          'stat': None,
+          'db_time': None,
+          'checked_at': 0}
+_lock = threading.Lock()
+
+
+def _get_snapshot_parents(snapshot, recids):
+    """
+    @return: the parents that the given records have in the snapshot,
+    whose children changed if the records were moved or deleted since
+    @rtype: frozenset
+    """
+
+    out = set()
+    for recid in recids:
+        if recid in snapshot:
+            out.add(snapshot.get_parent_blog(recid))
+            out.add(snapshot.get_parent_post(recid))
+    out.discard(None)
+    return frozenset(out)
+
+
+def _refresh_snapshot():
+    """ Maps the newest snapshot, and looks for the records modified
+    since it was written, at most every CFG_WEBBLOG_CACHE_CHECK_INTERVAL
+    seconds """
+
+    if time.time() - _state['checked_at'] < CFG_WEBBLOG_CACHE_CHECK_INTERVAL:
+        return
+    if not _lock.acquire(False):
+        # another thread is already refreshing
+        return
+    try:
+        _state['checked_at'] = time.time()
+        try:
+            stat = os.stat(CFG_WEBBLOG_SNAPSHOT_PATH)
+        except OSError:
+            _state['current'] = (None, frozenset())
+            _state['stat'] = None
+            return
+        stat = (stat.st_ino, stat.st_mtime, stat.st_size)
+        snapshot, modified = _state['current']
+        if stat != _state['stat']:
+            try:
+                snapshot = WebBlogSnapshot(CFG_WEBBLOG_SNAPSHOT_PATH)
+            except (EnvironmentError, ValueError, struct.error):
+                register_exception()
+                _state['current'] = (None, frozenset())
+                return
+            modified = frozenset()
+            _state['stat'] = stat
+            _state['db_time'] = snapshot.generated
+        db_time = get_db_datetime()
+        recids = set(get_recids_modified_since(_state['db_time']))
+        recids |= get_hierarchy_updated_since(_state['db_time'])
+        if recids:
+            recids = list(recids)
+            modified = modified | \
+                       frozenset(get_records_with_parents(recids)) | \
+                       _get_snapshot_parents(snapshot, recids)
+        _state['current'] = (snapshot, modified)
+        _state['db_time'] = db_time
+    finally:
+        _lock.release()
+
+
+def get_fresh_snapshot(recids):
+    """
+    @param recids: records recids
+    @type recids: list
+    @return: the current snapshot if all the given records are in it
+    and neither they nor their children were modified since it was
+    written, otherwise None
+    @rtype: WebBlogSnapshot
+    """
+
+    _refresh_snapshot()
+    snapshot, modified = _state['current']
+    if snapshot is None:
+        return None
+    for recid in recids:
+        if recid is None:
+            return None
+        recid = int(recid)
+        if recid in modified or recid not in snapshot:
+            return None
+    return snapshot
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+##
+## This file is part of Invenio.
+## Copyright (C) 2012 CERN.
+##
+## Invenio is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 2 of the
+## License, or (at your option) any later version.
+##
+## Invenio is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Invenio; if not, write to the Free Software Foundation, Inc.,
+## 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+WebBlog timelines: the posts of a blog, or the comments of a post,
+sorted by (publication date, recid) in two parallel arrays, so that
+next, previous and rank queries are answered from memory.
+
+Timelines are built from the blog hierarchy, kept per process and
+refreshed incrementally with the hierarchy entries updated since
+they were built. Records removed from the hierarchy or moved to
+another parent do not show in these entries: a timeline longer than
+the number of children of its parent is built again.
+"""
+
+__revision__ = "$Id$"
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from invenio.webblog_config import CFG_WEBBLOG_TIMELINE_CACHE_SIZE, \
+    CFG_WEBBLOG_CACHE_CHECK_INTERVAL
+from invenio.webblog_cache import WebBlogLRUCache
+from invenio.webblog_dblayer import get_db_datetime, \
+    get_hierarchy_timeline, get_hierarchy_timeline_changes, \
+    count_hierarchy_children
+
+
+class WebBlogTimeline:
+    """
+    Records of one parent (posts of a blog or comments of a post)
+    sorted from the oldest to the newest one.
+
+    The arrays are never modified: a refresh builds new ones and swaps
+    them in with one assignment, so that the readers, which do not
+    take the lock, always see a consistent timeline.
+    """
+
+    def __init__(self, parent_recid, kind, rows=()):
+        """
+        @param rows: (recid, timestamp) sorted by timestamp and recid
+        @type rows: list of tuples
+        """
+
+        self.parent_recid = parent_recid
+        self.kind = kind
+        self._data = None
+        self.replace(rows)
+        self.built_at = None
+        self.checked_at = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data[0])
+
+    def __contains__(self, recid):
+        return recid in self._data[2]
+
+    def replace(self, rows):
+        """
+        Replaces the records of the timeline
+        @param rows: (recid, timestamp) sorted by timestamp and recid
+        @type rows: list of tuples
+        """
+
+        recids = array('i', [row[0] for row in rows])
+        timestamps = array('l', [row[1] for row in rows])
+        positions = {}
+        for i, recid in enumerate(recids):
+            positions[recid] = i
+        self._data = (recids, timestamps, positions)
+
+    def update(self, changes):
+        """
+        Applies hierarchy changes to the timeline: the changed records
+        are removed, then inserted again by bisection, and only the
+        positions after the first change are renumbered. New posts and
+        comments, the newest ones, cost almost nothing.
+        @param changes: (recid, kind, timestamp) of the records whose
+        hierarchy entry changed; those that are not of the kind of the
+        timeline any longer are removed from it
+        @type changes: list of tuples
+        """
+
+        old_recids, old_timestamps, old_positions = self._data
+        # new arrays, for the readers of the old ones
+        recids = array('i', old_recids)
+        timestamps = array('l', old_timestamps)
+        positions = dict(old_positions)
+        first = len(recids)
+
+        removed = [positions.pop(recid) for recid, dummy, dummy in changes
+                   if recid in positions]
+        removed.sort()
+        removed.reverse()
+        for i in removed:
+            del recids[i]
+            del timestamps[i]
+            first = i
+
+        for recid, kind, timestamp in changes:
+            if kind != self.kind or recid in positions:
+                continue
+            # after the records of the same timestamp and lower recid
+            i = bisect_left(timestamps, timestamp)
+            while i < len(recids) and timestamps[i] == timestamp \
+                      and recids[i] < recid:
+                i += 1
+            recids.insert(i, recid)
+            timestamps.insert(i, timestamp)
+            positions[recid] = i
+            first = min(first, i)
+
+        for i in xrange(first, len(recids)):
+            positions[recids[i]] = i
+        self._data = (recids, timestamps, positions)
+
+    def position(self, recid):
+        """
+        @return: the position of the record, 0 being the oldest one,
+        or None if it is not in the timeline
+        @rtype: int
+        """
+
+        return self._data[2].get(recid)
+
+    def next(self, recid):
+        """ @return: the record published after the given one, or None """
+
+        recids, dummy, positions = self._data
+        i = positions.get(recid)
+        if i is None or i + 1 >= len(recids):
+            return None
+        return recids[i + 1]
+
+    def previous(self, recid):
+        """ @return: the record published before the given one, or None """
+
+        recids, dummy, positions = self._data
+        i = positions.get(recid)
+        if i is None or i == 0:
+            return None
+        return recids[i - 1]
+
+    def rank(self, recid, newest_first=True):
+        """
+        @return: (k, n) meaning that the record is the k-th of n,
+        counting from 1, or None if it is not in the timeline
+        @rtype: tuple
+        """
+
+        recids, dummy, positions = self._data
+        i = positions.get(recid)
+        if i is None:
+            return None
+        total = len(recids)
+        if newest_first:
+            return (total - i, total)
+        return (i + 1, total)
+
+    def window(self, recid, before=5, after=5, newest_first=True):
+        """
+        @return: (up to BEFORE records shown right before the given
+        one, up to AFTER records shown right after it), both in the
+        given order, or None if it is not in the timeline
+        @rtype: tuple of lists
+        """
+
+        recids, dummy, positions = self._data
+        i = positions.get(recid)
+        if i is None:
+            return None
+        if newest_first:
+            preceding = recids[i + 1:i + 1 + before].tolist()
+            preceding.reverse()
+            following = recids[max(i - after, 0):i].tolist()
+            following.reverse()
+        else:
+            preceding = recids[max(i - before, 0):i].tolist()
+            following = recids[i + 1:i + 1 + after].tolist()
+        return (preceding, following)
+
+    def siblings(self, recid, newest_first=True, exclude=True):
+        """
+        @param exclude: if True the given record is left out
+        @type exclude: boolean
+        @return: all the records in the given order, or None if the
+        given one is not in the timeline
+        @rtype: list
+        """
+
+        recids, dummy, positions = self._data
+        i = positions.get(recid)
+        if i is None:
+            return None
+        out = recids.tolist()
+        if exclude:
+            del out[i]
+        if newest_first:
+            out.reverse()
+        return out
+
+    def slice(self, offset=0, limit=None, newest_first=True):
+        """
+        @return: LIMIT records starting at OFFSET in the given order
+        @rtype: list
+        """
+
+        recids = self._data[0]
+        total = len(recids)
+        if limit is None:
+            limit = total
+        if newest_first:
+            end = max(total - offset, 0)
+            start = max(end - limit, 0)
+            out = recids[start:end].tolist()
+            out.reverse()
+            return out
+        return recids[offset:offset + limit].tolist()
+
+
+_timelines = WebBlogLRUCache(CFG_WEBBLOG_TIMELINE_CACHE_SIZE, ttl=24 * 3600)
+
+
+def _refresh_timeline(timeline):
+    """
+    Applies to the timeline the hierarchy entries of its parent
+    updated since it was built or last refreshed, or builds it again
+    if some of its records left the parent
+    """
+
+    timeline.lock.acquire()
+    try:
+        if time.time() - timeline.checked_at < CFG_WEBBLOG_CACHE_CHECK_INTERVAL:
+            return
+        db_time = get_db_datetime()
+        changes = get_hierarchy_timeline_changes(timeline.parent_recid,
+                                                 timeline.kind,
+                                                 timeline.built_at)
+        if changes:
+            timeline.update(changes)
+        if len(timeline) != count_hierarchy_children(timeline.parent_recid,
+                                                     timeline.kind):
+            timeline.replace(get_hierarchy_timeline(timeline.parent_recid,
+                                                    timeline.kind))
+        timeline.built_at = db_time
+        timeline.checked_at = time.time()
+    finally:
+        timeline.lock.release()
+
+
+def get_timeline(parent_recid, kind):
+    """
+    @param parent_recid: blog recid for posts, post recid for comments
+    @type parent_recid: int
+    @param kind: BLOGPOST or COMMENT
+    @type kind: string
+    @return: the up to date timeline of the children of the given parent
+    @rtype: WebBlogTimeline
+    """
+
+    parent_recid = int(parent_recid)
+    key = (parent_recid, kind)
+    found, timeline = _timelines.get(key)
+    if found:
+        _refresh_timeline(timeline)
+        return timeline
+
+    db_time = get_db_datetime()
+    timeline = WebBlogTimeline(parent_recid, kind,
+                               get_hierarchy_timeline(parent_recid, kind))
+    timeline.built_at = db_time
+    timeline.checked_at = time.time()
+    _timelines.set(key, timeline)
+    return timeline
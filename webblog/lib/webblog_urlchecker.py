@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+##
+## This file is part of Invenio.
+## Copyright (C) 2012 CERN.
+##
+## Invenio is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 2 of the
+## License, or (at your option) any later version.
+##
+## Invenio is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Invenio; if not, write to the Free Software Foundation, Inc.,
+## 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+WebBlog URL checker: validates many blog URLs concurrently, with a
+global and a per-host limit of simultaneous connections, connect and
+read timeouts, and a file cache of the recent results.
+
+A URL is valid with the same rules as webbasket's url_is_valid(): the
+server answers, and not with one of CFG_WEBBLOG_URLCHECK_INVALID_STATUSES.
+
+The checker only speaks HTTP to the hosts of the given URLs, so it can
+be run against a local HTTP server standing in for the blogs, as
+webblog_urlchecker_tests does.
+"""
+
+__revision__ = "$Id$"
+
+import cPickle
+import httplib
+import os
+import Queue
+import socket
+import threading
+import time
+from collections import deque
+from urlparse import urlsplit
+from invenio.webblog_config import CFG_WEBBLOG_URLCHECK_THREADS, \
+    CFG_WEBBLOG_URLCHECK_THREADS_PER_HOST, \
+    CFG_WEBBLOG_URLCHECK_CONNECT_TIMEOUT, \
+    CFG_WEBBLOG_URLCHECK_READ_TIMEOUT, \
+    CFG_WEBBLOG_URLCHECK_CACHE_PATH, CFG_WEBBLOG_URLCHECK_CACHE_TTL, \
+    CFG_WEBBLOG_URLCHECK_INVALID_STATUSES
+
+
+def check_url(url, connect_timeout=CFG_WEBBLOG_URLCHECK_CONNECT_TIMEOUT,
+              read_timeout=CFG_WEBBLOG_URLCHECK_READ_TIMEOUT):
+    """
+    @param url: URL to check, http:// being assumed if it has no scheme
+    @type url: string
+    @param connect_timeout: seconds to wait for the connection
+    @type connect_timeout: float
+    @param read_timeout: seconds to wait for the answer
+    @type read_timeout: float
+    @return: (valid, HTTP status, reason), the status being 0 if the
+    server could not be reached
+    @rtype: tuple
+    """
+
+    url = url.strip()
+    if '://' not in url:
+        url = "http://" + url
+    url_tuple = urlsplit(url)
+    if not url_tuple[1]:
+        return (False, 0, "Not Valid")
+
+    if url_tuple[0] == 'https':
+        connection_class = httplib.HTTPSConnection
+    else:
+        connection_class = httplib.HTTPConnection
+    path = url_tuple[2] or '/'
+    if url_tuple[3]:
+        path += '?' + url_tuple[3]
+
+    try:
+        conn = connection_class(url_tuple[1], timeout=connect_timeout)
+        try:
+            conn.connect()
+            conn.sock.settimeout(read_timeout)
+            conn.request("GET", path)
+            response = conn.getresponse()
+            status = response.status
+            reason = response.reason
+        finally:
+            conn.close()
+    except (socket.error, httplib.HTTPException, ValueError), e:
+        return (False, 0, str(e) or e.__class__.__name__)
+
+    return (status not in CFG_WEBBLOG_URLCHECK_INVALID_STATUSES, status, reason)
+
+
+def _get_host(url):
+    """ @return: the host of the given URL, used to limit the number
+    of simultaneous connections to it """
+
+    url = url.strip()
+    if '://' not in url:
+        url = "http://" + url
+    url_tuple = urlsplit(url)
+    return (url_tuple[1] or '').lower()
+
+
+class WebBlogURLCheckReport:
+    """
+    Aggregated results of URL checks
+    """
+
+    def __init__(self):
+        self.nb_urls = 0
+        self.nb_valid = 0
+        self.nb_cached = 0
+        self.statuses = {}   # status -> number of URLs
+        self.invalid = {}    # invalid URL -> (status, reason)
+        self.started = time.time()
+
+    def add(self, url, result, cached=False):
+        """ Records the result (valid, status, reason) of one URL """
+
+        valid, status, reason = result
+        self.nb_urls += 1
+        if cached:
+            self.nb_cached += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if valid:
+            self.nb_valid += 1
+        else:
+            self.invalid[url] = (status, reason)
+
+    def __str__(self):
+        out = "Checked %s URLs in %.1f seconds (%s from the cache): " \
+              "%s valid, %s invalid." % (self.nb_urls,
+                                         time.time() - self.started,
+                                         self.nb_cached, self.nb_valid,
+                                         len(self.invalid))
+        statuses = self.statuses.items()
+        statuses.sort()
+        for status, number in statuses:
+            if status:
+                out += "\n  HTTP %s: %s" % (status, number)
+            else:
+                out += "\n  unreachable: %s" % number
+        return out
+
+
+class WebBlogURLChecker:
+    """
+    Checks URLs with a pool of threads
+    """
+
+    def __init__(self, threads=CFG_WEBBLOG_URLCHECK_THREADS,
+                 threads_per_host=CFG_WEBBLOG_URLCHECK_THREADS_PER_HOST,
+                 connect_timeout=CFG_WEBBLOG_URLCHECK_CONNECT_TIMEOUT,
+                 read_timeout=CFG_WEBBLOG_URLCHECK_READ_TIMEOUT,
+                 cache_path=CFG_WEBBLOG_URLCHECK_CACHE_PATH,
+                 cache_ttl=CFG_WEBBLOG_URLCHECK_CACHE_TTL):
+        """
+        @param threads: maximum number of simultaneous connections
+        @param threads_per_host: maximum number of simultaneous
+        connections to the same host
+        @param cache_path: file where the results are kept between
+        runs, None not to keep them
+        @param cache_ttl: number of seconds during which a result
+        is reused
+        """
+
+        self.threads = threads
+        self.threads_per_host = threads_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.cache_path = cache_path
+        self.cache_ttl = cache_ttl
+        self._cache = self._load_cache()
+        self._lock = threading.Lock()
+
+    def _load_cache(self):
+        """ @return: the cached results, {url: (time, valid, status, reason)} """
+
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            cache_file = open(self.cache_path, 'rb')
+            try:
+                return cPickle.load(cache_file)
+            finally:
+                cache_file.close()
+        except (IOError, EOFError, cPickle.UnpicklingError):
+            return {}
+
+    def _save_cache(self):
+        """ Writes the results that did not expire to the cache file """
+
+        if not self.cache_path:
+            return
+        now = time.time()
+        cache = dict([(url, result) for url, result in self._cache.items()
+                      if result[0] + self.cache_ttl > now])
+        directory = os.path.dirname(self.cache_path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        tmp_path = "%s.%s.tmp" % (self.cache_path, os.getpid())
+        cache_file = open(tmp_path, 'wb')
+        try:
+            cPickle.dump(cache, cache_file, cPickle.HIGHEST_PROTOCOL)
+        finally:
+            cache_file.close()
+        os.rename(tmp_path, self.cache_path)
+
+    def _work(self, hosts, urls_by_host, report):
+        """
+        Checks the URLs of the hosts taken from the HOSTS queue until
+        it is empty. A host is in the queue at most threads_per_host
+        times, so that no more workers check its URLs at once.
+        """
+
+        while True:
+            try:
+                host = hosts.get_nowait()
+            except Queue.Empty:
+                return
+            urls = urls_by_host[host]
+            while True:
+                try:
+                    url = urls.popleft()
+                except IndexError:
+                    break
+                result = check_url(url, self.connect_timeout, self.read_timeout)
+                self._lock.acquire()
+                try:
+                    report.add(url, result)
+                    if result[1]:
+                        # unreachable servers are checked again next time
+                        self._cache[url] = (time.time(),) + result
+                finally:
+                    self._lock.release()
+
+    def check_urls(self, urls, report=None):
+        """
+        @param urls: URLs to check
+        @type urls: iterable
+        @param report: report to add the results to, a new one if None
+        @type report: WebBlogURLCheckReport
+        @return: the results of the checks
+        @rtype: WebBlogURLCheckReport
+        """
+
+        if report is None:
+            report = WebBlogURLCheckReport()
+        urls_by_host = {}
+        now = time.time()
+        seen = set()
+        for url in urls:
+            if url in seen:
+                continue
+            seen.add(url)
+            cached = self._cache.get(url)
+            if cached is not None and cached[0] + self.cache_ttl > now:
+                report.add(url, cached[1:], cached=True)
+            else:
+                urls_by_host.setdefault(_get_host(url), deque()).append(url)
+
+        hosts = Queue.Queue()
+        for host, host_urls in urls_by_host.items():
+            for dummy in range(min(self.threads_per_host, len(host_urls))):
+                hosts.put(host)
+
+        workers = [threading.Thread(target=self._work,
+                                    args=(hosts, urls_by_host, report))
+                   for dummy in range(min(self.threads, hosts.qsize()))]
+        for worker in workers:
+            worker.setDaemon(True)
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self._save_cache()
+        return report
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+##
+## This file is part of Invenio.
+## Copyright (C) 2012 CERN.
+##
+## Invenio is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 2 of the
+## License, or (at your option) any later version.
+##
+## Invenio is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Invenio; if not, write to the Free Software Foundation, Inc.,
+## 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+Unit tests for the WebBlog URL checker, run against a local HTTP
+server standing in for the blogs.
+"""
+
+__revision__ = "$Id$"
+
+import BaseHTTPServer
+import os
+import shutil
+import socket
+import SocketServer
+import tempfile
+import threading
+import time
+import unittest
+from invenio.testutils import make_test_suite, run_test_suite
+from invenio.webblog_urlchecker import WebBlogURLChecker, check_url
+
+
+class _BlogServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Local stand-in for the blog servers: /ok answers 200, /missing
+    404 and /slow 200 after a while, counting the requests it serves
+    at the same time
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0),
+                                           _BlogRequestHandler)
+        self.lock = threading.Lock()
+        self.nb_requests = 0
+        self.nb_running = 0
+        self.max_running = 0
+
+
+class _BlogRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Answers the requests of _BlogServer """
+
+    def do_GET(self):
+        server = self.server
+        server.lock.acquire()
+        try:
+            server.nb_requests += 1
+            server.nb_running += 1
+            server.max_running = max(server.max_running, server.nb_running)
+        finally:
+            server.lock.release()
+        try:
+            if self.path.startswith('/slow'):
+                time.sleep(0.2)
+            if self.path.startswith('/missing'):
+                self.send_response(404)
+            else:
+                self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        finally:
+            server.lock.acquire()
+            try:
+                server.nb_running -= 1
+            finally:
+                server.lock.release()
+
+    def log_message(self, *args):
+        pass
+
+
+def _get_closed_port():
+    """ @return: a local port nobody listens to """
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class WebBlogURLCheckerTest(unittest.TestCase):
+    """ Tests of check_url() and WebBlogURLChecker """
+
+    def setUp(self):
+        self.server = _BlogServer()
+        self.server_thread = threading.Thread(target=self.server.serve_forever)
+        self.server_thread.setDaemon(True)
+        self.server_thread.start()
+        self.url = "http://127.0.0.1:%s" % self.server.server_address[1]
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_valid_url(self):
+        """webblog_urlchecker - a blog answering 200 is valid"""
+        self.assertEqual(check_url(self.url + '/ok', 1, 1), (True, 200, 'OK'))
+
+    def test_missing_url(self):
+        """webblog_urlchecker - a blog answering 404 is not valid"""
+        valid, status, dummy = check_url(self.url + '/missing', 1, 1)
+        self.assertEqual((valid, status), (False, 404))
+
+    def test_unreachable_url(self):
+        """webblog_urlchecker - an unreachable blog is not valid"""
+        unreachable = "http://127.0.0.1:%s/" % _get_closed_port()
+        valid, status, dummy = check_url(unreachable, 1, 1)
+        self.assertEqual((valid, status), (False, 0))
+
+    def test_url_without_scheme(self):
+        """webblog_urlchecker - http:// is assumed without a scheme"""
+        self.assertEqual(check_url(self.url[len('http://'):] + '/ok', 1, 1)[1], 200)
+
+    def test_report(self):
+        """webblog_urlchecker - the report counts valid and invalid urls"""
+        checker = WebBlogURLChecker(cache_path=None, connect_timeout=1,
+                                    read_timeout=1)
+        unreachable = "http://127.0.0.1:%s/" % _get_closed_port()
+        report = checker.check_urls([self.url + '/ok', self.url + '/ok',
+                                     self.url + '/missing', unreachable])
+        self.assertEqual(report.nb_urls, 3)
+        self.assertEqual(report.nb_valid, 1)
+        self.assertEqual(sorted(report.invalid.keys()),
+                         sorted([self.url + '/missing', unreachable]))
+        self.assertEqual(report.statuses, {200: 1, 404: 1, 0: 1})
+
+    def test_cache(self):
+        """webblog_urlchecker - results are reused from the cache file"""
+        cache_path = os.path.join(self.tmpdir, 'urlcheck.cache')
+        unreachable = "http://127.0.0.1:%s/" % _get_closed_port()
+        urls = [self.url + '/ok', self.url + '/missing', unreachable]
+        WebBlogURLChecker(cache_path=cache_path, connect_timeout=1,
+                          read_timeout=1).check_urls(urls)
+        self.assertEqual(self.server.nb_requests, 2)
+
+        report = WebBlogURLChecker(cache_path=cache_path, connect_timeout=1,
+                                   read_timeout=1).check_urls(urls)
+        # unreachable servers are not cached
+        self.assertEqual(report.nb_cached, 2)
+        self.assertEqual(self.server.nb_requests, 2)
+        self.assertEqual(report.nb_valid, 1)
+        self.assertEqual(len(report.invalid), 2)
+
+    def test_cache_expiration(self):
+        """webblog_urlchecker - expired results are checked again"""
+        cache_path = os.path.join(self.tmpdir, 'urlcheck.cache')
+        WebBlogURLChecker(cache_path=cache_path,
+                          cache_ttl=0).check_urls([self.url + '/ok'])
+        report = WebBlogURLChecker(cache_path=cache_path,
+                                   cache_ttl=0).check_urls([self.url + '/ok'])
+        self.assertEqual(report.nb_cached, 0)
+        self.assertEqual(self.server.nb_requests, 2)
+
+    def test_threads_per_host(self):
+        """webblog_urlchecker - at most threads_per_host connections per host"""
+        checker = WebBlogURLChecker(threads=8, threads_per_host=2,
+                                    cache_path=None, connect_timeout=1,
+                                    read_timeout=5)
+        report = checker.check_urls([self.url + '/slow%s' % i
+                                     for i in range(8)])
+        self.assertEqual(report.nb_valid, 8)
+        self.assertEqual(self.server.max_running, 2)
+
+TEST_SUITE = make_test_suite(WebBlogURLCheckerTest)
+
+if __name__ == "__main__":
+    run_test_suite(TEST_SUITE)
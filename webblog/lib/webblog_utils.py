@@ -21,10 +21,75 @@
 Various utilities for WebBlog, e.g. config parser, etc.
 """
 
+from array import array
+from hashlib import md5
+from urlparse import urlsplit
+from invenio.intbitset import intbitset
 from invenio.search_engine_utils import get_fieldvalues
+from invenio.webblog_config import CFG_WEBBLOG_BLOG, \
+    CFG_WEBBLOG_BLOGPOST, CFG_WEBBLOG_COMMENT, CFG_WEBBLOG_INITIALBLOG, \
+    CFG_WEBBLOG_BIBUPLOAD_POST_PLUGINS, \
+    CFG_WEBBLOG_DESCENDANTS_CHUNK_SIZE
+from invenio.webblog_cache import webblog_memoize
+from invenio.webblog_timeline import get_timeline
+from invenio.webblog_recordkind import get_kind, get_kinds, get_collection
+from invenio.webblog_snapshot import get_fresh_snapshot
+from invenio.webblog_dblayer import get_hierarchy_entry, \
+    get_hierarchy_children, count_hierarchy_children, get_indexed_recids, get_hierarchy_descendants, \
+    iter_hierarchy_descendants, get_recids_with_fieldvalues, get_statistics, \
+    get_hierarchy_entries_for_records, get_fieldvalues_for_records, \
+    get_recids_by_fieldvalues, get_snippets, get_recids_by_url_hashes, \
+    has_unindexed_children
+
+def get_bibupload_plugin_options():
+    """ This function returns the bibupload options that make
+    bibupload keep the WebBlog tables up to date
+    @return: bibupload command line options
+    @rtype: list of strings
+    """
+
+    return ['--post-plugin=%s' % plugin
+            for plugin in CFG_WEBBLOG_BIBUPLOAD_POST_PLUGINS]
+
+#####  RECORDS #####
+
+def get_record_kind(recid):
+    """ This function returns the kind of any record given its recid,
+    that is its collection (980__a) or DELETED if it was deleted
+    @param recid: record recid
+    @type recid: int
+    @return: BLOG, BLOGPOST, COMMENT, INITIALBLOG, REJBLOG, DELETED...
+    or an empty string if the record has no collection
+    @rtype: string
+    """
+
+    return get_kind(recid)
+
+def get_record_kinds(recids):
+    """ This function is the bulk version of get_record_kind()
+    @param recids: records recids
+    @type recids: list or intbitset
+    @return: the kind of each record
+    @rtype: dict {recid: kind}
+    """
+
+    return get_kinds(recids)
+
+def get_record_collection(recid):
+    """ This function returns the collection (980__a) of any record
+    given its recid, even if the record was deleted
+    @param recid: record recid
+    @type recid: int
+    @return: BLOG, BLOGPOST, COMMENT, INITIALBLOG, REJBLOG... or an
+    empty string if the record has no collection
+    @rtype: string
+    """
+
+    return get_collection(recid)
 
 #####  BLOGS #####
 
+@webblog_memoize
 def get_parent_blog(recid):
     """ This function returns the parent blog of any 
     post or comment given its recid
@@ -34,7 +99,19 @@ def get_parent_blog(recid):
     @rtype: int
     """
 
-    coll = get_fieldvalues(recid, '980__a')[0]
+    snapshot = get_fresh_snapshot([recid])
+    if snapshot is not None:
+        return snapshot.get_parent_blog(recid)
+
+    entry = get_hierarchy_entry(recid)
+    if entry:
+        kind, id_blog = entry[0], entry[1]
+        if kind == CFG_WEBBLOG_BLOG:
+            return recid
+        return id_blog or None
+
+    # the record is not indexed yet, let's look at its fields
+    coll = get_record_kind(recid)
     if coll == 'BLOG':
         return recid
     elif coll == 'COMMENT':
@@ -51,20 +128,171 @@ def get_parent_blog(recid):
     else:
         return None
 
-def get_blog_descendants(recid):
-    """ This function returns all the descendants of the given blog """
+def _first_recid(values):
+    """ This function returns the first of the given field values
+    as a recid, or 0 if there is none """
+
+    if values:
+        try:
+            return int(values[0])
+        except ValueError:
+            pass
+    return 0
+
+def get_parent_blogs(recids):
+    """ This function is the bulk version of get_parent_blog(): it
+    returns the parent blogs of many records with a fixed number of
+    queries
+    @param recids: records recids
+    @type recids: list or intbitset
+    @return: two parallel arrays, the given recids sorted and their
+    parent blogs, 0 standing for no parent blog. A blog is its own
+    parent.
+    @rtype: tuple (array of recids, array of parent blogs recids)
+    """
 
-    posts = get_posts(recid)
-    descendants = posts
-    for post_recid in posts:
-        comments = get_comments(post_recid)
-        descendants += comments
+    recids = _wash_recids(recids)
+    parents = {}
+    entries = get_hierarchy_entries_for_records(recids)
+    for recid, entry in entries.items():
+        if entry[0] == CFG_WEBBLOG_BLOG:
+            parents[recid] = recid
+        else:
+            parents[recid] = entry[1]
+
+    # records that are not indexed yet, let's look at their fields
+    other_recids = recids - intbitset(entries.keys())
+    if other_recids:
+        kinds = get_kinds(other_recids)
+        blogs = get_fieldvalues_for_records(other_recids, '760__w')
+        posts = get_fieldvalues_for_records(other_recids, '773__w')
+        comments = {}
+        for recid in other_recids:
+            kind = kinds[recid]
+            if kind == CFG_WEBBLOG_BLOG:
+                parents[recid] = recid
+            elif kind == CFG_WEBBLOG_COMMENT:
+                comments[recid] = _first_recid(posts.get(recid))
+            else:
+                parents[recid] = _first_recid(blogs.get(recid))
+        if comments:
+            post_blogs = get_fieldvalues_for_records(
+                [post for post in comments.values() if post], '760__w')
+            for recid, post in comments.items():
+                parents[recid] = _first_recid(post_blogs.get(post))
+
+    return (array('i', recids), array('i', [parents[recid]
+                                           for recid in recids]))
+
+def _wash_recids(recids):
+    """ This function accepts one recid or a collection of recids
+    @param recids: one or several recids
+    @type recids: int, string, list or intbitset
+    @return: the given recids
+    @rtype: intbitset
+    """
+
+    if isinstance(recids, (int, long, basestring)):
+        return intbitset([int(recids)])
+    return intbitset(recids)
+
+def get_blog_descendants(blog_recids):
+    """ This function returns all the descendants (posts, comments,
+    ...) of the given blog or blogs with a few bulk queries
+    @param blog_recids: blog recid or list of blogs recids
+    @type blog_recids: int, list or intbitset
+    @return: descendants recids, the blogs themselves not included
+    @rtype: intbitset
+    """
+
+    blog_recids = _wash_recids(blog_recids)
+    indexed_blogs = get_indexed_recids(blog_recids)
+    descendants = get_hierarchy_descendants(indexed_blogs)
+
+    # blogs that are not indexed yet: let's look at the bibxxx tables
+    other_blogs = blog_recids - indexed_blogs
+    if other_blogs:
+        posts = get_recids_with_fieldvalues('760__w', other_blogs)
+        descendants |= posts
+        if posts:
+            descendants |= get_recids_with_fieldvalues('773__w', posts)
 
     return descendants
 
+def iter_blog_descendants(blog_recids, chunk_size=CFG_WEBBLOG_DESCENDANTS_CHUNK_SIZE):
+    """ This function yields the descendants of the given blog or
+    blogs in chunks, so that huge blogs can be processed without
+    holding all their descendants in memory
+    @param blog_recids: blog recid or list of blogs recids
+    @type blog_recids: int, list or intbitset
+    @param chunk_size: maximum number of recids per chunk
+    @type chunk_size: int
+    @return: generator of lists of descendants recids
+    """
+
+    blog_recids = _wash_recids(blog_recids)
+    indexed_blogs = get_indexed_recids(blog_recids)
+    for blog_recid in indexed_blogs:
+        for chunk in iter_hierarchy_descendants(blog_recid, chunk_size):
+            yield chunk
+
+    other_blogs = blog_recids - indexed_blogs
+    if other_blogs:
+        descendants = list(get_blog_descendants(other_blogs))
+        for i in range(0, len(descendants), chunk_size):
+            yield descendants[i:i + chunk_size]
+
+@webblog_memoize
+def get_blog_statistics(blog_recid):
+    """ This function returns the statistics of the given blog,
+    which are kept up to date when its records are uploaded
+    @param blog_recid: blog recid
+    @type blog_recid: int
+    @return: {'nb_posts': int, 'nb_comments': int,
+    'first_post_date': datetime, 'last_post_date': datetime,
+    'total_filesize': size in bytes of all the attached files}, the
+    dates being None if the blog has no posts, or None if the blog
+    is not indexed yet
+    @rtype: dict
+    """
+
+    res = get_statistics(blog_recid)
+    if res is None:
+        return None
+    return {'nb_posts': res[0],
+            'nb_comments': res[1],
+            'first_post_date': res[2],
+            'last_post_date': res[3],
+            'total_filesize': res[4]}
+
 ##### POSTS #####
 
-def get_posts(blog_recid, newest_first=True):
+@webblog_memoize
+def _is_indexed_parent(parent_recid, kind):
+    """ This function tells whether the hierarchy holds the current
+    children of the given blog or post. The crawler uploads records
+    without the bp_post_webblog plugin: until blogindexer indexes
+    them, their parent is read from the search engine instead. """
+
+    return not has_unindexed_children(parent_recid, kind)
+
+def _search_children(query, newest_first, offset, limit):
+    """ This function searches for the children of a blog or
+    post that are not indexed yet and returns the requested window
+    of them """
+
+    from invenio.search_engine import perform_request_search
+    if newest_first:
+        sort_order = 'd'
+    else:
+        sort_order = 'a'
+    recids = perform_request_search(p=query, sf='date', so=sort_order)
+    if limit is None:
+        return recids[offset:]
+    return recids[offset:offset + limit]
+
+@webblog_memoize
+def get_posts(blog_recid, newest_first=True, offset=0, limit=None):
     """ This function returns the list of posts 
     written on the given blog
     @param blog_recid: blog recid
@@ -72,13 +300,49 @@ def get_posts(blog_recid, newest_first=True):
     @param newest_first: order in wich the posts will be displayed. If
     it is True the newest published posts will be displayed first
     @type newest_first: boolean
+    @param offset: number of posts to skip
+    @type offset: int
+    @param limit: maximum number of posts to return, all of them if None
+    @type limit: int
     @return: list of posts recids
     @rtype: list
     """
 
-    from invenio.search_engine import perform_request_search
-    return perform_request_search(p='760__w:"%s"' % blog_recid, sf='date', so='d')
+    if _is_indexed_parent(blog_recid, CFG_WEBBLOG_BLOGPOST):
+        snapshot = get_fresh_snapshot([blog_recid])
+        if snapshot is not None:
+            return snapshot.get_children(blog_recid, CFG_WEBBLOG_BLOGPOST,
+                                         newest_first, offset, limit)
+
+        posts = get_hierarchy_children(blog_recid, CFG_WEBBLOG_BLOGPOST,
+                                       newest_first, offset, limit)
+        if posts or get_hierarchy_entry(blog_recid):
+            return posts
+
+    # the blog or some of its posts are not indexed yet, let's search
+    # for its posts
+    return _search_children('760__w:"%s"' % blog_recid,
+                            newest_first, offset, limit)
+
+@webblog_memoize
+def count_posts(blog_recid):
+    """ This function returns the number of posts
+    written on the given blog
+    @param blog_recid: blog recid
+    @type blog_recid: int
+    @return: number of posts
+    @rtype: int
+    """
 
+    if _is_indexed_parent(blog_recid, CFG_WEBBLOG_BLOGPOST):
+        snapshot = get_fresh_snapshot([blog_recid])
+        if snapshot is not None:
+            return snapshot.count_children(blog_recid, CFG_WEBBLOG_BLOGPOST)
+        if get_hierarchy_entry(blog_recid):
+            return count_hierarchy_children(blog_recid, CFG_WEBBLOG_BLOGPOST)
+    return len(get_posts(blog_recid))
+
+@webblog_memoize
 def get_parent_post(comment_recid):
     """ This function returns the parent post of any 
     comment given its recid
@@ -88,6 +352,15 @@ def get_parent_post(comment_recid):
     @rtype: int
     """
 
+    snapshot = get_fresh_snapshot([comment_recid])
+    if snapshot is not None:
+        return snapshot.get_parent_post(comment_recid)
+
+    entry = get_hierarchy_entry(comment_recid)
+    if entry:
+        return entry[2] or None
+
+    # the comment is not indexed yet, let's look at its fields
     parent_post = get_fieldvalues(comment_recid, '773__w')
     if parent_post:
        if parent_post[0]:
@@ -112,13 +385,64 @@ def get_sibling_posts(post_recid, newest_first=True, exclude_this_post=True):
     @rtype: list
     """
 
+    timeline = _get_post_timeline(post_recid)
+    if timeline is not None:
+        # None if the post left the timeline since it was looked up
+        siblings_list = timeline.siblings(int(post_recid), newest_first,
+                                          exclude_this_post)
+        if siblings_list is not None:
+            return siblings_list
+
+    # the post is not indexed yet
     main_blog_recid = get_parent_blog(post_recid)
     siblings_list = get_posts(main_blog_recid, newest_first)
-    if exclude_this_post:
-        siblings_list.remove(post_recid)
+    if exclude_this_post and int(post_recid) in siblings_list:
+        siblings_list.remove(int(post_recid))
 
     return siblings_list
 
+def _get_list_window(recids, recid, before, after):
+    """ This function returns the window around the given record
+    in the given list of records, ([], []) if it is not in it """
+
+    recid = int(recid)
+    if recid not in recids:
+        return ([], [])
+    i = recids.index(recid)
+    return (recids[max(i - before, 0):i], recids[i + 1:i + 1 + after])
+
+def _get_sibling_snapshot(recid, kind):
+    """ This function returns the hierarchy snapshot if the given
+    post or comment is in it and neither the record nor its parent
+    changed since it was written, otherwise None """
+
+    recid = int(recid)
+    snapshot = get_fresh_snapshot([recid])
+    if snapshot is None or snapshot.get_kind(recid) != kind:
+        return None
+    if kind == CFG_WEBBLOG_COMMENT:
+        parent_recid = snapshot.get_parent_post(recid)
+    else:
+        parent_recid = snapshot.get_parent_blog(recid)
+    if not _is_indexed_parent(parent_recid, kind):
+        return None
+    snapshot = get_fresh_snapshot([recid, parent_recid])
+    if snapshot is None or snapshot.get_rank(recid) is None:
+        return None
+    return snapshot
+
+def _get_post_timeline(post_recid):
+    """ This function returns the timeline of the blog of the given
+    post if the post is in it, otherwise None """
+
+    main_blog_recid = get_parent_blog(post_recid)
+    if main_blog_recid and \
+           _is_indexed_parent(main_blog_recid, CFG_WEBBLOG_BLOGPOST):
+        timeline = get_timeline(main_blog_recid, CFG_WEBBLOG_BLOGPOST)
+        if int(post_recid) in timeline:
+            return timeline
+    return None
+
 def get_next_post(post_recid):
     """ This function returns the next post of the
     given one that was published
@@ -129,6 +453,15 @@ def get_next_post(post_recid):
     @rtype: recid
     """
 
+    snapshot = _get_sibling_snapshot(post_recid, CFG_WEBBLOG_BLOGPOST)
+    if snapshot is not None:
+        return snapshot.get_neighbour(int(post_recid), 1)
+
+    timeline = _get_post_timeline(post_recid)
+    if timeline is not None:
+        return timeline.next(int(post_recid))
+
+    # the post is not indexed yet, let's search for it
     next_post_recid = None
     main_blog_recid = get_parent_blog(post_recid)
     post_date = get_fieldvalues(post_recid, '269__c')
@@ -153,6 +486,15 @@ def get_previous_post(post_recid):
     @rtype: recid
     """
 
+    snapshot = _get_sibling_snapshot(post_recid, CFG_WEBBLOG_BLOGPOST)
+    if snapshot is not None:
+        return snapshot.get_neighbour(int(post_recid), -1)
+
+    timeline = _get_post_timeline(post_recid)
+    if timeline is not None:
+        return timeline.previous(int(post_recid))
+
+    # the post is not indexed yet, let's search for it
     previous_post_recid = None
     main_blog_recid = get_parent_blog(post_recid)
     post_date = get_fieldvalues(post_recid, '269__c')
@@ -166,9 +508,86 @@ def get_previous_post(post_recid):
 
     return previous_post_recid
 
+def get_sibling_posts_window(post_recid, before=5, after=5, newest_first=True):
+    """ This function returns the sibling posts shown around the
+    given post, without loading all the posts of its blog
+    @param post_recid: post recid
+    @type post_recid: int
+    @param before: maximum number of posts shown before the given one
+    @type before: int
+    @param after: maximum number of posts shown after the given one
+    @type after: int
+    @param newest_first: if it is True the newest posts are shown first
+    @type newest_first: boolean
+    @return: (posts shown before, posts shown after), both in the
+    order in which they are shown
+    @rtype: tuple of lists
+    """
+
+    snapshot = _get_sibling_snapshot(post_recid, CFG_WEBBLOG_BLOGPOST)
+    if snapshot is not None:
+        return snapshot.get_window(int(post_recid), before, after, newest_first)
+
+    timeline = _get_post_timeline(post_recid)
+    if timeline is not None:
+        window = timeline.window(int(post_recid), before, after, newest_first)
+        if window is not None:
+            return window
+    return _get_list_window(get_sibling_posts(post_recid, newest_first, False),
+                            post_recid, before, after)
+
+def get_post_rank(post_recid, newest_first=True):
+    """ This function returns the position of the given post
+    among the posts of its blog
+    @param post_recid: post recid
+    @type post_recid: int
+    @param newest_first: if it is True the newest post is the first one
+    @type newest_first: boolean
+    @return: (k, n) meaning the post is the k-th of the n posts of
+    the blog, or None if the post is not indexed yet
+    @rtype: tuple
+    """
+
+    snapshot = _get_sibling_snapshot(post_recid, CFG_WEBBLOG_BLOGPOST)
+    if snapshot is not None:
+        return snapshot.get_rank(int(post_recid), newest_first)
+
+    timeline = _get_post_timeline(post_recid)
+    if timeline is not None:
+        return timeline.rank(int(post_recid), newest_first)
+    return None
+
+def get_record_titles(recids):
+    """ This function returns the titles (245__a) of many records
+    at once, with one query
+    @param recids: records recids
+    @type recids: list
+    @return: the title of each record having one
+    @rtype: dict {recid: title}
+    """
+
+    return dict([(recid, titles[0]) for recid, titles in
+                 get_fieldvalues_for_records(recids, '245__a').iteritems()])
+
+@webblog_memoize
+def get_post_titles(blog_recid, post_recids):
+    """ This function returns the titles of some posts of a blog,
+    cached with the blog, so that they are fetched again only when
+    the blog or one of its posts is modified
+    @param blog_recid: blog recid
+    @type blog_recid: int
+    @param post_recids: posts of the blog
+    @type post_recids: tuple
+    @return: the title of each post having one
+    @rtype: dict {recid: title}
+    """
+
+    return get_record_titles(list(post_recids))
+
 ##### COMMENTS #####
 
-def get_comments(post_recid, newest_first=True):
+@webblog_memoize
+def get_comments(post_recid, newest_first=True, offset=0, limit=None):
     """ This function returns the list of comments 
     written on the given post
     @param post_recid: post recid
@@ -176,11 +595,47 @@ def get_comments(post_recid, newest_first=True):
     @param newest_first: order in wich the comments will be displayed. If
     it is True the newest comments will be displayed first
     @type newest_first: boolean
+    @param offset: number of comments to skip
+    @type offset: int
+    @param limit: maximum number of comments to return, all of them if None
+    @type limit: int
     @return: list of sibling comments recids
     @rtype: list
     """
-    from invenio.search_engine import perform_request_search
-    return perform_request_search(p='773__w:"%s"' % post_recid, sf='date', so='d')
+
+    if _is_indexed_parent(post_recid, CFG_WEBBLOG_COMMENT):
+        snapshot = get_fresh_snapshot([post_recid])
+        if snapshot is not None:
+            return snapshot.get_children(post_recid, CFG_WEBBLOG_COMMENT,
+                                         newest_first, offset, limit)
+
+        comments = get_hierarchy_children(post_recid, CFG_WEBBLOG_COMMENT,
+                                          newest_first, offset, limit)
+        if comments or get_hierarchy_entry(post_recid):
+            return comments
+
+    # the post or some of its comments are not indexed yet, let's
+    # search for its comments
+    return _search_children('773__w:"%s"' % post_recid,
+                            newest_first, offset, limit)
+
+@webblog_memoize
+def count_comments(post_recid):
+    """ This function returns the number of comments
+    written on the given post
+    @param post_recid: post recid
+    @type post_recid: int
+    @return: number of comments
+    @rtype: int
+    """
+
+    if _is_indexed_parent(post_recid, CFG_WEBBLOG_COMMENT):
+        snapshot = get_fresh_snapshot([post_recid])
+        if snapshot is not None:
+            return snapshot.count_children(post_recid, CFG_WEBBLOG_COMMENT)
+        if get_hierarchy_entry(post_recid):
+            return count_hierarchy_children(post_recid, CFG_WEBBLOG_COMMENT)
+    return len(get_comments(post_recid))
 
 def get_sibling_comments(comment_recid, newest_first=True, exclude_this_comment=True):
     """ This function returns the list of the sibling comments of any 
@@ -197,16 +652,328 @@ def get_sibling_comments(comment_recid, newest_first=True, exclude_this_comment=
     @rtype: list
     """
 
+    timeline = _get_comment_timeline(comment_recid)
+    if timeline is not None:
+        # None if the comment left the timeline since it was looked up
+        siblings_list = timeline.siblings(int(comment_recid), newest_first,
+                                          exclude_this_comment)
+        if siblings_list is not None:
+            return siblings_list
+
+    # the comment is not indexed yet
     post_recid = get_parent_post(comment_recid)
     siblings_list = get_comments(post_recid, newest_first)
-    if exclude_this_comment:
-        siblings_list.remove(comment_recid)
+    if exclude_this_comment and int(comment_recid) in siblings_list:
+        siblings_list.remove(int(comment_recid))
 
     return siblings_list
 
+def _get_comment_timeline(comment_recid):
+    """ This function returns the timeline of the post of the given
+    comment if the comment is in it, otherwise None """
+
+    post_recid = get_parent_post(comment_recid)
+    if post_recid and _is_indexed_parent(post_recid, CFG_WEBBLOG_COMMENT):
+        timeline = get_timeline(post_recid, CFG_WEBBLOG_COMMENT)
+        if int(comment_recid) in timeline:
+            return timeline
+    return None
+
 def get_next_comment(comment_recid):
-    pass
+    """ This function returns the comment written on the
+    same post right after the given one
+    @param comment_recid: comment recid
+    @type comment_recid: int
+    @return: the next comment recid or None
+    @rtype: int
+    """
+
+    snapshot = _get_sibling_snapshot(comment_recid, CFG_WEBBLOG_COMMENT)
+    if snapshot is not None:
+        return snapshot.get_neighbour(int(comment_recid), 1)
+
+    timeline = _get_comment_timeline(comment_recid)
+    if timeline is not None:
+        return timeline.next(int(comment_recid))
+    return None
 
 def get_previous_comment(comment_recid):
-    pass
- 
\ No newline at end of file
+    """ This function returns the comment written on the
+    same post right before the given one
+    @param comment_recid: comment recid
+    @type comment_recid: int
+    @return: the previous comment recid or None
+    @rtype: int
+    """
+
+    snapshot = _get_sibling_snapshot(comment_recid, CFG_WEBBLOG_COMMENT)
+    if snapshot is not None:
+        return snapshot.get_neighbour(int(comment_recid), -1)
+
+    timeline = _get_comment_timeline(comment_recid)
+    if timeline is not None:
+        return timeline.previous(int(comment_recid))
+    return None
+
+def get_sibling_comments_window(comment_recid, before=5, after=5, newest_first=True):
+    """ This function returns the sibling comments shown around the
+    given comment, without loading all the comments of its post
+    @param comment_recid: comment recid
+    @type comment_recid: int
+    @param before: maximum number of comments shown before the given one
+    @type before: int
+    @param after: maximum number of comments shown after the given one
+    @type after: int
+    @param newest_first: if it is True the newest comments are shown first
+    @type newest_first: boolean
+    @return: (comments shown before, comments shown after), both in
+    the order in which they are shown
+    @rtype: tuple of lists
+    """
+
+    snapshot = _get_sibling_snapshot(comment_recid, CFG_WEBBLOG_COMMENT)
+    if snapshot is not None:
+        return snapshot.get_window(int(comment_recid), before, after, newest_first)
+
+    timeline = _get_comment_timeline(comment_recid)
+    if timeline is not None:
+        window = timeline.window(int(comment_recid), before, after,
+                                 newest_first)
+        if window is not None:
+            return window
+    return _get_list_window(get_sibling_comments(comment_recid, newest_first, False),
+                            comment_recid, before, after)
+
+def get_comment_rank(comment_recid, newest_first=True):
+    """ This function returns the position of the given comment
+    among the comments of its post
+    @param comment_recid: comment recid
+    @type comment_recid: int
+    @param newest_first: if it is True the newest comment is the first one
+    @type newest_first: boolean
+    @return: (k, n) meaning the comment is the k-th of the n comments
+    of the post, or None if the comment is not indexed yet
+    @rtype: tuple
+    """
+
+    snapshot = _get_sibling_snapshot(comment_recid, CFG_WEBBLOG_COMMENT)
+    if snapshot is not None:
+        return snapshot.get_rank(int(comment_recid), newest_first)
+
+    timeline = _get_comment_timeline(comment_recid)
+    if timeline is not None:
+        return timeline.rank(int(comment_recid), newest_first)
+    return None
+
+@webblog_memoize
+def get_comment_snippets(post_recid, comment_recids):
+    """ This function returns the authors and snippets of some
+    comments of a post with one query, cached with the post
+    @param post_recid: post recid
+    @type post_recid: int
+    @param comment_recids: comments of the post
+    @type comment_recids: tuple
+    @return: the author and snippet of each comment that was indexed
+    @rtype: dict {recid: (author, snippet)}
+    """
+
+    return get_snippets(list(comment_recids))
+
+#####  BLOG URLS #####
+
+def _split_canonical_url(url):
+    """ @return: (host, path, query) of the given url, the host
+    without 'www.' nor default port and the path without trailing
+    slashes """
+
+    url = url.strip()
+    if '://' not in url:
+        url = "http://" + url
+    dummy, netloc, path, query, dummy = urlsplit(url)
+    host = netloc.lower().split('@')[-1]
+    for port in (':80', ':443'):
+        if host.endswith(port):
+            host = host[:-len(port)]
+    if host.startswith('www.'):
+        host = host[4:]
+    return (host, path.rstrip('/'), query)
+
+def _join_canonical_url(host, path, query):
+    """ @return: the canonical url of the given parts """
+
+    if query:
+        return "%s%s?%s" % (host, path, query)
+    return host + path
+
+def get_canonical_url(url):
+    """ This function returns the form of an url that is the same
+    for all the ways of writing it: without scheme, 'www.', default
+    port, trailing slashes nor fragment
+    E.g: 'https://www.Example.org/2012/05/post/#comments' ->
+    'example.org/2012/05/post'
+    @param url: url
+    @type url: string
+    @return: canonical url
+    @rtype: string
+    """
+
+    return _join_canonical_url(*_split_canonical_url(url))
+
+def get_canonical_blog_url(url):
+    """ This function returns the form of a blog url that is the same
+    for all the urls of the blog: the canonical url without '/wp'
+    suffix either (WordPress installed in a subdirectory)
+    E.g: 'https://www.Example.org/blog/wp/' -> 'example.org/blog'
+    @param url: blog url
+    @type url: string
+    @return: canonical url
+    @rtype: string
+    """
+
+    host, path, query = _split_canonical_url(url)
+    if path.endswith('/wp'):
+        path = path[:-3].rstrip('/')
+    return _join_canonical_url(host, path, query)
+
+def _get_blog_url_variants(url):
+    """ @return: the urls having the same canonical url as the given
+    one that are most commonly used """
+
+    canonical_url = get_canonical_blog_url(url)
+    if '?' in canonical_url:
+        location, query = canonical_url.split('?', 1)
+        query = '?' + query
+    else:
+        location, query = canonical_url, ''
+    if '/' in location:
+        host, path = location.split('/', 1)
+        path = '/' + path
+    else:
+        host, path = location, ''
+
+    variants = [url]
+    for scheme in ('http://', 'https://'):
+        for prefix in ('', 'www.'):
+            for suffix in ('', '/', '/wp', '/wp/'):
+                variants.append(scheme + prefix + host + path + suffix + query)
+    return variants
+
+def get_blog_url_index(duplicates=None):
+    """ This function returns the canonical url of every blog of the
+    archive (BLOG or INITIALBLOG, not deleted) so that the blogs of
+    many urls can be looked up at once
+    @param duplicates: if given, the recids of the blogs having the
+    same canonical url as an older blog are added to it
+    @type duplicates: list
+    @return: recid of the oldest blog of each canonical url
+    @rtype: dict {canonical_url: recid}
+    """
+
+    blog_recids = get_recids_with_fieldvalues('980__a', [CFG_WEBBLOG_BLOG,
+                                                         CFG_WEBBLOG_INITIALBLOG])
+    kinds = get_kinds(blog_recids)
+    index = {}
+    urls_by_recid = get_fieldvalues_for_records(blog_recids, '520__u')
+    for recid in sorted(urls_by_recid):
+        urls = urls_by_recid[recid]
+        if kinds.get(recid) in (CFG_WEBBLOG_BLOG, CFG_WEBBLOG_INITIALBLOG):
+            # the oldest blog, of the lowest recid, wins
+            if index.setdefault(get_canonical_blog_url(urls[0]), recid) != recid \
+                   and duplicates is not None:
+                duplicates.append(recid)
+    return index
+
+def get_archived_blog(url):
+    """ This function returns the blog of the archive having the same
+    canonical url as the given one, without loading the whole index
+    @param url: blog url
+    @type url: string
+    @return: recid of the blog, or None if the url is not archived
+    @rtype: int
+    """
+
+    canonical_url = get_canonical_blog_url(url)
+    candidates = intbitset()
+    for recids in get_recids_by_fieldvalues('520__u',
+                                            _get_blog_url_variants(url)).values():
+        candidates |= recids
+    kinds = get_kinds(candidates)
+    for recid in candidates:
+        if kinds.get(recid) in (CFG_WEBBLOG_BLOG, CFG_WEBBLOG_INITIALBLOG):
+            urls = get_fieldvalues_for_records([recid], '520__u').get(recid)
+            if urls and get_canonical_blog_url(urls[0]) == canonical_url:
+                return recid
+    return None
+
+def get_url_hash(url):
+    """ This function returns the key of an url in the url index of
+    WebBlog
+    @param url: url
+    @type url: string
+    @return: md5 digest of the canonical url
+    @rtype: string
+    """
+
+    return md5(get_canonical_url(url)).digest()
+
+def get_archived_urls(urls, exclude_recid=None):
+    """ This function finds the records of the archive whose url
+    (520__u) is one of the given urls, with one query for all the
+    urls and one for the titles of the records
+    @param urls: urls, e.g. the reference links of a post
+    @type urls: list
+    @param exclude_recid: record not to return, e.g. the post itself
+    @type exclude_recid: int
+    @return: the oldest archived record of each archived url and its
+    title ('Untitled' if it has none)
+    @rtype: dict {url: (recid, title)}
+    """
+
+    url_hashes = dict([(url, get_url_hash(url)) for url in urls if url])
+    recids_by_hash = get_recids_by_url_hashes(list(set(url_hashes.values())))
+    if exclude_recid is not None:
+        for recids in recids_by_hash.values():
+            recids.discard(int(exclude_recid))
+
+    archived = {}
+    for url, url_hash in url_hashes.items():
+        recids = recids_by_hash.get(url_hash)
+        if recids:
+            archived[url] = min(recids)
+    titles = get_record_titles(list(set(archived.values())))
+    return dict([(url, (recid, titles.get(recid, 'Untitled')))
+                 for url, recid in archived.items()])
+
+_LOAD_MORE_SCRIPT = """
+            <script type="text/javascript">
+            if (typeof webblogLoadMore == 'undefined') {
+                var webblogLoadMore = function(link, url, container_id) {
+                    var request = new XMLHttpRequest();
+                    request.open('GET', url + '&offset=' + link.getAttribute('data-offset'), true);
+                    request.onreadystatechange = function() {
+                        if (request.readyState != 4 || request.status != 200) {
+                            return;
+                        }
+                        var page = JSON.parse(request.responseText);
+                        document.getElementById(container_id).innerHTML += page.html;
+                        link.setAttribute('data-offset', page.offset);
+                        if (page.offset >= page.total) {
+                            link.style.display = 'none';
+                        }
+                    };
+                    request.send(null);
+                };
+            }
+            </script>
+            """
+
+def get_load_more_script():
+    """ This function returns the script loading the next page of the
+    posts of a blog or of the comments of a post, from /blog/posts or
+    /blog/comments, into the page. It defines webblogLoadMore(link,
+    url, container_id) once, however many lists the page shows.
+    @return: html script element
+    @rtype: string
+    """
+
+    return _LOAD_MORE_SCRIPT
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+##
+## This file is part of Invenio.
+## Copyright (C) 2012 CERN.
+##
+## Invenio is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 2 of the
+## License, or (at your option) any later version.
+##
+## Invenio is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Invenio; if not, write to the Free Software Foundation, Inc.,
+## 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""
+WebBlog web interface: pages of the posts of a blog and of the comments
+of a post, formatted in HTML brief, that the blog and post pages load
+when the user asks for more of them. Once it is mounted as /blog in
+webinterface_layout, set CFG_WEBBLOG_PAGES_PATH to '/blog':
+
+    /blog/posts?recid=BLOG&offset=3&rg=20[&of=html]
+    /blog/comments?recid=POST&offset=2&rg=20[&of=html]
+
+With of=json (the default) the answer is
+{"html": "...", "offset": next offset, "total": number of items}.
+"""
+
+__revision__ = "$Id$"
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+from invenio.config import CFG_SITE_LANG
+from invenio.messages import wash_language
+from invenio.webinterface_handler import wash_urlargd, WebInterfaceDirectory
+from invenio.webuser import collect_user_info
+from invenio.search_engine import check_user_can_view_record
+from invenio.webblog_config import CFG_WEBBLOG_BLOG, CFG_WEBBLOG_BLOGPOST, \
+    CFG_WEBBLOG_PAGE_SIZE, CFG_WEBBLOG_MAX_PAGE_SIZE
+from invenio.webblog_utils import get_record_kind, get_posts, count_posts, \
+    get_comments, count_comments
+from invenio.webblog_fragments import print_records
+
+try:
+    from mod_python import apache
+    HTTP_FORBIDDEN = apache.HTTP_FORBIDDEN
+    HTTP_NOT_FOUND = apache.HTTP_NOT_FOUND
+except ImportError:
+    HTTP_FORBIDDEN = 403
+    HTTP_NOT_FOUND = 404
+
+
+class WebInterfaceWebBlogPages(WebInterfaceDirectory):
+    """
+    Defines the set of /blog pages
+    """
+
+    _exports = ['posts', 'comments']
+
+    def _get_page(self, req, form, parent_kind, get_children, count_children):
+        """
+        @param parent_kind: the kind of the record whose children are listed
+        @param get_children: get_posts or get_comments
+        @param count_children: count_posts or count_comments
+        @return: one page of the children of the given record
+        @rtype: string
+        """
+
+        argd = wash_urlargd(form, {'recid': (int, 0),
+                                   'offset': (int, 0),
+                                   'rg': (int, CFG_WEBBLOG_PAGE_SIZE),
+                                   'of': (str, 'json'),
+                                   'ln': (str, CFG_SITE_LANG)})
+        recid = argd['recid']
+        ln = wash_language(argd['ln'])
+        if get_record_kind(recid) != parent_kind:
+            req.status = HTTP_NOT_FOUND
+            return ""
+        (auth_code, dummy) = check_user_can_view_record(collect_user_info(req),
+                                                        recid)
+        if auth_code:
+            req.status = HTTP_FORBIDDEN
+            return ""
+
+        offset = max(argd['offset'], 0)
+        limit = min(max(argd['rg'], 1), CFG_WEBBLOG_MAX_PAGE_SIZE)
+        children = get_children(recid, newest_first=True, offset=offset,
+                                limit=limit)
+        html = "".join([fragment + "<br />" for fragment in
+                        print_records(children, format='hb', ln=ln)])
+
+        if argd['of'] == 'html':
+            req.content_type = "text/html; charset=utf-8"
+            return html
+        req.content_type = "application/json"
+        return json.dumps({'html': html.decode('utf-8', 'replace'),
+                           'offset': offset + len(children),
+                           'total': count_children(recid)})
+
+    def posts(self, req, form):
+        """ One page of the posts of a blog, newest first """
+
+        return self._get_page(req, form, CFG_WEBBLOG_BLOG, get_posts, count_posts)
+
+    def comments(self, req, form):
+        """ One page of the comments of a post, newest first """
+
+        return self._get_page(req, form, CFG_WEBBLOG_BLOGPOST, get_comments,
+                              count_comments)
+
+    def __call__(self, req, form):
+        """ Nothing to show at /blog itself """
+
+        req.status = HTTP_NOT_FOUND
+        return ""
+
+    index = __call__
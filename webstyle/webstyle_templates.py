@@ -294,6 +294,11 @@ class Template:
           - HTML code of the page headers
         """
 
+        ### BF: a new page starts, drop the WebBlog cache request tier
+        ### left by a page that failed before its end
+        from invenio.webblog_cache import webblog_cache_end_request
+        webblog_cache_end_request()
+
         # load the right message language
         _ = gettext_set_language(ln)
 
@@ -738,6 +743,11 @@ URI: http://%(host)s%(page)s
         """
         from invenio.search_engine import record_public_p
 
+        ### BF: the WebBlog helpers can cache their results until the
+        ### end of this page
+        from invenio.webblog_cache import webblog_cache_start_request
+        webblog_cache_start_request()
+
         # load the right message language
         _ = gettext_set_language(ln)
 
@@ -841,9 +851,19 @@ URI: http://%(host)s%(page)s
          - modificationdate *string* - the last modification date of the displayed record
          - show_short_rec_p *boolean* - prints a very short version of the record as reminder.
         """
+        ### BF: this is the end of the page for the WebBlog helpers cache
+        from invenio.webblog_cache import webblog_cache_end_request, \
+             get_webblog_cache_statistics
+        from invenio.webblog_config import CFG_WEBBLOG_CACHE_SHOW_STATISTICS
+        webblog_cache_end_request()
+        cache_statistics = ""
+        if CFG_WEBBLOG_CACHE_SHOW_STATISTICS:
+            cache_statistics = "<!-- WebBlog cache: %s -->" % \
+                               cgi.escape(str(get_webblog_cache_statistics()))
+
         # If no tabs, returns nothing
         if len(tabs) <= 1:
-            return ''
+            return cache_statistics
 
         # load the right message language
         _ = gettext_set_language(ln)
@@ -852,10 +872,8 @@ URI: http://%(host)s%(page)s
 
         ### BF: let's display a disclaimer with every part of a blog
         from invenio.search_engine_utils import get_fieldvalues
-        try:
-            coll = get_fieldvalues(recid, "980__a")[0]
-        except:
-            coll = "record"
+        from invenio.webblog_utils import get_record_collection
+        coll = get_record_collection(recid) or "record"
 
         try:
             elem_url = get_fieldvalues(recid, "520__u")[0]
@@ -894,7 +912,7 @@ URI: http://%(host)s%(page)s
                  'url': elem_html_url}
            }
 
-        return out
+        return out + cache_statistics
 
 
     def detailed_record_mini_panel(self, recid, ln=CFG_SITE_LANG,
@@ -0,0 +1,52 @@
+## This file is part of Invenio.
+## Copyright (C) 2012 CERN.
+##
+## Invenio is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 2 of the
+## License, or (at your option) any later version.
+##
+## Invenio is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Invenio; if not, write to the Free Software Foundation, Inc.,
+## 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+__revision__ = "$Id$"
+
+from invenio.websubmit_config import InvenioWebSubmitFunctionStop
+from invenio.webblog_utils import get_archived_blog
+
+CFG_DUPLICATE_URL = """
+            <SCRIPT>
+               document.forms[0].action="/submit";
+               document.forms[0].curpage.value = 1;
+               document.forms[0].step.value = 0;
+               user_must_confirm_before_leaving_page = false;
+               alert('The given blog (%s) is already archived.');
+               document.forms[0].submit();
+            </SCRIPT>"""
+
+def Check_Duplicate_URL(parameters, curdir, form, user_info=None):
+    """Stops the submission if a blog with the same canonical url
+    (no scheme, 'www.', trailing slash or '/wp' suffix) is already
+    archived.
+    @param parameters: (dictionary) - must contain:
+        + url: (string) - the name of the file containing the
+          url of the blog
+    """
+
+    try:
+        f = open("%s/%s" % (curdir, parameters['url']), "r")
+        url = f.read().replace("\n", " ").strip()
+        f.close()
+    except IOError:
+        return ""
+
+    if url and get_archived_blog(url) is not None:
+        raise InvenioWebSubmitFunctionStop(CFG_DUPLICATE_URL % \
+                                           (url.replace("'", "\\'"),))
+    return ""
@@ -31,6 +31,7 @@ from invenio.websubmit_config import CFG_WEBSUBMIT_COPY_MAILS_TO_ADMIN
 from invenio.mailutils import send_email
 from invenio.websubmit_functions.Shared_Functions import ParamFromFile
 from invenio.search_engine import get_fieldvalues
+from invenio.webblog_utils import get_blog_statistics
 
 CFG_MAIL_BODY = """
 A request for the approval of the deletion of a blog record in the %(site_name)s has been
@@ -38,7 +39,7 @@ made and requires your attention as a referee.  The details of the blog record a
 
    Title: %(title)s
    Blog URL: [%(blog_url)s]
-
+%(statistics)s
 You can see the details of the blog record at the following address:
  <%(site_url)s/record/%(record_id)s>
 
@@ -46,6 +47,13 @@ Please register your decision by following the instructions at the following add
  <%(site_url)s/submit?doctype=%(doctype)s&indir=approve&access=%(access)s&act=%(approval_action)s&BSI_RN=%(rn)s>
 """
 
+CFG_MAIL_STATISTICS = """   Posts: %(nb_posts)s
+   Comments: %(nb_comments)s
+   First post: %(first_post_date)s
+   Last post: %(last_post_date)s
+   Attached files: %(total_filesize)s bytes
+"""
+
 def DBI_Mail_Approval_Request_to_Referee(parameters, curdir, form, user_info=None):
     """
     This function sends an email to the referee in order to start the
@@ -98,6 +106,16 @@ def DBI_Mail_Approval_Request_to_Referee(parameters, curdir, form, user_info=Non
     blog_url = "".join(["%s" % url.strip() for url in \
                          get_fieldvalues(int(sysno), "520__u")])
 
+    statistics = get_blog_statistics(sysno)
+    if statistics:
+        # the dates are None as long as the blog has no posts
+        for key in ('first_post_date', 'last_post_date'):
+            if statistics[key] is None:
+                statistics[key] = "no posts yet"
+        statistics = CFG_MAIL_STATISTICS % statistics
+    else:
+        statistics = ""
+
     # we get the referee password
     sth = run_sql("SELECT access FROM sbmAPPROVAL WHERE rn=%s", (rn,))
     if len(sth) >0:
@@ -132,6 +150,7 @@ def DBI_Mail_Approval_Request_to_Referee(parameters, curdir, form, user_info=Non
     mail_body = CFG_MAIL_BODY % \
                 {'title': blog_title,
                  'blog_url': blog_url,
+                 'statistics': statistics,
                  'record_id': sysno,
                  'site_name' : CFG_SITE_NAME,
                  'site_url': CFG_SITE_URL,
@@ -21,7 +21,7 @@ import os
 import re
 from invenio.errorlib import register_exception
 from invenio.search_engine import perform_request_search, record_exists
-from invenio.search_engine_utils import get_fieldvalues
+from invenio.webblog_utils import get_record_kind
 from invenio.websubmit_config import InvenioWebSubmitFunctionStop
 
 CFG_ALERT_RECORD_NOT_FOUND = """\n<script type="text/javascript">
@@ -104,7 +104,7 @@ def Get_Recid_Number(parameters, curdir, form, user_info=None):
             try:
                 if record_exists(int(rn)) == 1:
                     sysno = int(rn)
-                    coll = get_fieldvalues(sysno, '980__a')[0]
+                    coll = get_record_kind(sysno)
                     if act == 'MBI':
                         if coll not in ['BLOG']:
                             raise InvenioWebSubmitFunctionStop(CFG_MODIFY_BLOG_ERROR)
@@ -27,6 +27,7 @@ from invenio.config import \
 from invenio.websubmit_config import InvenioWebSubmitFunctionError
 from invenio.websubmit_functions.Shared_Functions import ParamFromFile
 from invenio.bibtask import task_low_level_submission, bibtask_allocate_sequenceid
+from invenio.webblog_utils import get_bibupload_plugin_options
 
 def Insert_Modify_Record(parameters, curdir, form, user_info=None):
     """
@@ -54,7 +55,8 @@ def Insert_Modify_Record(parameters, curdir, form, user_info=None):
     os.close(tmp_fd)
     shutil.copy(initial_file, final_file)
     bibupload_id = task_low_level_submission('bibupload', 'websubmit.Insert_Modify_Record', \
-                                             '-c', final_file, '-P', '3', '-I', str(sequence_id))
+                                             '-c', final_file, '-P', '3', '-I', str(sequence_id),
+                                             *get_bibupload_plugin_options())
     open(os.path.join(curdir, 'bibupload_id'), 'w').write(str(bibupload_id))
 
     return ""
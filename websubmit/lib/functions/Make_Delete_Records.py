@@ -23,13 +23,32 @@ import shutil
 import time
 import tempfile
 from invenio.websubmit_config import InvenioWebSubmitFunctionError
-from invenio.webblog_utils import get_blog_descendants
+from invenio.webblog_utils import iter_blog_descendants, \
+    get_bibupload_plugin_options, get_record_collection
 from invenio.search_engine_utils import get_fieldvalues
 from invenio.bibtask import task_low_level_submission, bibtask_allocate_sequenceid
 from invenio.config import CFG_TMPDIR
 from invenio.textutils import wash_for_xml
 from invenio.search_engine_utils import get_fieldvalues
 
+def _get_record_to_delete_marcxml(recid):
+    """
+    @param recid: recid of a record to delete
+    @type recid: int
+    @return: the marcxml marking the record as deleted
+    @rtype: string
+    """
+
+    # Escape XML-reserved chars and clean the unsupported ones (mainly
+    # control characters)
+    return wash_for_xml("""
+    <record>
+    <controlfield tag="001">%(recid)s</controlfield>
+    <datafield tag="980" ind1=" " ind2=" ">
+        <subfield code="c">DELETED</subfield>
+    </datafield>
+    </record>""" % {'recid': recid})
+
 def Make_Delete_Records(parameters, curdir, form, user_info=None):
     """
     Function used to delete a blog and all its descendants.
@@ -43,39 +62,22 @@ def Make_Delete_Records(parameters, curdir, form, user_info=None):
 
     recid = sysno
 
-    # let's check if we want to delete a whole blog or
-    # just a post
-    coll = get_fieldvalues(recid, '980__a')[0]
-    if coll == 'BLOG':
-        # let's build the list of recids (blog + descendants) to delete
-        recids = get_blog_descendants(recid)
-        recids.append(recid)
-    elif coll == 'BLOGPOST':
-        recids = [recid]
+    # let's write the final xml, deleting either a whole blog with
+    # all its descendants or just a post. Descendants are read in
+    # chunks so that huge blogs are never held in memory.
+    xml_file = open("%s/recmysql" % curdir, "w")
+    xml_file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    xml_file.write('<collection xmlns="http://www.loc.gov/MARC21/slim">')
 
-    # let's build the final xml
-    marcxml_output = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    marcxml_output += '<collection xmlns="http://www.loc.gov/MARC21/slim">'
-
-    for recid in recids:
-        record_marcxml = """
-    <record>
-    <controlfield tag="001">%(recid)s</controlfield>
-    <datafield tag="980" ind1=" " ind2=" ">
-        <subfield code="c">DELETED</subfield>
-    </datafield>
-    </record>""" % {'recid': recid}
-        marcxml_output += record_marcxml
-
-    marcxml_output += '\n</collection>\n'
-
-    # Escape XML-reserved chars and clean the unsupported ones (mainly
-    # control characters)
-    marcxml_output = wash_for_xml(marcxml_output)
+    coll = get_record_collection(recid)
+    if coll == 'BLOG':
+        for recids in iter_blog_descendants(recid):
+            xml_file.write(''.join([_get_record_to_delete_marcxml(descendant_recid)
+                                    for descendant_recid in recids]))
+    xml_file.write(_get_record_to_delete_marcxml(recid))
 
-    f = open("%s/recmysql" % curdir,"w")
-    f.write(marcxml_output)
-    f.close()
+    xml_file.write('\n</collection>\n')
+    xml_file.close()
 
     url = get_fieldvalues(recid, '520__u')[0]
     sequence_id = bibtask_allocate_sequenceid(curdir)
@@ -88,7 +90,8 @@ def Make_Delete_Records(parameters, curdir, form, user_info=None):
     os.close(tmp_fd)
     shutil.copy(initial_file, final_file)
     bibupload_id = task_low_level_submission('bibupload', 'websubmit.Make_Delete_Records', \
-                                             '-c', final_file, '-P', '3', '-I', str(sequence_id))
+                                             '-c', final_file, '-P', '3', '-I', str(sequence_id),
+                                             *get_bibupload_plugin_options())
     open(os.path.join(curdir, 'bibupload_id'), 'w').write(str(bibupload_id))
 
     return ""
@@ -121,6 +121,7 @@ def Update_Approval_DB(parameters, curdir, form, user_info=None):
         from invenio.bibrecord import record_delete_field, record_add_field, record_xml_output
         from invenio.bibedit_utils import get_bibrecord
         from invenio.bibtask import task_low_level_submission
+        from invenio.webblog_utils import get_bibupload_plugin_options
         record = get_bibrecord(sysno)
         ## Either approve or reject the item, based upon the contents
         ## of 'decision':
@@ -136,7 +137,8 @@ def Update_Approval_DB(parameters, curdir, form, user_info=None):
                 os.write(fd, record_xml_output(record))
                 os.write(fd, """</collection\n>""")
                 os.close(fd)
-                task_low_level_submission('bibupload', 'admin', '-c', name)
+                task_low_level_submission('bibupload', 'admin', '-c', name,
+                                          *get_bibupload_plugin_options())
                 task_low_level_submission('bibindex', 'admin')
                 task_low_level_submission('webcoll', 'admin', '-c', "Provisional Blogs")
                 task_low_level_submission('webcoll', 'admin', '-c', "Blogs")